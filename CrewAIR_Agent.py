@@ -1,361 +1,1726 @@
-"""
-Flight Booking Assistant using OpenAI's GPT-4 with function calling capabilities.
-This module implements a conversational AI agent that helps users book flights
-through a chat interface.
-"""
-
-import os
-import json
-import logging
-from typing import List, Tuple, Dict, Optional
-from pydantic import BaseModel
-from dotenv import load_dotenv
-from openai import OpenAI
-import gradio as gr
-import uuid
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
-
-# Initialize environment and OpenAI client
-load_dotenv()
-openai = OpenAI()
-MODEL = "gpt-4o-mini"
-
-# Constants
-TICKET_PRICES = {
-    "london": "$799",
-    "paris": "$899",
-    "tokyo": "$1400",
-    "rome": "$929",
-}
-
-class BookingState:
-    """
-    Maintains the state of a booking conversation.
-    
-    Attributes:
-        destination (Optional[str]): Target city for the flight
-        name (Optional[str]): Passenger's full name
-        email (Optional[str]): Contact email for booking confirmation
-        price (Optional[str]): Price of the flight
-        booking_stage (str): Current stage in the booking process
-        conversation_id (str): Unique identifier for the conversation
-    """
-    def __init__(self):
-        self.destination: Optional[str] = None
-        self.name: Optional[str] = None
-        self.email: Optional[str] = None
-        self.price: Optional[str] = None
-        self.booking_stage: str = "initial"
-        self.conversation_id: str = str(uuid.uuid4())
-
-    def reset(self):
-        self.__init__()
-
-# Tool Function Definitions
-price_function = {
-    "name": "get_ticket_price",
-    "description": """
-    Retrieves the price for a flight ticket to a specific destination.
-    Used when users inquire about flight prices or during booking confirmation.
-    """,
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "destination_city": {
-                "type": "string",
-                "description": "The destination city for the flight (case-insensitive)"
-            }
-        },
-        "required": ["destination_city"]
-    }
-}
-
-booking_function = {
-    "name": "book_flight",
-    "description": """
-    Process a flight booking with validated passenger details.
-    Called after collecting and validating all required information.
-    Creates a simulation booking with a unique reference number.
-    """,
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "destination_city": {
-                "type": "string",
-                "description": "The destination city for the flight booking"
-            },
-            "passenger_name": {
-                "type": "string",
-                "description": "Full name of the passenger (first and last name required)"
-            },
-            "email": {
-                "type": "string",
-                "description": "Valid email address for booking confirmation"
-            }
-        },
-        "required": ["destination_city", "passenger_name", "email"]
-    }
-}
-
-validation_function = {
-    "name": "validate_info",
-    "description": """
-    Validates passenger information before proceeding with booking.
-    Checks if the name contains at least two parts and if the email is properly formatted.
-    Called before finalizing a booking to ensure data quality.
-    """,
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "passenger_name": {
-                "type": "string",
-                "description": "Full name to validate (must contain at least first and last name)"
-            },
-            "email": {
-                "type": "string",
-                "description": "Email address to validate (must contain @ and domain)"
-            }
-        },
-        "required": ["passenger_name", "email"]
-    }
-}
-
-# Tool definitions list for OpenAI API
-tools = [
-    {"type": "function", "function": price_function},
-    {"type": "function", "function": booking_function},
-    {"type": "function", "function": validation_function}
-]
-
-system_message = """
-You are Sonya, a helpful flight booking assistant. Guide users through the booking process naturally.
-Follow these steps in order:
-1. For price inquiries, use get_ticket_price to provide accurate pricing
-2. For validating user info, use validate_info to ensure data quality
-3. For booking flights, use book_flight after all validations pass
-Maintain a friendly and helpful tone throughout the conversation.
-Handle user frustration professionally and offer clear solutions.
-"""
-
-def get_ticket_price(city: str) -> str:
-    """
-    Retrieve the ticket price for a given destination.
-    
-    Args:
-        city (str): The destination city name
-        
-    Returns:
-        str: The price for the flight or "Price not available" if not found
-        
-    Example:
-        >>> get_ticket_price("london")
-        "$799"
-    """
-    return TICKET_PRICES.get(city.lower(), "Price not available")
-
-def validate_info(name: str, email: str) -> Dict[str, bool]:
-    """
-    Validate passenger name and email format.
-    
-    Args:
-        name (str): Full name of the passenger
-        email (str): Email address for booking confirmation
-        
-    Returns:
-        Dict[str, bool]: Validation results containing:
-            - name_valid: True if name has at least two parts
-            - email_valid: True if email contains @ and domain
-            - all_valid: True if both validations pass
-            
-    Example:
-        >>> validate_info("John Doe", "john@example.com")
-        {"name_valid": True, "email_valid": True, "all_valid": True}
-    """
-    name_valid = len(name.strip().split()) >= 2
-    email_valid = '@' in email and '.' in email
-    return {
-        "name_valid": name_valid,
-        "email_valid": email_valid,
-        "all_valid": name_valid and email_valid
-    }
-
-def handle_tool_call(message) -> Tuple[Dict, Optional[str]]:
-    """
-    Process tool calls from OpenAI's API and execute corresponding functions.
-    
-    Args:
-        message: OpenAI's message object containing tool calls
-        
-    Returns:
-        Tuple[Dict, Optional[str]]: 
-            - Dict: Response data for the tool call
-            - Optional[str]: Destination city if relevant, None otherwise
-            
-    The function handles three types of tool calls:
-    1. get_ticket_price: Retrieves flight prices
-    2. validate_info: Validates passenger information
-    3. book_flight: Processes the final booking
-    
-    Each tool call returns a properly formatted response that includes:
-    - role: "tool"
-    - content: JSON string of the result
-    - tool_call_id: Original call ID from OpenAI
-    - name: Function name that was called
-    """
-    logger.info(f"Handling tool call: {message.tool_calls[0]}")
-    
-    tool_call = message.tool_calls[0]
-    function_name = tool_call.function.name
-    arguments = json.loads(tool_call.function.arguments)
-    
-    if function_name == "get_ticket_price":
-        city = arguments.get('destination_city')
-        price = get_ticket_price(city)
-        response = {
-            "role": "tool",
-            "content": json.dumps({"destination_city": city, "price": price}),
-            "tool_call_id": tool_call.id,
-            "name": function_name
-        }
-        return response, city
-    
-    elif function_name == "validate_info":
-        name = arguments.get('passenger_name')
-        email = arguments.get('email')
-        validation_result = validate_info(name, email)
-        response = {
-            "role": "tool",
-            "content": json.dumps(validation_result),
-            "tool_call_id": tool_call.id,
-            "name": function_name
-        }
-        return response, None
-    
-    elif function_name == "book_flight":
-        city = arguments.get('destination_city')
-        name = arguments.get('passenger_name')
-        email = arguments.get('email')
-        
-        # Generate booking reference
-        booking_ref = f"SIM-{abs(hash(f'{city}{name}{email}')) % 100000:05d}"
-        
-        response = {
-            "role": "tool",
-            "content": json.dumps({
-                "success": True,
-                "booking_reference": booking_ref,
-                "message": f"SIMULATION - Booking Confirmed!\nDestination: {city.title()}\nPassenger: {name}\nEmail: {email}\nPrice: {get_ticket_price(city)}\nBooking Reference: {booking_ref}"
-            }),
-            "tool_call_id": tool_call.id,
-            "name": function_name
-        }
-        return response, city
-
-    return None, None
-
-def chat(message: str, history: List[Tuple[str, str]]) -> str:
-    """
-    Process chat messages and handle tool calling sequence.
-    
-    Args:
-        message (str): Current user message
-        history (List[Tuple[str, str]]): Conversation history as (user, assistant) pairs
-        
-    Returns:
-        str: Assistant's response
-        
-    Flow:
-    1. Formats conversation history for OpenAI
-    2. Makes initial API call with tool definitions
-    3. If tool calls are present:
-       - Adds assistant's message to conversation
-       - Processes each tool call
-       - Gets final response after tool execution
-    4. Formats and returns the final response
-    
-    Error Handling:
-    - Catches and logs all exceptions
-    - Returns apologetic message on errors
-    """
-    try:
-        # Convert history to OpenAI message format
-        messages = [{"role": "system", "content": system_message}]
-        for user_msg, assistant_msg in history:
-            messages.append({"role": "user", "content": user_msg})
-            messages.append({"role": "assistant", "content": assistant_msg})
-        messages.append({"role": "user", "content": message})
-
-        # Get initial response
-        response = openai.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            tools=tools,
-            tool_choice="auto"
-        )
-
-        # Handle tool calls if any
-        if response.choices[0].message.tool_calls:
-            # Add the assistant's message with the tool calls
-            assistant_message = response.choices[0].message
-            messages.append({
-                "role": "assistant",
-                "content": assistant_message.content,
-                "tool_calls": assistant_message.tool_calls
-            })
-            
-            # Handle each tool call
-            for tool_call in assistant_message.tool_calls:
-                response_data, city = handle_tool_call(assistant_message)
-                if response_data:
-                    messages.append(response_data)
-            
-            # Get final response after tool execution
-            final_response = openai.chat.completions.create(
-                model=MODEL,
-                messages=messages
-            )
-            
-            final_content = final_response.choices[0].message.content
-        else:
-            final_content = response.choices[0].message.content
-
-        if not final_content.startswith("Sonya:"):
-            final_content = f"Sonya: {final_content}"
-        
-        return final_content
-
-    except Exception as e:
-        logger.error(f"Error in chat: {str(e)}")
-        return "Sonya: I apologize, but I encountered an error. Please try again."
-
-# Launch Gradio interface
-def main():
-    """
-    Initialize and launch the Gradio chat interface.
-    
-    Features:
-    - Dark mode enforcement
-    - Custom title and description
-    - Disabled flagging
-    - Continuous chat session
-    """
-    force_dark_mode = """
-    function refresh() {
-        const url = new URL(window.location);
-        if (url.searchParams.get('__theme') !== 'dark') {
-            url.searchParams.set('__theme', 'dark');
-            window.location.href = url.href;
-        }
-    }
-    """
-    gr.ChatInterface(
-        fn=chat,
-        title="CrewAIR Booking Assistant - Sonya",
-        description="This is a simulation. No real bookings are made.", flagging_mode="never", js=force_dark_mode
-    ).launch()
-
-if __name__ == "__main__":
-    main()
+"""
+Flight Booking Assistant using OpenAI's GPT-4 with function calling capabilities.
+This module implements a conversational AI agent that helps users book flights
+through a chat interface.
+"""
+
+import os
+import re
+import json
+import asyncio
+import datetime
+import functools
+import logging
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import AsyncIterator, Callable, List, Tuple, Dict, Optional
+from pydantic import BaseModel
+from dotenv import load_dotenv
+from openai import OpenAI, AsyncOpenAI
+import gradio as gr
+import uvicorn
+from fastapi import FastAPI
+import uuid
+import hashlib
+import metrics
+import prompt_cache
+import sqlite3
+import threading
+from context_budget import build_summary, context_budget, estimate_schema_tokens, estimate_tokens
+from conversation_buffer import ConversationBuffer, History
+from booking_ledger import BookingLedger
+from autocomplete import DestinationAutocomplete, autocomplete_router
+from destination_resolver import DestinationResolver
+from fare_calendar import FareCalendar
+from fare_cache import FareCache, parse_route_ttls
+from fare_engine import NO_FARE, FareTable, format_fare
+from fare_provider import FareProvider, HttpFareProvider, TableFareProvider
+from http_client import PoolConfig, aprewarm, create_async_http_client, create_http_client, prewarm
+from rate_limiter import BOOKING, BROWSING, RateLimitedError, RateLimiter
+from resilience import CircuitBreaker, CircuitOpenError, DeadlineExceededError, ResilientCaller
+from route_graph import RouteGraph
+from seat_inventory import Flight, SeatInventory
+from validation import DeliverabilityChecker, validate_passenger
+from response_cache import ResponseCache
+from session_store import SessionManager
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Initialize environment and OpenAI client
+load_dotenv()
+
+# Connection pool shared by all completion calls, warmed when the server starts
+OPENAI_POOL = PoolConfig(
+    max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+    max_keepalive=int(os.getenv("OPENAI_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30")),
+    http2=os.getenv("OPENAI_HTTP2", "True").lower() == "true",
+    connect_timeout=float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5")),
+    timeout=float(os.getenv("OPENAI_TIMEOUT", "60"))
+)
+OPENAI_PREWARM_CONNECTIONS = int(os.getenv("OPENAI_PREWARM_CONNECTIONS", "4"))
+
+# Deadline, retries, circuit breaker and optional hedging of completion calls;
+# they replace the SDK's own retries
+OPENAI_DEADLINE = float(os.getenv("OPENAI_DEADLINE", "30"))
+OPENAI_MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", "4"))
+OPENAI_RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "0.5"))
+OPENAI_RETRY_MAX_DELAY = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "8"))
+CIRCUIT_FAILURE_RATIO = float(os.getenv("CIRCUIT_FAILURE_RATIO", "0.5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "False").lower() == "true"
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.05"))
+MODEL_UNAVAILABLE_REPLY = ("Sonya: I'm having trouble reaching our booking system right now. "
+                           "Please try again in a minute.")
+
+# Client-side rate limit of completion calls, booking turns first; 0 disables a limit
+OPENAI_RPM_LIMIT = float(os.getenv("OPENAI_RPM_LIMIT", "0"))
+OPENAI_TPM_LIMIT = float(os.getenv("OPENAI_TPM_LIMIT", "0"))
+RATE_LIMIT_MAX_QUEUE = int(os.getenv("RATE_LIMIT_MAX_QUEUE", "256"))
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "10"))
+COMPLETION_TOKENS_ESTIMATE = 300
+BUSY_REPLY = "Sonya: I'm helping a lot of travellers right now. Please try again in a few seconds."
+
+# Send each conversation's id as the provider's prompt_cache_key, so its turns reach the cache holding its prefix
+PROMPT_CACHE_KEY_ENABLED = os.getenv("PROMPT_CACHE_KEY_ENABLED", "True").lower() == "true"
+
+OPENAI_HTTP_CLIENT = create_http_client(OPENAI_POOL)
+OPENAI_ASYNC_HTTP_CLIENT = create_async_http_client(OPENAI_POOL)
+openai = OpenAI(http_client=OPENAI_HTTP_CLIENT, timeout=OPENAI_POOL.timeouts, max_retries=0)
+async_openai = AsyncOpenAI(http_client=OPENAI_ASYNC_HTTP_CLIENT, timeout=OPENAI_POOL.timeouts, max_retries=0)
+COMPLETIONS = ResilientCaller(
+    deadline=OPENAI_DEADLINE, max_attempts=OPENAI_MAX_ATTEMPTS, base_delay=OPENAI_RETRY_BASE_DELAY,
+    max_delay=OPENAI_RETRY_MAX_DELAY, breaker=CircuitBreaker(CIRCUIT_FAILURE_RATIO, CIRCUIT_RESET_TIMEOUT),
+    hedge=HEDGE_ENABLED, hedge_max_ratio=HEDGE_MAX_RATIO, hedge_workers=OPENAI_POOL.max_connections
+)
+RATE_LIMITER = (RateLimiter(OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT, RATE_LIMIT_MAX_QUEUE, RATE_LIMIT_MAX_WAIT)
+                if OPENAI_RPM_LIMIT or OPENAI_TPM_LIMIT else None)
+MODEL = "gpt-4o-mini"
+
+# Reply from a single tool result's template instead of a second completion where it fully determines the reply
+DIRECT_RENDER_ENABLED = os.getenv("DIRECT_RENDER_ENABLED", "True").lower() == "true"
+
+# Answer simple price questions locally instead of calling the model
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "True").lower() == "true"
+FAST_PATH_MAX_LENGTH = int(os.getenv("FAST_PATH_MAX_LENGTH", "80"))
+
+# Cache of completion replies keyed on the normalized request
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "True").lower() == "true"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "600"))
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH") or None
+
+# Session store: idle sessions are evicted, optionally spilling to SQLite
+SESSION_MAX = int(os.getenv("SESSION_MAX", "20000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "3600"))
+SESSION_SPILL_PATH = os.getenv("SESSION_SPILL_PATH") or None
+
+# Prompt token budget: older turns beyond it are folded into a summary
+CONTEXT_TOKEN_BUDGET = context_budget(MODEL)
+CONTEXT_KEEP_TURNS = int(os.getenv("CONTEXT_KEEP_TURNS", "4"))
+# Turns are folded this many at a time, so the summary and the prompt prefix
+# up to it stay the same, and stay cached, between folds
+CONTEXT_FOLD_TURNS = int(os.getenv("CONTEXT_FOLD_TURNS", "8"))
+SUMMARY_RESERVE_TOKENS = 120
+
+# Append-only SQLite ledger of bookings
+BOOKING_LEDGER_PATH = os.getenv("BOOKING_LEDGER_PATH", "bookings.db")
+
+# Fare table and the origin every quote departs from
+FARES_PATH = os.getenv("FARES_PATH") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "fares.csv")
+FARE_ORIGIN = os.getenv("FARE_ORIGIN", "NYC")
+
+# External fare service behind get_ticket_price; the local fare table when unset
+FARE_PROVIDER_URL = os.getenv("FARE_PROVIDER_URL") or None
+FARE_PROVIDER_TIMEOUT = float(os.getenv("FARE_PROVIDER_TIMEOUT", "2.0"))
+FARE_PROVIDER_BATCH_WINDOW = float(os.getenv("FARE_PROVIDER_BATCH_WINDOW", "0.002"))
+
+# Cache in front of the external fare service, optionally shared across workers through SQLite
+FARE_CACHE_ENABLED = os.getenv("FARE_CACHE_ENABLED", "True").lower() == "true"
+FARE_CACHE_MAX_BYTES = int(os.getenv("FARE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+FARE_CACHE_TTL = float(os.getenv("FARE_CACHE_TTL", "300"))
+FARE_CACHE_ROUTE_TTLS = parse_route_ttls(os.getenv("FARE_CACHE_ROUTE_TTLS", ""))
+FARE_CACHE_STALE_TTL = float(os.getenv("FARE_CACHE_STALE_TTL", "3600"))
+FARE_CACHE_PATH = os.getenv("FARE_CACHE_PATH") or None
+BULK_QUOTE_MAX_DAYS = int(os.getenv("BULK_QUOTE_MAX_DAYS", "92"))
+BULK_QUOTE_DAILY_PRICES_DAYS = 7
+CHEAPEST_DAY_DEFAULT_DAYS = 30
+
+# Seats are held for a conversation when a price is quoted, and sold at booking
+SEAT_HOLD_TTL = float(os.getenv("SEAT_HOLD_TTL", "600"))
+
+# Route network searched for multi-leg itineraries
+ROUTES_PATH = os.getenv("ROUTES_PATH") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "routes.csv")
+AIRPORTS_PATH = (os.getenv("AIRPORTS_PATH")
+                 or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "airports.csv"))
+ITINERARY_MAX_RESULTS = 5
+
+# Destinations with their codes and aliases, resolved from free text
+DESTINATIONS_PATH = (os.getenv("DESTINATIONS_PATH")
+                     or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "destinations.csv"))
+
+# Reject emails whose domain has no mail servers; lookups are cached per domain
+EMAIL_DELIVERABILITY_CHECK = os.getenv("EMAIL_DELIVERABILITY_CHECK", "False").lower() == "true"
+EMAIL_DELIVERABILITY_TTL = float(os.getenv("EMAIL_DELIVERABILITY_TTL", "3600"))
+
+# Address the app (Gradio UI plus the autocomplete API) listens on
+SERVER_NAME = os.getenv("GRADIO_SERVER_NAME", "127.0.0.1")
+SERVER_PORT = int(os.getenv("GRADIO_SERVER_PORT", "7860"))
+
+# Thread pool shared by all conversations for running parallel tool calls
+_TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("TOOL_WORKERS", "8")), thread_name_prefix="tool")
+
+# Constants
+FARES = FareTable.load(FARES_PATH)
+FARE_CALENDAR = FareCalendar(FARES)
+FARE_PROVIDER: FareProvider = (
+    HttpFareProvider(FARE_PROVIDER_URL, FARE_PROVIDER_TIMEOUT, FARE_PROVIDER_BATCH_WINDOW) if FARE_PROVIDER_URL
+    else TableFareProvider(FARES)
+)
+if FARE_PROVIDER_URL and FARE_CACHE_ENABLED:
+    FARE_PROVIDER = FareCache(FARE_PROVIDER, FARE_CACHE_MAX_BYTES, FARE_CACHE_TTL, FARE_CACHE_ROUTE_TTLS,
+                              FARE_CACHE_STALE_TTL, FARE_CACHE_PATH)
+DESTINATIONS = DestinationResolver.load(DESTINATIONS_PATH)
+AUTOCOMPLETE = DestinationAutocomplete(DESTINATIONS)
+ROUTE_GRAPH = RouteGraph.load(ROUTES_PATH, AIRPORTS_PATH)
+SEATS = SeatInventory(hold_ttl=SEAT_HOLD_TTL)
+DELIVERABILITY = DeliverabilityChecker(ttl=EMAIL_DELIVERABILITY_TTL) if EMAIL_DELIVERABILITY_CHECK else None
+
+# Fast path patterns: a price keyword, exactly one known destination and
+# nothing that suggests the user wants more than a quote
+_PRICE_QUERY_PATTERN = re.compile(r"\b(how much|price|prices|cost|costs|fare|fares)\b")
+_NOT_PRICE_ONLY_PATTERN = re.compile(r"\b(book|booking|reserve|cancel|change|name|email)\b|@")
+# The fast path quotes today's economy fare; a date, cabin or cheapest-day question needs the tools
+_NOT_TODAY_ECONOMY_PATTERN = re.compile(
+    r"\d|\b(today|tonight|tomorrow|next|weekend|week|month|day|days|date|dates|when"
+    r"|jan(uary)?|feb(ruary)?|mar(ch)?|apr(il)?|may|june?|july?|aug(ust)?|sept?(ember)?|oct(ober)?"
+    r"|nov(ember)?|dec(ember)?|mon(day)?|tue(s|sday)?|wed(nesday)?|thu(rs|rsday)?|fri(day)?|sat(urday)?"
+    r"|sun(day)?|economy|premium|business|first|class|cabin|cheap|cheaper|cheapest|lowest)\b"
+)
+
+# Turns moving a booking toward completion are scheduled ahead of browsing
+_BOOKING_TURN_PATTERN = re.compile(r"\b(book|booking|reserve|confirm|yes)\b|@", re.IGNORECASE)
+_BOOKING_TOOLS = {"validate_info", "book_flight"}
+
+class BookingState:
+    """
+    Maintains the state of a booking conversation.
+    
+    Attributes:
+        destination (Optional[str]): Target city for the flight
+        name (Optional[str]): Passenger's full name
+        email (Optional[str]): Contact email for booking confirmation
+        price (Optional[str]): Price of the flight
+        booking_stage (str): Current stage in the booking process
+        conversation_id (str): Unique identifier for the conversation
+        
+    Uses __slots__ so the tens of thousands of idle sessions held by the
+    session store cost no per-instance __dict__.
+    """
+    __slots__ = ("destination", "name", "email", "price", "booking_stage", "conversation_id")
+
+    def __init__(self):
+        self.destination: Optional[str] = None
+        self.name: Optional[str] = None
+        self.email: Optional[str] = None
+        self.price: Optional[str] = None
+        self.booking_stage: str = "initial"
+        self.conversation_id: str = str(uuid.uuid4())
+
+    def reset(self):
+        self.__init__()
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        """Serialize the state, e.g. for spilling an evicted session."""
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Optional[str]]) -> "BookingState":
+        """Restore a state serialized with to_dict()."""
+        state = cls()
+        for slot in cls.__slots__:
+            if slot in data:
+                setattr(state, slot, data[slot])
+        return state
+
+# Tool Function Definitions
+price_function = {
+    "name": "get_ticket_price",
+    "description": """
+    Retrieves the price for a flight ticket to a specific destination.
+    Used when users inquire about flight prices or during booking confirmation.
+    """,
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "destination_city": {
+                "type": "string",
+                "description": "The destination city for the flight (case-insensitive)"
+            },
+            "travel_date": {
+                "type": "string",
+                "description": "Departure date as YYYY-MM-DD; today if the user did not give one"
+            },
+            "cabin": {
+                "type": "string",
+                "enum": ["economy", "premium", "business"],
+                "description": "Cabin class; economy unless the user asks for another"
+            }
+        },
+        "required": ["destination_city"]
+    }
+}
+
+bulk_price_function = {
+    "name": "get_ticket_prices_bulk",
+    "description": """
+    Retrieves prices for several destinations over a range of travel dates in one call.
+    Used when users compare destinations or ask for the cheapest dates, instead of
+    calling get_ticket_price once per destination or date.
+    """,
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "destination_cities": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Destination cities to compare; every destination when omitted"
+            },
+            "start_date": {
+                "type": "string",
+                "description": "First departure date as YYYY-MM-DD; today if omitted"
+            },
+            "end_date": {
+                "type": "string",
+                "description": "Last departure date as YYYY-MM-DD, inclusive; start_date if omitted"
+            },
+            "cabin": {
+                "type": "string",
+                "enum": ["economy", "premium", "business"],
+                "description": "Cabin class; economy unless the user asks for another"
+            }
+        }
+    }
+}
+
+cheapest_day_function = {
+    "name": "find_cheapest_day",
+    "description": """
+    Finds the cheapest day to fly to a destination within a date window.
+    Used when users are flexible on dates, e.g. "cheapest day in March to Rome".
+    """,
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "destination_city": {
+                "type": "string",
+                "description": "The destination city for the flight"
+            },
+            "start_date": {
+                "type": "string",
+                "description": "First acceptable departure date as YYYY-MM-DD; today if omitted"
+            },
+            "end_date": {
+                "type": "string",
+                "description": "Last acceptable departure date as YYYY-MM-DD, inclusive; 30 days after start_date if omitted"
+            },
+            "cabin": {
+                "type": "string",
+                "enum": ["economy", "premium", "business"],
+                "description": "Cabin class; economy unless the user asks for another"
+            }
+        },
+        "required": ["destination_city"]
+    }
+}
+
+itinerary_function = {
+    "name": "find_itineraries",
+    "description": """
+    Searches the route network for the cheapest or fastest ways to reach a destination,
+    including connections. Used when users ask about stops, layovers, connecting flights
+    or the cheapest way to get somewhere.
+    """,
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "destination_city": {
+                "type": "string",
+                "description": "The destination city or airport code"
+            },
+            "max_stops": {
+                "type": "integer",
+                "description": "Maximum number of stops; omit for no limit"
+            },
+            "optimize": {
+                "type": "string",
+                "enum": ["fare", "duration"],
+                "description": "Rank itineraries by price (default) or by total flying time"
+            },
+            "count": {
+                "type": "integer",
+                "description": "Number of itineraries to return, 1 to 5; default 3"
+            }
+        },
+        "required": ["destination_city"]
+    }
+}
+
+booking_function = {
+    "name": "book_flight",
+    "description": """
+    Process a flight booking with validated passenger details.
+    Called after collecting and validating all required information.
+    Creates a simulation booking with a unique reference number.
+    """,
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "destination_city": {
+                "type": "string",
+                "description": "The destination city for the flight booking"
+            },
+            "passenger_name": {
+                "type": "string",
+                "description": "Full name of the passenger (first and last name required)"
+            },
+            "email": {
+                "type": "string",
+                "description": "Valid email address for booking confirmation"
+            },
+            "travel_date": {
+                "type": "string",
+                "description": "Departure date as YYYY-MM-DD, as quoted; today if none was given"
+            },
+            "cabin": {
+                "type": "string",
+                "enum": ["economy", "premium", "business"],
+                "description": "Cabin class, as quoted"
+            }
+        },
+        "required": ["destination_city", "passenger_name", "email"]
+    }
+}
+
+validation_function = {
+    "name": "validate_info",
+    "description": """
+    Validates passenger information before proceeding with booking.
+    Checks if the name contains at least two words and if the email is properly formatted.
+    Called before finalizing a booking to ensure data quality.
+    """,
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "passenger_name": {
+                "type": "string",
+                "description": "Full name to validate (must contain at least first and last name)"
+            },
+            "email": {
+                "type": "string",
+                "description": "Email address to validate (local part, @ and a domain with a top-level domain)"
+            }
+        },
+        "required": ["passenger_name", "email"]
+    }
+}
+
+# Replies rendered straight from a tool result instead of by a follow-up completion
+PRICE_REPLY_TEMPLATE = "A flight to {city} in {cabin} on {date} would be {price}. Would you like to book this flight?"
+
+def _render_price(result: Dict) -> Optional[str]:
+    """Quote reply for a get_ticket_price result; sold out or unknown fares are left to the model."""
+    if result.get("sold_out") or result["price"] == "Price not available":
+        return None
+    date = datetime.date.fromisoformat(result["travel_date"])
+    return PRICE_REPLY_TEMPLATE.format(city=result["destination_city"], cabin=result["cabin"],
+                                       date=f"{date:%B} {date.day}, {date.year}", price=result["price"])
+
+def _render_booking(result: Dict) -> Optional[str]:
+    """A book_flight result already carries the complete confirmation or sold-out message."""
+    return result.get("message")
+
+# Tool definitions list for OpenAI API
+tools = [
+    {"type": "function", "function": price_function},
+    {"type": "function", "function": bulk_price_function},
+    {"type": "function", "function": cheapest_day_function},
+    {"type": "function", "function": itinerary_function},
+    {"type": "function", "function": booking_function},
+    {"type": "function", "function": validation_function}
+]
+
+# Whether each tool's result can be shown to the user from a template, which
+# skips the follow-up completion: its renderer, returning None when a result
+# needs the model after all, or None when the model always phrases the reply
+TOOL_RENDERERS: Dict[str, Optional[Callable[[Dict], Optional[str]]]] = {
+    "get_ticket_price": _render_price,
+    "get_ticket_prices_bulk": None,
+    "find_cheapest_day": None,
+    "find_itineraries": None,
+    "book_flight": _render_booking,
+    "validate_info": None
+}
+
+# Changes whenever a tool schema changes, so cached replies never outlive the tools they used
+TOOLS_SCHEMA_VERSION = hashlib.sha256(json.dumps(tools, sort_keys=True).encode()).hexdigest()[:12]
+
+BOOKING_LEDGER = BookingLedger(BOOKING_LEDGER_PATH)
+
+# Message buffers per conversation, dropped when the session store evicts the conversation
+_BUFFERS: Dict[str, ConversationBuffer] = {}
+_BUFFERS_LOCK = threading.Lock()
+
+def _drop_buffer(state: BookingState) -> None:
+    with _BUFFERS_LOCK:
+        _BUFFERS.pop(state.conversation_id, None)
+
+# Conversation state per Gradio session
+SESSIONS = SessionManager(BookingState, SESSION_MAX, SESSION_TTL, SESSION_SPILL_PATH, on_evict=_drop_buffer)
+
+RESPONSE_CACHE = (
+    ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_PATH) if RESPONSE_CACHE_ENABLED else None
+)
+
+system_message = """
+You are Sonya, a helpful flight booking assistant. Guide users through the booking process naturally.
+Follow these steps in order:
+1. For price inquiries, use get_ticket_price to provide accurate pricing; to compare several
+   destinations or dates, make one get_ticket_prices_bulk call instead
+2. For validating user info, use validate_info to ensure data quality
+3. For booking flights, use book_flight after all validations pass
+Maintain a friendly and helpful tone throughout the conversation.
+Handle user frustration professionally and offer clear solutions.
+"""
+
+@functools.lru_cache(maxsize=2)
+def _date_message(today: datetime.date) -> Dict:
+    """
+    System message telling the model today's date, so it can resolve relative dates.
+    
+    Args:
+        today (datetime.date): The current date
+        
+    Returns:
+        Dict: System message, one shared object per day
+        
+    It follows the static prefix rather than being part of it, so the cached
+    prefix survives midnight and only this short message changes.
+    """
+    return {
+        "role": "system",
+        "content": (f"Today is {today:%A}, {today.isoformat()}. Resolve relative dates such as "
+                    f"\"next Friday\" against it and pass dates to tools as YYYY-MM-DD.")
+    }
+
+# Tools and system prompt open every completion call, frozen so their bytes never change
+PROMPT_PREFIX = prompt_cache.freeze_prefix(system_message, tools)
+
+# Prompt tokens sent on every call regardless of the conversation
+_TOOLS_TOKENS = estimate_schema_tokens(PROMPT_PREFIX.tools)
+_FIXED_PROMPT_TOKENS = (estimate_tokens(PROMPT_PREFIX.system)
+                        + estimate_tokens(_date_message(datetime.date.today())) + _TOOLS_TOKENS)
+
+def get_ticket_price(city: str, travel_date: Optional[str] = None, cabin: str = "economy") -> str:
+    """
+    Retrieve the ticket price for a given destination.
+    
+    Args:
+        city (str): The destination city, airport, code or alias
+        travel_date (Optional[str]): Departure date as YYYY-MM-DD, today if omitted
+        cabin (str): Cabin class
+        
+    Returns:
+        str: The price for the flight or "Price not available" if not found
+        
+    The city is resolved through DESTINATIONS, then the fare for the route
+    from FARE_ORIGIN on the given date and cabin comes from FARE_PROVIDER:
+    an indexed read of the fare table, or a cached, coalesced lookup on
+    the external fare service when FARE_PROVIDER_URL is set.
+        
+    Example:
+        >>> get_ticket_price("LHR", "2026-03-10")
+        "$799"
+    """
+    destination = DESTINATIONS.resolve(city or "")
+    try:
+        cents = (FARE_PROVIDER.fare(FARE_ORIGIN, destination.code, travel_date, cabin or "economy")
+                 if destination else None)
+    except ValueError:
+        cents = None
+    except Exception as e:
+        logger.error(f"Fare lookup for {city} failed: {e}")
+        cents = None
+    return format_fare(cents) if cents is not None else "Price not available"
+
+def get_ticket_prices_bulk(cities: Optional[List[str]] = None, start_date: Optional[str] = None,
+                           end_date: Optional[str] = None, cabin: str = "economy") -> Dict:
+    """
+    Quote several destinations over a range of travel dates in one pass.
+    
+    Args:
+        cities (Optional[List[str]]): Destination city names, every known destination if omitted
+        start_date (Optional[str]): First departure date as YYYY-MM-DD, today if omitted
+        end_date (Optional[str]): Last departure date, inclusive; start_date if omitted
+        cabin (str): Cabin class
+        
+    Returns:
+        Dict: The quoted range and, per destination, the cheapest price and its
+        date; ranges of up to a week also list the price for every date. An
+        entry of cities that is not a string gets an "error" instead
+        
+    Raises:
+        ValueError: If a date is malformed or the range is longer than BULK_QUOTE_MAX_DAYS
+        
+    The whole destination-by-date matrix comes from one FareTable.fare_matrix() call.
+    """
+    first = datetime.date.fromisoformat(start_date) if start_date else datetime.date.today()
+    last = datetime.date.fromisoformat(end_date) if end_date else first
+    if not 0 <= (last - first).days < BULK_QUOTE_MAX_DAYS:
+        raise ValueError(f"Date range must run forwards and span at most {BULK_QUOTE_MAX_DAYS} days")
+    if cities:
+        if isinstance(cities, str):
+            cities = [cities]
+        invalid = [not isinstance(city, str) for city in cities]
+        resolved = [None if bad else DESTINATIONS.resolve(city) for city, bad in zip(cities, invalid)]
+        cities = [destination.name if destination else city for city, destination in zip(cities, resolved)]
+    else:
+        resolved = DESTINATIONS.destinations
+        invalid = [False] * len(resolved)
+        cities = [destination.name for destination in resolved]
+    codes = [destination.code if destination else None for destination in resolved]
+    rows = FARES.fare_matrix(FARE_ORIGIN, codes, first, last, cabin)
+
+    quotes = []
+    for city, bad, row in zip(cities, invalid, rows):
+        if bad:
+            quotes.append({"destination_city": city, "error": "Destination must be a city name"})
+            continue
+        cheapest = FareTable.cheapest(row)
+        if cheapest is None:
+            quotes.append({"destination_city": city, "price": "Price not available"})
+            continue
+        quote = {
+            "destination_city": city,
+            "price": format_fare(cheapest[1]),
+            "cheapest_date": (first + datetime.timedelta(days=cheapest[0])).isoformat(),
+        }
+        if len(row) <= BULK_QUOTE_DAILY_PRICES_DAYS:
+            quote["prices"] = {
+                (first + datetime.timedelta(days=offset)).isoformat(): format_fare(fare)
+                for offset, fare in enumerate(row) if fare != NO_FARE
+            }
+        quotes.append(quote)
+    return {"cabin": cabin, "start_date": first.isoformat(), "end_date": last.isoformat(), "quotes": quotes}
+
+def find_cheapest_day(city: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                      cabin: str = "economy") -> Dict:
+    """
+    Find the cheapest departure date to a destination within a date window.
+    
+    Args:
+        city (str): Destination city, airport, code or alias
+        start_date (Optional[str]): First departure date as YYYY-MM-DD, today if omitted
+        end_date (Optional[str]): Last departure date, inclusive; CHEAPEST_DAY_DEFAULT_DAYS
+            after start_date if omitted
+        cabin (str): Cabin class
+        
+    Returns:
+        Dict: The window searched, the cheapest date and its price
+        
+    Raises:
+        ValueError: If a date is malformed or end_date is before start_date
+        
+    One range-minimum query on FARE_CALENDAR, whatever the window length.
+    """
+    first = datetime.date.fromisoformat(start_date) if start_date else datetime.date.today()
+    last = (datetime.date.fromisoformat(end_date) if end_date
+            else first + datetime.timedelta(days=CHEAPEST_DAY_DEFAULT_DAYS))
+    if last < first:
+        raise ValueError("end_date is before start_date")
+    destination = DESTINATIONS.resolve(city or "")
+    result = {
+        "destination_city": destination.name if destination else city,
+        "cabin": cabin,
+        "start_date": first.isoformat(),
+        "end_date": last.isoformat(),
+    }
+    cheapest = FARE_CALENDAR.cheapest(FARE_ORIGIN, destination.code, first, last, cabin) if destination else None
+    if cheapest is None:
+        result["price"] = "Price not available"
+    else:
+        result["cheapest_date"] = datetime.date.fromordinal(cheapest[0]).isoformat()
+        result["price"] = format_fare(cheapest[1])
+    return result
+
+def find_itineraries(city: str, max_stops: Optional[int] = None, optimize: str = "fare", count: int = 3) -> Dict:
+    """
+    Find the best itineraries from FARE_ORIGIN to a destination, connections included.
+    
+    Args:
+        city (str): Destination city, alias or airport code
+        max_stops (Optional[int]): Maximum number of stops, unlimited if None
+        optimize (str): "fare" or "duration"
+        count (int): Number of itineraries, capped at ITINERARY_MAX_RESULTS
+        
+    Returns:
+        Dict: Origin, destination and the itineraries, best first, each with
+        its airports, stops, fare and duration
+        
+    Raises:
+        ValueError: If optimize is neither "fare" nor "duration"
+        
+    Example:
+        >>> find_itineraries("tokyo", max_stops=1, count=1)["itineraries"][0]["route"]
+        "NYC → CHI → TYO"
+    """
+    code = (city or "").strip().upper()
+    if code not in ROUTE_GRAPH:
+        destination = DESTINATIONS.resolve(city or "")
+        code = destination.code if destination else code
+    count = max(1, min(int(count), ITINERARY_MAX_RESULTS))
+    itineraries = ROUTE_GRAPH.search(FARE_ORIGIN, code, k=count, max_stops=max_stops, optimize=optimize)
+    return {
+        "origin": FARE_ORIGIN,
+        "destination": code,
+        "itineraries": [
+            {
+                "route": " → ".join(itinerary.airports),
+                "stops": itinerary.stops,
+                "fare": format_fare(itinerary.fare_cents),
+                "duration": f"{itinerary.duration_minutes // 60}h {itinerary.duration_minutes % 60:02d}m",
+            }
+            for itinerary in itineraries
+        ],
+    }
+
+def route_fast_path(message: str, state: Optional[BookingState] = None) -> Optional[str]:
+    """
+    Answer a pure price lookup without calling the model.
+    
+    Args:
+        message (str): Current user message
+        state (Optional[BookingState]): State of the conversation, which gets
+            the same seat hold and quote as a get_ticket_price call
+        
+    Returns:
+        Optional[str]: Templated Sonya reply, or None if the model should handle the message
+        
+    Only short messages that ask for a price and name exactly one known
+    destination, by name, alias or code, qualify; the quote is today's
+    economy fare, so messages naming a date, weekday, month or cabin, or
+    asking for the cheapest option, go to the model and its tools, as do
+    sold out and unpriced flights. Turns served here and turns passed on to
+    the model are counted as "fast_path.local" and "fast_path.model" in metrics.
+    
+    Example:
+        >>> route_fast_path("How much to Tokyo?")
+        "Sonya: A flight to Tokyo in economy on October 17, 2026 would be $1400. Would you like to book this flight?"
+    """
+    if not FAST_PATH_ENABLED:
+        return None
+
+    text = message.lower()
+    destinations = DESTINATIONS.mentions(message) if len(text) <= FAST_PATH_MAX_LENGTH else ()
+    if (len(destinations) != 1
+            or not _PRICE_QUERY_PATTERN.search(text) or _NOT_PRICE_ONLY_PATTERN.search(text)
+            or _NOT_TODAY_ECONOMY_PATTERN.search(text)):
+        metrics.increment("fast_path.model")
+        return None
+
+    result = _quote(destinations.pop().name, datetime.date.today().isoformat(), "economy", state)
+    reply = _render_price(result)
+    if reply is None:
+        metrics.increment("fast_path.model")
+        return None
+    if state:
+        _record_quote(state, result)
+    metrics.increment("fast_path.local")
+    return f"Sonya: {reply}"
+
+def validate_info(name: str, email: str) -> Dict[str, bool]:
+    """
+    Validate passenger name and email format.
+    
+    Args:
+        name (str): Full name of the passenger
+        email (str): Email address for booking confirmation
+        
+    Returns:
+        Dict[str, bool]: Validation results containing:
+            - name_valid: True if name has at least two words of letters
+            - email_valid: True if email is well formed (and, with
+              EMAIL_DELIVERABILITY_CHECK, its domain accepts mail)
+            - all_valid: True if both validations pass
+            
+    Example:
+        >>> validate_info("John Doe", "john@example.com")
+        {"name_valid": True, "email_valid": True, "all_valid": True}
+    """
+    return validate_passenger(name, email, DELIVERABILITY)
+
+def handle_tool_call(tool_call: Dict, state: Optional[BookingState] = None) -> Tuple[Dict, Optional[str]]:
+    """
+    Execute a single tool call from OpenAI's API.
+    
+    Args:
+        tool_call (Dict): One entry of an assistant message's tool_calls, in wire format
+        state (Optional[BookingState]): State of the conversation; bookings are
+            deduplicated per conversation
+        
+    Returns:
+        Tuple[Dict, Optional[str]]: 
+            - Dict: Response data for the tool call
+            - Optional[str]: Destination city if relevant, None otherwise
+            
+    The function handles six types of tool calls:
+    1. get_ticket_price: Retrieves flight prices
+    2. get_ticket_prices_bulk: Compares prices across destinations and dates
+    3. find_cheapest_day: Finds the cheapest date in a window
+    4. find_itineraries: Searches connecting itineraries
+    5. validate_info: Validates passenger information
+    6. book_flight: Processes the final booking
+    
+    Each tool call returns a properly formatted response that includes:
+    - role: "tool"
+    - content: JSON string of the result
+    - tool_call_id: Original call ID from OpenAI
+    - name: Function name that was called
+    
+    Malformed arguments and unknown functions produce an error result, so
+    every tool call the model made still gets an answer. A price quote holds
+    a seat for the conversation in SEATS and a booking commits it; a sold
+    out flight is reported instead of booked, and book_flight only accepts
+    a destination that matches a known name, alias or code exactly.
+    """
+    logger.info(f"Handling tool call: {tool_call}")
+    
+    function_name = tool_call["function"]["name"]
+    try:
+        arguments = json.loads(tool_call["function"]["arguments"] or "{}")
+    except json.JSONDecodeError:
+        return _tool_error(tool_call, "Arguments are not valid JSON"), None
+    
+    if function_name == "get_ticket_price":
+        city = _canonical_city(arguments.get('destination_city'))
+        travel_date = arguments.get('travel_date') or datetime.date.today().isoformat()
+        try:
+            result = _quote(city, travel_date, arguments.get('cabin') or "economy", state)
+        except ValueError as e:
+            return _tool_error(tool_call, str(e)), None
+        response = {
+            "role": "tool",
+            "content": json.dumps(result),
+            "tool_call_id": tool_call["id"],
+            "name": function_name
+        }
+        return response, city
+    
+    elif function_name == "get_ticket_prices_bulk":
+        try:
+            result = get_ticket_prices_bulk(arguments.get('destination_cities'), arguments.get('start_date'),
+                                            arguments.get('end_date'), arguments.get('cabin') or "economy")
+        except ValueError as e:
+            return _tool_error(tool_call, str(e)), None
+        response = {
+            "role": "tool",
+            "content": json.dumps(result),
+            "tool_call_id": tool_call["id"],
+            "name": function_name
+        }
+        return response, None
+    
+    elif function_name == "find_cheapest_day":
+        try:
+            result = find_cheapest_day(arguments.get('destination_city'), arguments.get('start_date'),
+                                       arguments.get('end_date'), arguments.get('cabin') or "economy")
+        except ValueError as e:
+            return _tool_error(tool_call, str(e)), None
+        response = {
+            "role": "tool",
+            "content": json.dumps(result),
+            "tool_call_id": tool_call["id"],
+            "name": function_name
+        }
+        return response, None
+    
+    elif function_name == "find_itineraries":
+        try:
+            result = find_itineraries(arguments.get('destination_city'), arguments.get('max_stops'), arguments.get('optimize') or "fare",
+                                      arguments.get('count') or 3)
+        except (TypeError, ValueError) as e:
+            return _tool_error(tool_call, str(e)), None
+        response = {
+            "role": "tool",
+            "content": json.dumps(result, ensure_ascii=False),
+            "tool_call_id": tool_call["id"],
+            "name": function_name
+        }
+        return response, None
+    
+    elif function_name == "validate_info":
+        name = arguments.get('passenger_name')
+        email = arguments.get('email')
+        validation_result = validate_info(name, email)
+        response = {
+            "role": "tool",
+            "content": json.dumps(validation_result),
+            "tool_call_id": tool_call["id"],
+            "name": function_name
+        }
+        return response, None
+    
+    elif function_name == "book_flight":
+        # Never book a guess: the destination must be a known name, alias or code
+        requested = arguments.get('destination_city')
+        destination = DESTINATIONS.resolve_exact(requested) if isinstance(requested, str) else None
+        if destination is None:
+            suggestion = DESTINATIONS.resolve(requested) if isinstance(requested, str) else None
+            hint = f" Ask the passenger whether they mean {suggestion.name}." if suggestion else ""
+            return _tool_error(tool_call, f"Unknown destination: {requested}.{hint}"), None
+        city = destination.name
+        name = arguments.get('passenger_name')
+        email = arguments.get('email')
+        if not (isinstance(name, str) and name.strip() and isinstance(email, str) and email.strip()):
+            return _tool_error(tool_call, "passenger_name and email are required; collect and validate them first"), None
+        
+        cabin = arguments.get('cabin') or "economy"
+        travel_date = arguments.get('travel_date') or datetime.date.today().isoformat()
+        try:
+            flight = _flight(city, travel_date, cabin)
+        except ValueError as e:
+            return _tool_error(tool_call, str(e)), None
+        price = get_ticket_price(city, flight[2], cabin)
+        if price == "Price not available":
+            return _tool_error(tool_call, f"No {cabin} fare to {city} on {flight[2]}; quote another date or cabin"), None
+        conversation_id = state.conversation_id if state else str(uuid.uuid4())
+
+        # Sell the seat held at quote time, or a free one; once sold out only
+        # a repeat of an existing booking still goes through
+        committed = SEATS.commit(flight, conversation_id)
+        try:
+            if (not committed
+                    and BOOKING_LEDGER.find_booking(conversation_id, city, flight[2], cabin, name, email) is None):
+                response = {
+                    "role": "tool",
+                    "content": json.dumps({
+                        "success": False,
+                        "sold_out": True,
+                        "message": f"Sorry, the {cabin} cabin to {city} on {flight[2]} is sold out."
+                    }),
+                    "tool_call_id": tool_call["id"],
+                    "name": function_name
+                }
+                return response, city
+
+            # Record the booking; repeating the same booking returns the original reference
+            booking_ref, created = BOOKING_LEDGER.record(conversation_id, city, flight[2], cabin, name, email, price)
+        except (FutureTimeoutError, sqlite3.Error) as e:
+            logger.error(f"Booking ledger unavailable for {city} on {flight[2]}: {e}")
+            if committed:
+                SEATS.refund(flight)
+            return _tool_error(tool_call, "The booking could not be recorded and nothing was booked; try again"), None
+        if not created:
+            logger.info(f"Duplicate booking request, returning {booking_ref}")
+            if committed:
+                SEATS.refund(flight)
+            # Confirm what was booked, even if the fare has moved since
+            price = BOOKING_LEDGER.find_by_reference(booking_ref)["price"]
+        
+        response = {
+            "role": "tool",
+            "content": json.dumps({
+                "success": True,
+                "booking_reference": booking_ref,
+                "message": f"SIMULATION - Booking Confirmed!\nDestination: {city.title()}\nDate: {flight[2]}\nCabin: {cabin}\nPassenger: {name}\nEmail: {email}\nPrice: {price}\nBooking Reference: {booking_ref}"
+            }),
+            "tool_call_id": tool_call["id"],
+            "name": function_name
+        }
+        return response, city
+
+    return _tool_error(tool_call, f"Unknown function: {function_name}"), None
+
+def _flight(city: Optional[str], travel_date: Optional[str], cabin: str) -> Optional[Flight]:
+    """
+    Identify the flight a quote or booking is for.
+    
+    Args:
+        city (Optional[str]): Destination as the model gave it
+        travel_date (Optional[str]): Departure date as YYYY-MM-DD, today if omitted
+        cabin (str): Cabin class
+        
+    Returns:
+        Optional[Flight]: (origin, destination code, ISO date, cabin), or None
+        if the destination is not understood
+        
+    Raises:
+        ValueError: If travel_date is malformed or already past; departed
+            flights are pruned from SEATS, so no seat on one may be sold
+    """
+    destination = DESTINATIONS.resolve(city or "")
+    if destination is None:
+        return None
+    today = datetime.date.today()
+    try:
+        date = datetime.date.fromisoformat(travel_date) if travel_date else today
+    except (TypeError, ValueError):
+        raise ValueError(f"travel_date must be a date as YYYY-MM-DD, not {travel_date}") from None
+    if date < today:
+        raise ValueError(f"travel_date {date.isoformat()} has passed; today is {today.isoformat()}")
+    return (FARE_ORIGIN, destination.code, date.isoformat(), cabin)
+
+def _quote(city: Optional[str], travel_date: str, cabin: str, state: Optional[BookingState]) -> Dict:
+    """
+    Price a flight and hold a seat on it for the conversation while the passenger decides.
+    
+    Args:
+        city (Optional[str]): Destination city
+        travel_date (str): Departure date as YYYY-MM-DD
+        cabin (str): Cabin class
+        state (Optional[BookingState]): State of the conversation; no hold without one
+        
+    Returns:
+        Dict: destination_city, travel_date, cabin and price, plus seat_held
+        or sold_out when a seat was asked for
+        
+    Raises:
+        ValueError: If travel_date is malformed or already past
+    """
+    flight = _flight(city, travel_date, cabin)
+    price = get_ticket_price(city, travel_date, cabin)
+    result = {"destination_city": city, "travel_date": travel_date, "cabin": cabin, "price": price}
+    if state and flight and price != "Price not available":
+        if SEATS.hold(flight, state.conversation_id):
+            result["seat_held"] = True
+        else:
+            result["sold_out"] = True
+    return result
+
+def _record_quote(state: BookingState, result: Dict) -> None:
+    """Record a price quote from _quote() in the conversation's BookingState, unless its destination is unknown."""
+    destination = DESTINATIONS.resolve(result["destination_city"] or "")
+    if destination is None:
+        return
+    state.destination = destination.name
+    state.price = result["price"]
+    if state.booking_stage == "initial":
+        state.booking_stage = "quoted"
+
+def _canonical_city(city: Optional[str]) -> Optional[str]:
+    """Canonical name of the destination the model named, or its text as given if it does not resolve."""
+    destination = DESTINATIONS.resolve(city or "")
+    return destination.name if destination else city
+
+def _tool_error(tool_call: Dict, error: str) -> Dict:
+    """Build the tool response reporting that a tool call could not be executed."""
+    return {
+        "role": "tool",
+        "content": json.dumps({"error": error}),
+        "tool_call_id": tool_call["id"],
+        "name": tool_call["function"]["name"]
+    }
+
+def _run_tool_call(tool_call: Dict, state: Optional[BookingState] = None) -> Tuple[Dict, Optional[str]]:
+    """handle_tool_call(), with an unexpected exception reported as this call's tool error."""
+    try:
+        return handle_tool_call(tool_call, state)
+    except Exception as e:
+        logger.error(f"Tool call {tool_call['function']['name']} failed: {str(e)}")
+        metrics.increment("tools.failed")
+        return _tool_error(tool_call, "The tool failed unexpectedly and did nothing; try again"), None
+
+def dispatch_tool_calls(tool_calls: List[Dict],
+                        state: Optional[BookingState] = None) -> List[Tuple[Dict, Optional[str]]]:
+    """
+    Execute every tool call of an assistant message exactly once.
+    
+    Args:
+        tool_calls (List[Dict]): The assistant message's tool_calls, in wire format
+        state (Optional[BookingState]): State of the conversation making the calls
+        
+    Returns:
+        List[Tuple[Dict, Optional[str]]]: handle_tool_call() results in the order of tool_calls
+        
+    Parallel tool calls run concurrently on the shared tool thread pool. A
+    call that raises gets a tool error of its own; the other results, e.g.
+    bookings already committed, are still returned.
+    """
+    if len(tool_calls) == 1:
+        return [_run_tool_call(tool_calls[0], state)]
+    return list(_TOOL_EXECUTOR.map(_run_tool_call, tool_calls, [state] * len(tool_calls)))
+
+async def adispatch_tool_calls(tool_calls: List[Dict],
+                               state: Optional[BookingState] = None) -> List[Tuple[Dict, Optional[str]]]:
+    """
+    Asynchronous counterpart of dispatch_tool_calls() for the event-loop paths.
+    
+    Args:
+        tool_calls (List[Dict]): The assistant message's tool_calls, in wire format
+        state (Optional[BookingState]): State of the conversation making the calls
+        
+    Returns:
+        List[Tuple[Dict, Optional[str]]]: handle_tool_call() results in the order of tool_calls
+        
+    Even a single call runs on the tool thread pool, so a booking waiting for
+    its ledger commit never blocks the event loop. As there, a call that
+    raises gets a tool error of its own.
+    """
+    loop = asyncio.get_running_loop()
+    return list(await asyncio.gather(
+        *(loop.run_in_executor(_TOOL_EXECUTOR, _run_tool_call, tool_call, state) for tool_call in tool_calls)
+    ))
+
+def _get_conversation(history: History,
+                      request: Optional[gr.Request]) -> Tuple[BookingState, ConversationBuffer]:
+    """
+    Find the booking state and message buffer of the conversation this turn belongs to.
+    
+    Args:
+        history (History): Conversation history as (user, assistant) pairs or Gradio message dicts
+        request (Optional[gr.Request]): Gradio request identifying the browser session
+        
+    Returns:
+        Tuple[BookingState, ConversationBuffer]: The session's state and buffer, synced
+        with history; without a session, a fresh state and a buffer built from history
+    """
+    session_hash = getattr(request, "session_hash", None)
+    if not session_hash:
+        return BookingState(), ConversationBuffer.from_history(PROMPT_PREFIX.system, history)
+
+    state = SESSIONS.get(session_hash)
+    with _BUFFERS_LOCK:
+        buffer = _BUFFERS.get(state.conversation_id)
+        if buffer is None:
+            buffer = _BUFFERS[state.conversation_id] = ConversationBuffer(PROMPT_PREFIX.system)
+    buffer.sync(history)
+    return state, buffer
+
+def _update_booking_state(state: BookingState, tool_call: Dict, response: Dict) -> None:
+    """
+    Record the facts a tool call established in the conversation's BookingState.
+    
+    Args:
+        state (BookingState): State of the conversation
+        tool_call (Dict): Tool call in wire format
+        response (Dict): Tool response from handle_tool_call()
+    """
+    result = json.loads(response["content"])
+    if "error" in result:
+        return
+    function_name = tool_call["function"]["name"]
+    if function_name == "get_ticket_price":
+        _record_quote(state, result)
+    elif function_name == "validate_info" and result["all_valid"]:
+        arguments = json.loads(tool_call["function"]["arguments"])
+        state.name = arguments.get("passenger_name")
+        state.email = arguments.get("email")
+        state.booking_stage = "validated"
+    elif function_name == "book_flight" and result.get("success"):
+        arguments = json.loads(tool_call["function"]["arguments"])
+        # Canonical name, not the model's spelling; book_flight only books exact matches
+        state.destination = DESTINATIONS.resolve_exact(arguments.get("destination_city")).name
+        state.name = arguments.get("passenger_name")
+        state.email = arguments.get("email")
+        state.booking_stage = "booked"
+
+def _prompt_messages(state: BookingState, buffer: ConversationBuffer) -> Tuple[List[Dict], Optional[Dict]]:
+    """
+    Select the messages to send so the prompt stays within CONTEXT_TOKEN_BUDGET.
+    
+    Args:
+        state (BookingState): State of the conversation
+        buffer (ConversationBuffer): Conversation so far
+        
+    Returns:
+        Tuple[List[Dict], Optional[Dict]]: Messages for the API call, and the
+        summary message standing in for folded turns (None if nothing was folded)
+        
+    The system message, today's date and the most recent CONTEXT_KEEP_TURNS
+    turns are always sent verbatim; older turns that do not fit are folded,
+    CONTEXT_FOLD_TURNS at a time, into a summary built from the facts held in
+    BookingState. The summary is only rebuilt when more turns are folded, so
+    the prompt up to the first verbatim turn is identical between folds.
+    """
+    head = [buffer.messages[0], _date_message(datetime.date.today())]
+    budget = CONTEXT_TOKEN_BUDGET - _FIXED_PROMPT_TOKENS - SUMMARY_RESERVE_TOKENS
+    start, folded = buffer.window(budget, CONTEXT_KEEP_TURNS, CONTEXT_FOLD_TURNS)
+    if not folded:
+        return head + buffer.messages[1:], None
+
+    metrics.increment("context.folded_turns", folded)
+    if buffer.summary is None or buffer.summary[0] != folded:
+        buffer.summary = (folded, build_summary(
+            state.destination, state.price, state.name, state.email, state.booking_stage
+        ))
+    summary = buffer.summary[1]
+    return head + [summary] + buffer.messages[start:], summary
+
+def _assistant_message_dict(message) -> Dict:
+    """
+    Convert an assistant message to OpenAI wire format.
+    
+    Args:
+        message: OpenAI's message object, with or without tool calls
+        
+    Returns:
+        Dict: Message with plain-dict tool calls, as accumulated by the streaming path
+    """
+    assistant_message = {"role": "assistant", "content": message.content}
+    if message.tool_calls:
+        assistant_message["tool_calls"] = [
+            {
+                "id": tool_call.id,
+                "type": "function",
+                "function": {"name": tool_call.function.name, "arguments": tool_call.function.arguments}
+            }
+            for tool_call in message.tool_calls
+        ]
+    return assistant_message
+
+def _format_reply(content: str) -> str:
+    """Prefix the assistant's reply with "Sonya:" unless the model already did."""
+    if not content.startswith("Sonya:"):
+        content = f"Sonya: {content}"
+    return content
+
+def _completion_kwargs(state: BookingState, use_tools: bool, stream: bool = False) -> Dict:
+    """
+    Tool and prompt caching parameters of a completion call.
+    
+    Args:
+        state (BookingState): State of the conversation
+        use_tools (bool): Whether the model may call tools
+        stream (bool): Whether the call streams, and must be asked for its usage
+        
+    Returns:
+        Dict: Keyword arguments for chat.completions.create()
+        
+    The follow-up call after tools ran sends the same frozen tool definitions
+    with tool_choice="none" rather than none at all: leaving them out would
+    change the prompt's first bytes and lose the provider's cached prefix.
+    """
+    kwargs = {"tools": PROMPT_PREFIX.tools, "tool_choice": "auto" if use_tools else "none"}
+    extra_body = {}
+    if PROMPT_CACHE_KEY_ENABLED:
+        extra_body["prompt_cache_key"] = f"{PROMPT_PREFIX.fingerprint}-{state.conversation_id}"
+    if stream:
+        extra_body["stream_options"] = {"include_usage": True}
+    if extra_body:
+        kwargs["extra_body"] = extra_body
+    return kwargs
+
+def _cache_key(buffer: ConversationBuffer, summary: Optional[Dict], use_tools: bool) -> Optional[str]:
+    """Response cache key for a completion call, or None when caching is disabled."""
+    if RESPONSE_CACHE is None:
+        return None
+    return RESPONSE_CACHE.key_for_digest(
+        buffer.digest(), model=MODEL, tools=TOOLS_SCHEMA_VERSION if use_tools else None,
+        summary=summary and summary["content"], today=datetime.date.today().isoformat()
+    )
+
+def _direct_reply(tool_calls: List[Dict], results: List[Tuple[Dict, Optional[str]]]) -> Optional[str]:
+    """
+    Render the reply to a turn straight from its tool result, when possible.
+    
+    Args:
+        tool_calls (List[Dict]): Tool calls the model made this turn
+        results (List[Tuple[Dict, Optional[str]]]): Their handle_tool_call() results
+        
+    Returns:
+        Optional[str]: The reply, or None when the follow-up completion is needed
+        
+    Only a turn with a single tool call whose tool has a renderer in
+    TOOL_RENDERERS qualifies. Counted in metrics as "direct_render.rendered"
+    (a completion call avoided) or "direct_render.model".
+    """
+    if not DIRECT_RENDER_ENABLED:
+        return None
+    reply = None
+    if len(tool_calls) == 1:
+        renderer = TOOL_RENDERERS.get(tool_calls[0]["function"]["name"])
+        result = json.loads(results[0][0]["content"])
+        if renderer is not None and "error" not in result:
+            reply = renderer(result)
+    metrics.increment("direct_render.rendered" if reply else "direct_render.model")
+    return reply
+
+def _turn_priority(message: str, state: BookingState) -> int:
+    """Scheduling class of a turn: BOOKING when it moves a booking forward, else BROWSING."""
+    if _BOOKING_TURN_PATTERN.search(message) and (state.booking_stage != "initial" or "@" in message):
+        return BOOKING
+    return BROWSING
+
+def _follow_up_priority(priority: int, tool_calls: List[Dict]) -> int:
+    """Scheduling class of the call after tools ran; booking tools promote it."""
+    if any(tool_call["function"]["name"] in _BOOKING_TOOLS for tool_call in tool_calls):
+        return BOOKING
+    return priority
+
+def _reserve_tokens(messages: List[Dict]) -> int:
+    """Tokens a completion call is expected to use, prompt and reply."""
+    return sum(map(estimate_tokens, messages)) + _TOOLS_TOKENS + COMPLETION_TOKENS_ESTIMATE
+
+def _record_usage(reserved: int, usage) -> None:
+    """Export the call's prompt caching and settle its rate limiter reservation with the usage the API reported."""
+    prompt_cache.record_usage(usage)
+    if RATE_LIMITER is not None and usage is not None:
+        RATE_LIMITER.settle(reserved, usage.total_tokens)
+
+def _complete(state: BookingState, buffer: ConversationBuffer, use_tools: bool, priority: int = BROWSING) -> Dict:
+    """
+    Get the assistant's next message, from the response cache when possible.
+    
+    Args:
+        state (BookingState): State of the conversation
+        buffer (ConversationBuffer): Conversation so far
+        use_tools (bool): Whether to offer the tool definitions
+        priority (int): Rate limiter class of the call, BOOKING or BROWSING
+        
+    Returns:
+        Dict: Assistant message in wire format
+    """
+    messages, summary = _prompt_messages(state, buffer)
+    key = _cache_key(buffer, summary, use_tools)
+    assistant_message = RESPONSE_CACHE.get(key) if key else None
+    if assistant_message is None:
+        reserved = _reserve_tokens(messages)
+        if RATE_LIMITER is not None:
+            RATE_LIMITER.acquire(reserved, priority)
+        response = COMPLETIONS.call(
+            openai.chat.completions.create,
+            model=MODEL,
+            messages=messages,
+            **_completion_kwargs(state, use_tools)
+        )
+        _record_usage(reserved, response.usage)
+        assistant_message = _assistant_message_dict(response.choices[0].message)
+        if key:
+            RESPONSE_CACHE.put(key, assistant_message)
+    return assistant_message
+
+async def _acomplete(state: BookingState, buffer: ConversationBuffer, use_tools: bool,
+                     priority: int = BROWSING) -> Dict:
+    """Asynchronous counterpart of _complete()."""
+    messages, summary = _prompt_messages(state, buffer)
+    key = _cache_key(buffer, summary, use_tools)
+    assistant_message = RESPONSE_CACHE.get(key) if key else None
+    if assistant_message is None:
+        reserved = _reserve_tokens(messages)
+        if RATE_LIMITER is not None:
+            await RATE_LIMITER.aacquire(reserved, priority)
+        response = await COMPLETIONS.acall(
+            async_openai.chat.completions.create,
+            model=MODEL,
+            messages=messages,
+            **_completion_kwargs(state, use_tools)
+        )
+        _record_usage(reserved, response.usage)
+        assistant_message = _assistant_message_dict(response.choices[0].message)
+        if key:
+            RESPONSE_CACHE.put(key, assistant_message)
+    return assistant_message
+
+def chat(message: str, history: History, request: Optional[gr.Request] = None) -> str:
+    """
+    Process chat messages and handle tool calling sequence.
+    
+    Args:
+        message (str): Current user message
+        history (History): Conversation history as (user, assistant) pairs or Gradio message dicts
+        request (Optional[gr.Request]): Gradio request, used to find the session's message buffer
+        
+    Returns:
+        str: Assistant's response
+        
+    Flow:
+    0. Answers simple price lookups locally via route_fast_path()
+    1. Appends the message to the session's buffer, which keeps earlier
+       tool calls and results (rebuilt from history when there is no session),
+       folding the oldest turns into a summary beyond the token budget
+    2. Makes initial API call with tool definitions
+    3. If tool calls are present:
+       - Adds assistant's message to conversation
+       - Processes all tool calls concurrently
+       - Renders the reply from a single tool's result when TOOL_RENDERERS
+         allows it, otherwise gets final response after tool execution
+    4. Formats and returns the final response
+    
+    Both API calls are served from the response cache when an equivalent
+    request was answered recently.
+    
+    Model calls wait for RATE_LIMITER when client-side limits are set, booking
+    turns ahead of browsing ones, and run under COMPLETIONS: a deadline,
+    retries with backoff on rate limits and server errors, a circuit breaker
+    and optional hedging.
+    
+    Error Handling:
+    - Catches and logs all exceptions
+    - Asks the user to retry shortly when the rate limiter sheds the turn
+    - Says the service is unavailable when the deadline passes or the circuit is open
+    - Returns apologetic message on other errors
+    """
+    buffer = None
+    try:
+        state, buffer = _get_conversation(history, request)
+        buffer.begin_turn(message)
+
+        fast_reply = route_fast_path(message, state)
+        if fast_reply:
+            buffer.end_turn(fast_reply)
+            return fast_reply
+
+        # Get initial response
+        priority = _turn_priority(message, state)
+        assistant_message = _complete(state, buffer, use_tools=True, priority=priority)
+
+        # Handle tool calls if any
+        if assistant_message.get("tool_calls"):
+            # Add the assistant's message with the tool calls
+            buffer.append(assistant_message)
+            
+            # Handle all tool calls concurrently
+            tool_calls = assistant_message["tool_calls"]
+            results = dispatch_tool_calls(tool_calls, state)
+            for tool_call, (response_data, city) in zip(tool_calls, results):
+                buffer.append(response_data)
+                _update_booking_state(state, tool_call, response_data)
+            
+            # Get final response after tool execution, unless the result alone determines it
+            rendered = _direct_reply(tool_calls, results)
+            if rendered:
+                assistant_message = {"role": "assistant", "content": rendered}
+            else:
+                assistant_message = _complete(state, buffer, use_tools=False,
+                                              priority=_follow_up_priority(priority, tool_calls))
+
+        reply = _format_reply(assistant_message["content"])
+        buffer.end_turn(reply)
+        return reply
+
+    except RateLimitedError as e:
+        logger.warning(f"Turn shed in chat: {str(e)}")
+        return BUSY_REPLY
+    except (CircuitOpenError, DeadlineExceededError) as e:
+        logger.error(f"Model unavailable in chat: {str(e)}")
+        return MODEL_UNAVAILABLE_REPLY
+    except Exception as e:
+        logger.error(f"Error in chat: {str(e)}")
+        return "Sonya: I apologize, but I encountered an error. Please try again."
+    finally:
+        if buffer is not None:
+            buffer.rollback()
+
+async def achat(message: str, history: History, request: Optional[gr.Request] = None) -> str:
+    """
+    Asynchronous counterpart of chat() built on AsyncOpenAI.
+    
+    Args:
+        message (str): Current user message
+        history (History): Conversation history as (user, assistant) pairs or Gradio message dicts
+        request (Optional[gr.Request]): Gradio request, used to find the session's message buffer
+        
+    Returns:
+        str: Assistant's response
+        
+    Both completion calls are awaited on the event loop instead of blocking a
+    worker thread, so a single process can serve many conversations at once.
+    Parallel tool calls are awaited together between the two calls.
+    Error handling matches chat().
+    """
+    buffer = None
+    try:
+        state, buffer = _get_conversation(history, request)
+        buffer.begin_turn(message)
+
+        fast_reply = route_fast_path(message, state)
+        if fast_reply:
+            buffer.end_turn(fast_reply)
+            return fast_reply
+
+        # Get initial response
+        priority = _turn_priority(message, state)
+        assistant_message = await _acomplete(state, buffer, use_tools=True, priority=priority)
+
+        # Handle tool calls if any
+        if assistant_message.get("tool_calls"):
+            # Add the assistant's message with the tool calls
+            buffer.append(assistant_message)
+            
+            # Handle all tool calls concurrently
+            tool_calls = assistant_message["tool_calls"]
+            results = await adispatch_tool_calls(tool_calls, state)
+            for tool_call, (response_data, city) in zip(tool_calls, results):
+                buffer.append(response_data)
+                _update_booking_state(state, tool_call, response_data)
+            
+            # Get final response after tool execution, unless the result alone determines it
+            rendered = _direct_reply(tool_calls, results)
+            if rendered:
+                assistant_message = {"role": "assistant", "content": rendered}
+            else:
+                assistant_message = await _acomplete(state, buffer, use_tools=False,
+                                                     priority=_follow_up_priority(priority, tool_calls))
+
+        reply = _format_reply(assistant_message["content"])
+        buffer.end_turn(reply)
+        return reply
+
+    except RateLimitedError as e:
+        logger.warning(f"Turn shed in achat: {str(e)}")
+        return BUSY_REPLY
+    except (CircuitOpenError, DeadlineExceededError) as e:
+        logger.error(f"Model unavailable in achat: {str(e)}")
+        return MODEL_UNAVAILABLE_REPLY
+    except Exception as e:
+        logger.error(f"Error in achat: {str(e)}")
+        return "Sonya: I apologize, but I encountered an error. Please try again."
+    finally:
+        if buffer is not None:
+            buffer.rollback()
+
+def _accumulate_tool_call_deltas(tool_calls: List[Dict], deltas) -> None:
+    """
+    Merge streamed tool-call fragments into complete tool calls.
+    
+    Args:
+        tool_calls (List[Dict]): Tool calls assembled so far, in wire format
+        deltas: Tool-call deltas from one streamed chunk
+        
+    The first fragment of each call carries its id and function name; later
+    fragments for the same index only carry pieces of the JSON arguments.
+    """
+    for delta in deltas:
+        while len(tool_calls) <= delta.index:
+            tool_calls.append({"id": "", "type": "function", "function": {"name": "", "arguments": ""}})
+        tool_call = tool_calls[delta.index]
+        if delta.id:
+            tool_call["id"] = delta.id
+        if delta.function:
+            if delta.function.name:
+                tool_call["function"]["name"] += delta.function.name
+            if delta.function.arguments:
+                tool_call["function"]["arguments"] += delta.function.arguments
+
+async def _stream_reply(stream, assistant_message: Dict, usage: List) -> AsyncIterator[str]:
+    """
+    Consume a streamed completion, yielding the formatted reply as it grows.
+    
+    Args:
+        stream: Chunks of an AsyncOpenAI chat completion stream
+        assistant_message (Dict): Filled in with the final content and tool calls
+        usage (List): Receives the usage reported by the stream's last chunk, if any
+        
+    Yields:
+        str: The "Sonya:"-prefixed reply so far
+        
+    Nothing is yielded until the reply is long enough to tell whether the
+    model already wrote the "Sonya:" prefix itself, so the prefix is added once.
+    """
+    content = ""
+    async for chunk in stream:
+        if getattr(chunk, "usage", None) is not None:
+            usage.append(chunk.usage)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta.tool_calls:
+            _accumulate_tool_call_deltas(assistant_message["tool_calls"], delta.tool_calls)
+        if delta.content:
+            content += delta.content
+            if len(content) >= len("Sonya:") or not "Sonya:".startswith(content):
+                yield _format_reply(content)
+    assistant_message["content"] = content or None
+    if content and len(content) < len("Sonya:") and "Sonya:".startswith(content):
+        yield _format_reply(content)
+
+async def _astream_complete(state: BookingState, buffer: ConversationBuffer, use_tools: bool,
+                            assistant_message: Dict, priority: int = BROWSING) -> AsyncIterator[str]:
+    """
+    Streaming counterpart of _acomplete().
+    
+    Args:
+        state (BookingState): State of the conversation
+        buffer (ConversationBuffer): Conversation so far
+        use_tools (bool): Whether to offer the tool definitions
+        assistant_message (Dict): Filled in with the assistant message in wire format
+        priority (int): Rate limiter class of the call, BOOKING or BROWSING
+        
+    Yields:
+        str: The "Sonya:"-prefixed reply so far; a cached reply arrives in one piece
+    """
+    messages, summary = _prompt_messages(state, buffer)
+    key = _cache_key(buffer, summary, use_tools)
+    cached = RESPONSE_CACHE.get(key) if key else None
+    if cached is not None:
+        assistant_message.update(cached)
+        if cached["content"]:
+            yield _format_reply(cached["content"])
+        return
+
+    reserved = _reserve_tokens(messages)
+    if RATE_LIMITER is not None:
+        await RATE_LIMITER.aacquire(reserved, priority)
+    # The deadline covers reading the stream too, so a stalled stream is cut off
+    stream = COMPLETIONS.astream(
+        async_openai.chat.completions.create,
+        model=MODEL,
+        messages=messages,
+        stream=True,
+        **_completion_kwargs(state, use_tools, stream=True)
+    )
+    assistant_message.update({"role": "assistant", "content": None, "tool_calls": []})
+    usage = []
+    async for partial in _stream_reply(stream, assistant_message, usage):
+        yield partial
+    _record_usage(reserved, usage[0] if usage else None)
+    if not assistant_message["tool_calls"]:
+        del assistant_message["tool_calls"]
+    if key:
+        RESPONSE_CACHE.put(key, dict(assistant_message))
+
+async def achat_stream(message: str, history: History,
+                       request: Optional[gr.Request] = None) -> AsyncIterator[str]:
+    """
+    Streaming counterpart of achat() for gr.ChatInterface.
+    
+    Args:
+        message (str): Current user message
+        history (History): Conversation history as (user, assistant) pairs or Gradio message dicts
+        request (Optional[gr.Request]): Gradio request, used to find the session's message buffer
+        
+    Yields:
+        str: The assistant's response so far, prefixed with "Sonya:"
+        
+    Both completion calls use stream=True. Text from the first call is shown
+    as it arrives; if that call requests tools, their arguments are assembled
+    from the streamed deltas, the tools run, and the final reply streams in
+    its place. Error handling matches chat().
+    """
+    buffer = None
+    try:
+        state, buffer = _get_conversation(history, request)
+        buffer.begin_turn(message)
+
+        fast_reply = route_fast_path(message, state)
+        if fast_reply:
+            buffer.end_turn(fast_reply)
+            yield fast_reply
+            return
+
+        # Stream initial response
+        priority = _turn_priority(message, state)
+        assistant_message = {}
+        async for partial in _astream_complete(state, buffer, True, assistant_message, priority):
+            yield partial
+
+        # Handle tool calls if any
+        if assistant_message.get("tool_calls"):
+            buffer.append(assistant_message)
+            
+            # Handle all tool calls concurrently
+            tool_calls = assistant_message["tool_calls"]
+            results = await adispatch_tool_calls(tool_calls, state)
+            for tool_call, (response_data, city) in zip(tool_calls, results):
+                buffer.append(response_data)
+                _update_booking_state(state, tool_call, response_data)
+            
+            # Stream final response after tool execution, unless the result alone determines it
+            rendered = _direct_reply(tool_calls, results)
+            if rendered:
+                assistant_message = {"role": "assistant", "content": rendered}
+                yield _format_reply(rendered)
+            else:
+                assistant_message = {}
+                async for partial in _astream_complete(state, buffer, False, assistant_message,
+                                                       _follow_up_priority(priority, tool_calls)):
+                    yield partial
+
+        buffer.end_turn(_format_reply(assistant_message["content"] or ""))
+
+    except RateLimitedError as e:
+        logger.warning(f"Turn shed in achat_stream: {str(e)}")
+        yield BUSY_REPLY
+    except (CircuitOpenError, DeadlineExceededError) as e:
+        logger.error(f"Model unavailable in achat_stream: {str(e)}")
+        yield MODEL_UNAVAILABLE_REPLY
+    except Exception as e:
+        logger.error(f"Error in achat_stream: {str(e)}")
+        yield "Sonya: I apologize, but I encountered an error. Please try again."
+    finally:
+        if buffer is not None:
+            buffer.rollback()
+
+@asynccontextmanager
+async def _prewarm_connections(app: FastAPI):
+    """
+    Open OpenAI connections before the first chat arrives.
+    
+    The async client is warmed on the server's own event loop, which is the
+    loop that will use its connections.
+    """
+    if OPENAI_PREWARM_CONNECTIONS > 0:
+        url = str(openai.base_url)
+        warmed = await asyncio.gather(
+            asyncio.to_thread(prewarm, OPENAI_HTTP_CLIENT, url, OPENAI_PREWARM_CONNECTIONS),
+            aprewarm(OPENAI_ASYNC_HTTP_CLIENT, url, OPENAI_PREWARM_CONNECTIONS)
+        )
+        logger.info(f"Pre-warmed {sum(warmed)} connections to {url}")
+    yield
+
+# Launch Gradio interface
+def create_app(demo: gr.Blocks) -> FastAPI:
+    """
+    Serve the Gradio app together with the JSON API.
+    
+    Args:
+        demo (gr.Blocks): The chat interface
+        
+    Returns:
+        FastAPI: App serving destination autocomplete at /api/destinations,
+        the process metrics at /api/metrics and the chat interface at /, with
+        OpenAI connections pre-warmed on startup
+    """
+    app = FastAPI(title="CrewAIR Booking Assistant", lifespan=_prewarm_connections)
+    app.include_router(autocomplete_router(AUTOCOMPLETE))
+
+    @app.get("/api/metrics")
+    async def read_metrics() -> Dict:
+        # Copies taken under the metrics lock, so the handler never blocks for long
+        return {"counters": metrics.snapshot(), "histograms": metrics.histograms()}
+
+    return gr.mount_gradio_app(app, demo, path="/")
+
+def main():
+    """
+    Initialize and launch the Gradio chat interface.
+    
+    Features:
+    - Streaming async chat handler without a per-event concurrency limit
+    - Dark mode enforcement
+    - Custom title and description
+    - Disabled flagging
+    - Continuous chat session
+    - Destination autocomplete API mounted next to the chat
+    """
+    force_dark_mode = """
+    function refresh() {
+        const url = new URL(window.location);
+        if (url.searchParams.get('__theme') !== 'dark') {
+            url.searchParams.set('__theme', 'dark');
+            window.location.href = url.href;
+        }
+    }
+    """
+    demo = gr.ChatInterface(
+        fn=achat_stream,
+        title="CrewAIR Booking Assistant - Sonya",
+        description="This is a simulation. No real bookings are made.", flagging_mode="never", js=force_dark_mode,
+        concurrency_limit=None  # achat_stream never blocks a worker thread, so don't queue conversations
+    )
+    uvicorn.run(create_app(demo), host=SERVER_NAME, port=SERVER_PORT)
+
+if __name__ == "__main__":
+    main()
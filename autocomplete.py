@@ -0,0 +1,99 @@
+"""
+Destination type-ahead.
+Every destination name, code and alias, and each word suffix of multi-word
+names ("gaulle" for "Charles de Gaulle"), is normalized into one sorted
+array. A prefix query is two binary searches for the matching range, and
+the range is ranked by destination popularity, so completions never touch
+the model. Served over HTTP by autocomplete_router(), mounted next to the
+Gradio app.
+"""
+
+import heapq
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from fastapi import APIRouter, Query
+
+from destination_resolver import DestinationResolver, normalize
+
+# Which label is shown when several labels of one destination match
+_NAME, _CODE, _ALIAS = 0, 1, 2
+
+class DestinationAutocomplete:
+    """
+    Sorted-array prefix index over destination labels.
+
+    Attributes:
+        resolver (DestinationResolver): Source of destinations and aliases
+        max_results (int): Upper bound on the k a caller may ask for
+    """
+    def __init__(self, resolver: DestinationResolver, max_results: int = 20, cache_size: int = 4096):
+        self.resolver = resolver
+        self.max_results = max_results
+        entries: List[Tuple[str, int, int, str]] = []
+        for position, destination in enumerate(resolver.destinations):
+            labels = [(destination.name, _NAME), (destination.code, _CODE)]
+            labels += [(alias, _ALIAS) for alias in resolver.aliases.get(destination.code, ())]
+            for label, kind in labels:
+                words = normalize(label).split()
+                for start in range(len(words)):
+                    entries.append((" ".join(words[start:]), position, kind, label))
+        entries.sort()
+        self._keys = [key for key, _, _, _ in entries]
+        self._entries = [(position, kind, label) for _, position, kind, label in entries]
+        self.complete = lru_cache(maxsize=cache_size)(self._complete)
+
+    def _complete(self, prefix: str, k: int = 5) -> Tuple[Dict[str, str], ...]:
+        """
+        Complete a partially typed destination.
+
+        Args:
+            prefix (str): Text typed so far, in any case or accents
+            k (int): Number of completions, capped at max_results
+
+        Returns:
+            Tuple[Dict[str, str], ...]: Up to k destinations as code, name and
+            the matched label, most popular first
+
+        Exposed as complete(), wrapped in an LRU cache.
+        """
+        key = normalize(prefix)
+        if not key:
+            return ()
+        low = bisect_left(self._keys, key)
+        high = bisect_left(self._keys, key + "\U0010ffff", low)
+
+        # Best label per destination within the matching range
+        best: Dict[int, Tuple[int, str]] = {}
+        for position, kind, label in self._entries[low:high]:
+            if position not in best or kind < best[position][0]:
+                best[position] = (kind, label)
+
+        destinations = self.resolver.destinations
+        top = heapq.nsmallest(min(k, self.max_results), best,
+                              key=lambda position: (-destinations[position].popularity, position))
+        return tuple(
+            {"code": destinations[position].code, "name": destinations[position].name, "label": best[position][1]}
+            for position in top
+        )
+
+def autocomplete_router(autocomplete: DestinationAutocomplete, path: str = "/api/destinations") -> APIRouter:
+    """
+    Build the HTTP routes for destination type-ahead.
+
+    Args:
+        autocomplete (DestinationAutocomplete): Index to query
+        path (str): Route of the endpoint
+
+    Returns:
+        APIRouter: Router serving GET {path}?q=<prefix>&k=<count>
+    """
+    router = APIRouter()
+
+    @router.get(path)
+    async def complete_destinations(q: str = Query("", max_length=100), k: int = Query(5, ge=1)) -> Dict:
+        # Pure in-memory lookup, so it runs on the event loop without a thread hop
+        return {"query": q, "results": list(autocomplete.complete(q, k))}
+
+    return router
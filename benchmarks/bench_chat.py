@@ -0,0 +1,63 @@
+"""
+Throughput benchmark: synchronous chat() versus asynchronous achat().
+Both handlers run against the local mock completions server. chat() is driven
+from a fixed-size thread pool (the way Gradio runs sync handlers) and achat()
+from a single event loop.
+
+Usage:
+    python -m benchmarks.bench_chat --requests 400 --concurrency 200 --latency 1.0
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.mock_openai_server import start_server
+
+def run_sync(agent, requests: int, workers: int) -> float:
+    """Run chat() requests on a thread pool and return requests per second."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        replies = list(pool.map(lambda i: agent.chat(f"Hello #{i}", []), range(requests)))
+    elapsed = time.perf_counter() - started
+    assert all(not r.startswith("Sonya: I apologize") for r in replies), "chat() returned errors"
+    return requests / elapsed
+
+async def run_async(agent, requests: int, concurrency: int) -> float:
+    """Run achat() requests on one event loop and return requests per second."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> str:
+        async with semaphore:
+            return await agent.achat(f"Hello #{i}", [])
+
+    started = time.perf_counter()
+    replies = await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    assert all(not r.startswith("Sonya: I apologize") for r in replies), "achat() returned errors"
+    return requests / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200, help="in-flight achat() calls")
+    parser.add_argument("--workers", type=int, default=40, help="threads for chat() (Gradio's default pool size)")
+    parser.add_argument("--latency", type=float, default=1.0, help="mock seconds per completion")
+    args = parser.parse_args()
+
+    _, base_url = start_server(latency=args.latency)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "mock"
+    import CrewAIR_Agent as agent
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    sync_rps = run_sync(agent, args.requests, args.workers)
+    async_rps = asyncio.run(run_async(agent, args.requests, args.concurrency))
+    print(f"chat()  sync, {args.workers} threads: {sync_rps:8.1f} req/s")
+    print(f"achat() async, {args.concurrency} in flight: {async_rps:8.1f} req/s ({async_rps / sync_rps:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Prompt size and latency against turn count, with and without the token budget.
+Drives one long booking conversation through chat() against the local mock
+completions server, whose latency grows with the prompt like real prefill.
+With the budget disabled the prompt grows with every turn; with it enabled
+the prompt levels off once older turns are folded into a summary. The
+cached column is how much of each prompt the mock's prefix cache served.
+
+Usage:
+    python -m benchmarks.bench_context --turns 60 --budget 2500
+"""
+
+import argparse
+import logging
+import os
+import time
+from types import SimpleNamespace
+
+from benchmarks.mock_openai_server import start_server
+
+USER_TURN = (
+    "I'm still comparing options for a trip in the spring with my family, we care about "
+    "flexible dates, decent seats and not too many connections. What would you suggest next? "
+)
+
+def run_conversation(agent, server, turns: int, session: str):
+    """Return (prompt tokens, cached tokens, latency ms) for each turn of one conversation."""
+    history, samples = [], []
+    request = SimpleNamespace(session_hash=session)
+    for turn in range(turns):
+        message = f"{USER_TURN}(turn {turn})"
+        started = time.perf_counter()
+        reply = agent.chat(message, history, request)
+        samples.append((server.prompt_tokens[-1], server.cached_tokens[-1], (time.perf_counter() - started) * 1000))
+        history.append((message, reply))
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--budget", type=int, default=2500, help="prompt token budget when enabled")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock base seconds per completion")
+    parser.add_argument("--prompt-latency", type=float, default=0.05, help="mock seconds per 1000 prompt tokens")
+    parser.add_argument("--every", type=int, default=10, help="print every N-th turn")
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=args.latency, prompt_latency=args.prompt_latency)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "mock"
+    import CrewAIR_Agent as agent
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    agent.RESPONSE_CACHE = None
+
+    agent.CONTEXT_TOKEN_BUDGET = 10 ** 9
+    unbounded = run_conversation(agent, server, args.turns, "unbounded")
+    agent.CONTEXT_TOKEN_BUDGET = args.budget
+    budgeted = run_conversation(agent, server, args.turns, "budgeted")
+
+    print(f"{'turn':>5} | {'tokens (no budget)':>18} {'cached':>7} {'ms':>7} | "
+          f"{f'tokens (budget {args.budget})':>20} {'cached':>7} {'ms':>7}")
+    for turn in range(0, args.turns, args.every):
+        (tokens_off, cached_off, ms_off), (tokens_on, cached_on, ms_on) = unbounded[turn], budgeted[turn]
+        print(f"{turn + 1:>5} | {tokens_off:>18} {cached_off:>7} {ms_off:>7.1f} | "
+              f"{tokens_on:>20} {cached_on:>7} {ms_on:>7.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Per-turn latency of tool turns with and without direct rendering.
+Price and booking turns run through achat() against the local mock
+completions server. Without direct rendering each turn makes two model
+calls, one choosing the tool and one phrasing its result; with it, a result
+that has a reply template is rendered locally and the second call is skipped.
+
+Usage:
+    python -m benchmarks.bench_direct_render --turns 200 --latency 0.3
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.mock_openai_server import start_server
+
+CITIES = ["Paris", "London", "Tokyo", "Rome"]
+
+def turn_message(i: int) -> str:
+    """A price question or a booking request; long enough to bypass the local fast path."""
+    city = CITIES[i % len(CITIES)]
+    if i % 2:
+        return f"Please book the flight to {city} for my trip, my name is Jane Smith and my email is jane{i}@example.com"
+    return f"Before I decide on anything, could you tell me what the price of a ticket to {city} is these days? (#{i})"
+
+async def run_turns(agent, turns: int, concurrency: int):
+    """Return per-turn latencies in milliseconds."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> float:
+        async with semaphore:
+            started = time.perf_counter()
+            reply = await agent.achat(turn_message(i), [])
+            assert not reply.startswith("Sonya: I apologize"), "achat() returned an error"
+            return (time.perf_counter() - started) * 1000
+
+    return await asyncio.gather(*(one(i) for i in range(turns)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20, help="in-flight achat() calls")
+    parser.add_argument("--latency", type=float, default=0.3, help="mock seconds per completion")
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=args.latency)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "mock"
+    os.environ["RESPONSE_CACHE_ENABLED"] = "False"
+    os.environ.setdefault("BOOKING_LEDGER_PATH", os.path.join(tempfile.mkdtemp(), "ledger.db"))
+    import CrewAIR_Agent as agent
+    import metrics
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    async def run_both():
+        results = {}
+        for enabled in (False, True):
+            agent.DIRECT_RENDER_ENABLED = enabled
+            metrics.reset()
+            completions_before = len(server.prompt_tokens)
+            latencies = sorted(await run_turns(agent, args.turns, args.concurrency))
+            model_calls = (len(server.prompt_tokens) - completions_before) / args.turns
+            results[enabled] = (latencies, model_calls, int(metrics.snapshot().get("direct_render.rendered", 0)))
+        return results
+
+    results = asyncio.run(run_both())
+    print(f"{'direct render':>13} {'p50 ms':>8} {'p95 ms':>8} {'calls/turn':>10} {'rendered':>9}")
+    for enabled, (latencies, model_calls, rendered) in results.items():
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"{'on' if enabled else 'off':>13} {statistics.median(latencies):8.0f} {p95:8.0f} "
+              f"{model_calls:10.2f} {rendered:9d}")
+
+if __name__ == "__main__":
+    main()
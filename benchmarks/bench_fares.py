@@ -0,0 +1,113 @@
+"""
+Fare engine load time, memory and quote latency at scale.
+A synthetic fare table is written as CSV, loaded, saved as a binary
+snapshot and reloaded, then random quotes are timed. With --write-sample
+the fare table shipped in data/fares.csv is regenerated instead.
+
+Usage:
+    python -m benchmarks.bench_fares --routes 2000 --days 365
+    python -m benchmarks.bench_fares --write-sample data/fares.csv
+"""
+
+import argparse
+import csv
+import datetime
+import os
+import random
+import tempfile
+import time
+
+from fare_engine import FareTable
+
+# Headline economy fares of the sample routes, in cents
+SAMPLE_ORIGIN = "NYC"
+SAMPLE_BASE_FARES = {"LON": 79900, "PAR": 89900, "TYO": 140000, "ROM": 92900}
+SAMPLE_CABIN_FACTORS = {"economy": 1.0, "premium": 1.6, "business": 3.2}
+SAMPLE_FIRST_DATE = datetime.date(2026, 1, 1)
+SAMPLE_DAYS = 3 * 365
+
+def sample_fare(base_cents: int, cabin_factor: float, date: datetime.date) -> int:
+    """Fare on a date: weekend and peak-season surcharges over the base fare, in whole dollars."""
+    factor = cabin_factor
+    if date.weekday() in (4, 6):
+        factor *= 1.1
+    if date.month in (7, 8) or (date.month, date.day) >= (12, 18) or (date.month, date.day) <= (1, 4):
+        factor *= 1.2
+    return round(base_cents * factor / 100) * 100
+
+def write_sample(path: str) -> int:
+    rows = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["origin", "destination", "date", "cabin", "fare_cents"])
+        for destination, base in SAMPLE_BASE_FARES.items():
+            for cabin, factor in SAMPLE_CABIN_FACTORS.items():
+                for offset in range(SAMPLE_DAYS):
+                    date = SAMPLE_FIRST_DATE + datetime.timedelta(days=offset)
+                    writer.writerow([SAMPLE_ORIGIN, destination, date.isoformat(), cabin,
+                                     sample_fare(base, factor, date)])
+                    rows += 1
+    return rows
+
+def write_synthetic(path: str, routes: int, days: int, seed: int = 7) -> int:
+    rng = random.Random(seed)
+    stations = [f"S{i:03d}" for i in range(int(routes ** 0.5) + 2)]
+    rows = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["origin", "destination", "date", "cabin", "fare_cents"])
+        pairs = set()
+        while len(pairs) < routes:
+            origin, destination = rng.sample(stations, 2)
+            pairs.add((origin, destination))
+        for origin, destination in sorted(pairs):
+            base = rng.randrange(5000, 150000, 100)
+            for cabin, factor in SAMPLE_CABIN_FACTORS.items():
+                for offset in range(days):
+                    date = SAMPLE_FIRST_DATE + datetime.timedelta(days=offset)
+                    writer.writerow([origin, destination, date.isoformat(), cabin, sample_fare(base, factor, date)])
+                    rows += 1
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--routes", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--quotes", type=int, default=200000)
+    parser.add_argument("--write-sample", metavar="PATH", help="Regenerate the shipped sample fare table")
+    args = parser.parse_args()
+
+    if args.write_sample:
+        print(f"wrote {write_sample(args.write_sample)} fares to {args.write_sample}")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "fares.csv")
+        snapshot_path = os.path.join(directory, "fares.bin")
+        rows = write_synthetic(csv_path, args.routes, args.days)
+
+        started = time.perf_counter()
+        table = FareTable.load(csv_path)
+        csv_seconds = time.perf_counter() - started
+        table.save(snapshot_path)
+        started = time.perf_counter()
+        table = FareTable.load(snapshot_path)
+        snapshot_seconds = time.perf_counter() - started
+
+    keys = [(table.stations[origin], table.stations[destination]) for origin, destination, _ in table._series]
+    rng = random.Random(1)
+    queries = [(*rng.choice(keys), SAMPLE_FIRST_DATE.toordinal() + rng.randrange(args.days),
+                rng.choice(list(SAMPLE_CABIN_FACTORS))) for _ in range(args.quotes)]
+    started = time.perf_counter()
+    for origin, destination, day, cabin in queries:
+        assert table.fare(origin, destination, day, cabin) is not None
+    quote_seconds = time.perf_counter() - started
+
+    print(f"{rows:,} fares ({len(table._series):,} series), "
+          f"{table.fares.itemsize * len(table.fares) / 1e6:.1f} MB of fare arrays")
+    print(f"  load csv        {csv_seconds:.2f} s")
+    print(f"  load snapshot   {snapshot_seconds * 1000:.1f} ms")
+    print(f"  quote           {quote_seconds / args.quotes * 1e6:.2f} us/quote")
+
+if __name__ == "__main__":
+    main()
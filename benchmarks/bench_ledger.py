@@ -0,0 +1,47 @@
+"""
+Booking ledger write throughput under concurrent bookings.
+Many threads record distinct bookings at once, as tool calls from concurrent
+conversations would, then every booking is re-submitted to check that
+idempotent writes return the original references.
+
+Usage:
+    python -m benchmarks.bench_ledger --bookings 20000 --threads 64
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from booking_ledger import BookingLedger
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bookings", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        ledger = BookingLedger(os.path.join(directory, "bookings.db"))
+
+        def book(i: int):
+            return ledger.record(f"conversation-{i}", "paris", "2026-06-01", "economy", f"Passenger {i}",
+                                 f"p{i}@example.com", "$899")
+
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            started = time.perf_counter()
+            first = list(pool.map(book, range(args.bookings)))
+            elapsed = time.perf_counter() - started
+            repeated = list(pool.map(book, range(args.bookings)))
+
+    references = [reference for reference, _ in first]
+    assert len(set(references)) == args.bookings, "duplicate booking references"
+    assert all(created for _, created in first), "new bookings reported as duplicates"
+    assert [reference for reference, _ in repeated] == references, "repeated bookings got new references"
+    assert not any(created for _, created in repeated), "repeated bookings were stored twice"
+    print(f"{args.bookings} bookings from {args.threads} threads: {args.bookings / elapsed:,.0f} bookings/s, "
+          f"all references unique, repeats idempotent")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Itinerary search latency over a synthetic route network.
+Airports are scattered over the globe; each gets flights to its nearest
+neighbours and to a set of hubs, priced and timed by distance. Random
+origin-destination pairs are then searched with and without a stop limit,
+with A* (coordinates known) and plain Dijkstra.
+
+Usage:
+    python -m benchmarks.bench_routes --airports 3000 --neighbours 12 --hubs 40
+"""
+
+import argparse
+import math
+import random
+import time
+
+from route_graph import RouteGraph, _great_circle_km
+
+def synthetic_network(airports: int, neighbours: int, hubs: int, seed: int = 11):
+    rng = random.Random(seed)
+    codes = [f"A{i:04d}" for i in range(airports)]
+    coordinates = {code: (math.degrees(math.asin(rng.uniform(-0.95, 0.95))), rng.uniform(-180, 180))
+                   for code in codes}
+    radians = {code: (math.radians(lat), math.radians(lon)) for code, (lat, lon) in coordinates.items()}
+
+    def distance(a, b):
+        return _great_circle_km(*radians[a], *radians[b])
+
+    def flight(a, b):
+        d = distance(a, b)
+        return a, b, int((59 + 0.11 * d) * rng.uniform(1.0, 1.6)) * 100, int(40 + d / 820 * 60)
+
+    hub_codes = codes[:hubs]
+    edges = set()
+    for code in codes:
+        nearest = sorted(rng.sample(codes, min(200, airports)), key=lambda other: distance(code, other))
+        for other in [c for c in nearest if c != code][:neighbours] + hub_codes:
+            if other != code:
+                edges.add((code, other))
+                edges.add((other, code))
+    return [flight(a, b) for a, b in sorted(edges)], coordinates
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--airports", type=int, default=3000)
+    parser.add_argument("--neighbours", type=int, default=12)
+    parser.add_argument("--hubs", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    edges, coordinates = synthetic_network(args.airports, args.neighbours, args.hubs)
+    started = time.perf_counter()
+    with_coordinates = RouteGraph.from_edges(edges, coordinates)
+    build_seconds = time.perf_counter() - started
+    without_coordinates = RouteGraph.from_edges(edges)
+    print(f"{len(with_coordinates.airports):,} airports, {len(edges):,} flights, built in {build_seconds:.2f} s")
+
+    rng = random.Random(3)
+    pairs = [tuple(rng.sample(with_coordinates.airports, 2)) for _ in range(args.queries)]
+    for label, graph in (("A*", with_coordinates), ("Dijkstra", without_coordinates)):
+        for k, max_stops in ((1, 1), (5, 1), (1, 2), (3, None)):
+            started = time.perf_counter()
+            for origin, destination in pairs:
+                graph.search(origin, destination, k=k, max_stops=max_stops)
+            elapsed = (time.perf_counter() - started) / len(pairs)
+            print(f"  {label:9} k={k} max_stops={max_stops!s:5} {elapsed * 1000:8.2f} ms/search")
+
+if __name__ == "__main__":
+    main()
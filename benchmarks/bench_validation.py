@@ -0,0 +1,60 @@
+"""
+Passenger validation throughput.
+Compares the original split/"@"-in checks with the precompiled patterns,
+one passenger at a time and as a group booking through validate_batch(),
+over synthetic records with a realistic share of repeats and bad input.
+
+Usage:
+    python -m benchmarks.bench_validation --records 100000
+"""
+
+import argparse
+import random
+import time
+
+from validation import validate_batch, validate_passenger
+
+FIRST_NAMES = ["John", "Mary-Jane", "José", "Siobhán", "Li", "O'Neil", "Zoë", "Ahmed", "Anna", "J."]
+LAST_NAMES = ["Doe", "García", "Müller", "Nguyen", "Smith", "van Dijk", "Ó Briain", "Kowalski"]
+DOMAINS = ["example.com", "mail.example.org", "corp.example.co.uk", "example.io"]
+BAD_NAMES = ["", "Cher", "   ", "John 3rd", "R2 D2"]
+BAD_EMAILS = ["", "john", "john@", "john@example", "john..doe@example.com", "@example.com", "john doe@example.com"]
+
+def synthetic_records(count: int, seed: int = 5):
+    rng = random.Random(seed)
+    records = []
+    for _ in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        name = f"{first} {last}" if rng.random() > 0.05 else rng.choice(BAD_NAMES)
+        local = f"{first.rstrip('.')}.{last}".lower().replace(" ", "").replace("'", "") + str(rng.randrange(500))
+        email = f"{local}@{rng.choice(DOMAINS)}" if rng.random() > 0.05 else rng.choice(BAD_EMAILS)
+        records.append((name, email))
+    return records
+
+def original_validate_info(name: str, email: str):
+    name_valid = len(name.strip().split()) >= 2
+    email_valid = '@' in email and '.' in email
+    return {"name_valid": name_valid, "email_valid": email_valid, "all_valid": name_valid and email_valid}
+
+def timed(label: str, count: int, function) -> None:
+    started = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:28} {elapsed * 1e6 / count:7.2f} µs/record  {count / elapsed:12,.0f} records/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=100000)
+    args = parser.parse_args()
+
+    records = synthetic_records(args.records)
+    results = validate_batch(records)
+    print(f"{len(records):,} records, {sum(result['all_valid'] for result in results):,} valid")
+    timed("original checks", len(records), lambda: [original_validate_info(n, e) for n, e in records])
+    timed("validate_passenger", len(records), lambda: [validate_passenger(n, e) for n, e in records])
+    timed("validate_batch", len(records), lambda: validate_batch(records))
+    distinct = list(dict.fromkeys(records))
+    timed("validate_batch (distinct)", len(distinct), lambda: validate_batch(distinct))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Local stand-in for an external fare service.
+Answers POST /fares with fares from a FareTable after a configurable delay,
+in the batch format HttpFareProvider speaks. GET /stats reports how many
+upstream requests and queries were served, so coalescing and batching can
+be measured.
+
+Usage:
+    python -m benchmarks.fare_stub_server --port 8500 --latency 0.05
+    python -m benchmarks.fare_stub_server --coalescing-demo --sessions 100
+"""
+
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+from fare_engine import FareTable
+
+DEFAULT_FARES_PATH = "data/fares.csv"
+
+class FareStubServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the fare table and request counters."""
+    request_queue_size = 1024
+    daemon_threads = True
+
+class FareStubHandler(BaseHTTPRequestHandler):
+    """Request handler serving batched fare queries."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/stats":
+            self.send_error(404)
+            return
+        with self.server.lock:
+            self._send_json({"requests": self.server.requests, "queries": self.server.queries})
+
+    def do_POST(self):
+        if self.path != "/fares":
+            self.send_error(404)
+            return
+        queries = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["queries"]
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.queries += len(queries)
+        time.sleep(self.server.latency)
+        fares = []
+        for origin, destination, date, cabin in queries:
+            try:
+                fares.append(self.server.table.fare(origin, destination, date, cabin))
+            except ValueError:
+                fares.append(None)
+        self._send_json({"fares": fares})
+
+def start_server(host: str = "127.0.0.1", port: int = 0, latency: float = 0.05,
+                 table: Optional[FareTable] = None) -> Tuple[FareStubServer, str]:
+    """
+    Start the stub fare service on a daemon thread.
+    
+    Args:
+        host (str): Interface to bind
+        port (int): Port to bind, 0 picks a free one
+        latency (float): Seconds to wait before answering each request
+        table (Optional[FareTable]): Fares to serve, data/fares.csv if None
+        
+    Returns:
+        Tuple[FareStubServer, str]: The running server and its base URL
+    """
+    server = FareStubServer((host, port), FareStubHandler)
+    server.latency = latency
+    server.table = table if table is not None else FareTable.load(DEFAULT_FARES_PATH)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.queries = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def coalescing_demo(sessions: int, latency: float) -> None:
+    """Fire concurrent lookups through HttpFareProvider and count upstream requests."""
+    from fare_provider import HttpFareProvider
+
+    server, base_url = start_server(latency=latency)
+    provider = HttpFareProvider(base_url)
+    destinations = ["LON", "PAR", "TYO", "ROM"]
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        same = list(pool.map(lambda _: provider.fare("NYC", "PAR", "2026-11-02"), range(sessions)))
+        same_requests = server.requests
+        mixed = list(pool.map(lambda i: provider.fare("NYC", destinations[i % 4], f"2026-11-{i % 28 + 1:02d}"),
+                              range(sessions)))
+    provider.close()
+    assert len(set(same)) == 1 and same[0] is not None
+    assert all(fare is not None for fare in mixed)
+    print(f"{sessions} concurrent lookups of one fare: {same_requests} upstream request(s)")
+    distinct = len({(i % 4, i % 28) for i in range(sessions)})
+    print(f"{sessions} concurrent lookups of {distinct} distinct fares: "
+          f"{server.requests - same_requests} upstream request(s)")
+    server.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--fares", default=DEFAULT_FARES_PATH)
+    parser.add_argument("--coalescing-demo", action="store_true",
+                        help="Measure upstream requests for concurrent lookups instead of serving")
+    parser.add_argument("--sessions", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.coalescing_demo:
+        coalescing_demo(args.sessions, args.latency)
+        return
+    server, base_url = start_server(args.host, args.port, args.latency, FareTable.load(args.fares))
+    print(f"Fare stub serving at {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Load generator for the booking assistant.
+Replays a corpus of scripted booking conversations against chat(), achat(),
+achat_stream() or a running Gradio app, many conversations at once, with the
+local mock completions server standing in for OpenAI. Reports p50/p95/p99
+turn latency, turn throughput, model calls per turn and how often model calls
+reused a pooled connection, so every performance change to CrewAIR_Agent can
+be measured the same way.
+
+Usage:
+    python -m benchmarks.load_test --target achat --conversations 200 --concurrency 50
+    python -m benchmarks.load_test --target stream --latency 0.3 --token-latency 0.01
+    python -m benchmarks.load_test --target chat --error-rate 0.1 --slow-rate 0.05 --slow-latency 2
+    python -m benchmarks.load_test --target gradio --url http://127.0.0.1:7860 --base-url http://127.0.0.1:8400/v1
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import metrics
+from benchmarks.mock_openai_server import start_server
+
+DEFAULT_CORPUS = [
+    ["Hi there!", "How much is a flight to Paris?", "Sounds good, I'd like to book it",
+     "Please book Paris, my name is Ana Silva and my email is ana.silva@example.com"],
+    ["What are the prices to Tokyo and Rome?", "Book Rome for Li Wei, li.wei@example.com"],
+    ["how much to london?", "thanks, that's all"],
+    ["I want to fly somewhere warm", "What does Rome cost?", "And Paris?"],
+    ["Hello", "Can you tell me the fare for Tokyo, London and Paris?", "ok, I'll think about it"],
+]
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of a non-empty list of samples."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+def completions_served(base_url: str) -> int:
+    """Read the mock server's completion count from its /stats endpoint."""
+    with urllib.request.urlopen(base_url.rsplit("/v1", 1)[0] + "/stats") as response:
+        return json.load(response)["completions"]
+
+class LoadTest:
+    """
+    Runs conversations from a corpus and collects per-turn latencies.
+    
+    Attributes:
+        corpus (List[List[str]]): Conversations, each a list of user messages
+        latencies (List[float]): Seconds per completed turn
+        errors (int): Turns answered with the error apology or raising
+    """
+    def __init__(self, corpus: List[List[str]]):
+        self.corpus = corpus
+        self.latencies: List[float] = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, started: float, reply: Optional[str]) -> None:
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies.append(elapsed)
+            if not reply or reply.startswith("Sonya: I apologize"):
+                self.errors += 1
+
+    def run_sync(self, handler, index: int) -> None:
+        """Run one conversation through a synchronous handler such as chat()."""
+        history, request = [], SimpleNamespace(session_hash=f"load-{index}")
+        for message in self.corpus[index % len(self.corpus)]:
+            started = time.perf_counter()
+            try:
+                reply = handler(message, history, request)
+            except Exception:
+                reply = None
+            self.record(started, reply)
+            history.append((message, reply))
+
+    async def run_async(self, handler, index: int, stream: bool) -> None:
+        """Run one conversation through achat() or, with stream, achat_stream()."""
+        history, request = [], SimpleNamespace(session_hash=f"load-{index}")
+        for message in self.corpus[index % len(self.corpus)]:
+            started = time.perf_counter()
+            try:
+                if stream:
+                    reply = None
+                    async for reply in handler(message, history, request):
+                        pass
+                else:
+                    reply = await handler(message, history, request)
+            except Exception:
+                reply = None
+            self.record(started, reply)
+            history.append((message, reply))
+
+    def run_gradio(self, url: str, index: int) -> None:
+        """Run one conversation against a running Gradio app's /chat endpoint."""
+        from gradio_client import Client
+        client = Client(url, verbose=False)
+        for message in self.corpus[index % len(self.corpus)]:
+            started = time.perf_counter()
+            try:
+                reply = client.predict(message, api_name="/chat")
+            except Exception:
+                reply = None
+            self.record(started, reply)
+
+    def report(self, elapsed: float, model_calls: int) -> Dict[str, float]:
+        """Summarize the run."""
+        turns = len(self.latencies)
+        return {
+            "turns": turns,
+            "errors": self.errors,
+            "throughput_turns_per_s": turns / elapsed,
+            "p50_ms": percentile(self.latencies, 0.50) * 1000,
+            "p95_ms": percentile(self.latencies, 0.95) * 1000,
+            "p99_ms": percentile(self.latencies, 0.99) * 1000,
+            "model_calls_per_turn": model_calls / turns,
+        }
+
+async def _run_async_target(test: LoadTest, handler, conversations: int, concurrency: int, stream: bool) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int) -> None:
+        async with semaphore:
+            await test.run_async(handler, index, stream)
+
+    await asyncio.gather(*(one(index) for index in range(conversations)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target", choices=["chat", "achat", "stream", "gradio"], default="achat")
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50, help="conversations in flight")
+    parser.add_argument("--corpus", help="JSON file with a list of conversations (lists of user messages)")
+    parser.add_argument("--base-url", help="use an already running mock server instead of starting one")
+    parser.add_argument("--url", default="http://127.0.0.1:7860", help="Gradio app URL for --target gradio")
+    parser.add_argument("--latency", type=float, default=0.3, help="mock seconds per completion")
+    parser.add_argument("--prompt-latency", type=float, default=0.0, help="mock seconds per 1000 prompt tokens")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="mock seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock share of failed completions")
+    parser.add_argument("--error-status", type=int, default=503, help="mock HTTP status of failures")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="mock share of slowed completions")
+    parser.add_argument("--slow-latency", type=float, default=0.0, help="mock extra seconds of a slowed completion")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    corpus = DEFAULT_CORPUS
+    if args.corpus:
+        with open(args.corpus) as f:
+            corpus = json.load(f)
+
+    base_url = args.base_url
+    if not base_url:
+        _, base_url = start_server(latency=args.latency, prompt_latency=args.prompt_latency,
+                                   token_latency=args.token_latency, error_rate=args.error_rate,
+                                   error_status=args.error_status, slow_rate=args.slow_rate,
+                                   slow_latency=args.slow_latency)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+    test = LoadTest(corpus)
+    calls_before = completions_served(base_url)
+    started = time.perf_counter()
+    if args.target == "gradio":
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(lambda index: test.run_gradio(args.url, index), range(args.conversations)))
+    else:
+        import CrewAIR_Agent as agent
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        logging.getLogger("CrewAIR_Agent").setLevel(logging.WARNING)
+        started = time.perf_counter()
+        if args.target == "chat":
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                list(pool.map(lambda index: test.run_sync(agent.chat, index), range(args.conversations)))
+        else:
+            handler = agent.achat_stream if args.target == "stream" else agent.achat
+            asyncio.run(_run_async_target(test, handler, args.conversations, args.concurrency,
+                                          args.target == "stream"))
+    elapsed = time.perf_counter() - started
+    report = test.report(elapsed, completions_served(base_url) - calls_before)
+    if args.target != "gradio":
+        counters = metrics.snapshot()
+        requests = counters.get("openai_http.requests", 0)
+        report["connection_reuse_rate"] = counters.get("openai_http.connections_reused", 0) / requests if requests else 0.0
+        report["pool_saturated_requests"] = int(counters.get("openai_http.pool_saturated", 0))
+        report["rate_limited_calls"] = int(sum(counters.get(f"rate_limiter.{name}", 0)
+                                               for name in ("shed", "evicted", "timed_out")))
+        for name, histogram in metrics.histograms().items():
+            if name.startswith("rate_limiter.wait_seconds.") and histogram["count"]:
+                report[f"mean_wait_ms_{name.rsplit('.', 1)[1]}"] = histogram["sum"] / histogram["count"] * 1000
+
+    if args.json:
+        print(json.dumps(report))
+        return
+    print(f"target={args.target} conversations={args.conversations} concurrency={args.concurrency}")
+    for name, value in report.items():
+        print(f"  {name:<24} {value:,.2f}" if isinstance(value, float) else f"  {name:<24} {value}")
+
+if __name__ == "__main__":
+    main()
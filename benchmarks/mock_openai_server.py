@@ -0,0 +1,382 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint.
+Answers POST /v1/chat/completions after a configurable delay, which can grow
+with the prompt size the way real prefill does. Replies follow a tool-call
+script: user messages matching a rule get tool calls back, tool results get a
+closing text reply, and anything else gets a canned greeting. Streaming
+requests are answered with server-sent events, one word per chunk. GET /stats
+reports how many completions were served, so load tests can count model calls
+per turn.
+
+Prompt caching is simulated the way providers do it: prefixes of 1024 tokens
+and more, in 128-token steps, are remembered, a request reports how much of
+its prompt matched one in usage.prompt_tokens_details.cached_tokens, and
+only the rest of the prompt costs prompt latency.
+
+Faults can be injected to exercise retries, the circuit breaker and hedging:
+a share of requests fails with a chosen status (429 replies carry a
+Retry-After header), and a share is slowed down to produce a latency tail.
+
+Usage:
+    python -m benchmarks.mock_openai_server --port 8400 --latency 0.2 --prompt-latency 0.05
+    python -m benchmarks.mock_openai_server --script my_rules.json --token-latency 0.01
+    python -m benchmarks.mock_openai_server --error-rate 0.2 --error-status 503 --slow-rate 0.05 --slow-latency 2
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_REPLY = "Happy to help! Where would you like to fly?"
+
+# Smallest cacheable prompt prefix and the granularity of cache hits, in tokens
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+
+# Each rule fires when "when" matches the last user message and produces one
+# tool call per match of "each", filling {group} placeholders in "arguments"
+DEFAULT_SCRIPT = [
+    {
+        "when": r"(?i)\bbook\b.*@",
+        "each": r"(?i)(?P<city>paris|london|tokyo|rome)\b.*?(?:name is |for )(?P<name>[A-Z][a-z]+ [A-Z][a-z]+)"
+                r".*?(?P<email>[\w.+-]+@[\w-]+\.[\w.]+)",
+        "tool": "book_flight",
+        "arguments": {"destination_city": "{city}", "passenger_name": "{name}", "email": "{email}"}
+    },
+    {
+        "when": r"(?i)\b(price|prices|how much|cost|fare)\b",
+        "each": r"(?i)\b(?P<city>paris|london|tokyo|rome)\b",
+        "tool": "get_ticket_price",
+        "arguments": {"destination_city": "{city}"}
+    }
+]
+
+class MockServer(ThreadingHTTPServer):
+    """Threaded HTTP server with a listen backlog sized for load tests."""
+    request_queue_size = 1024
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up early, e.g. the losing side of a hedged request, are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class MockCompletionsHandler(BaseHTTPRequestHandler):
+    """
+    Request handler serving chat completions.
+    
+    The server instance carries the configuration:
+        latency (float): Seconds to wait before answering each request
+        prompt_latency (float): Extra seconds per 1000 prompt tokens
+        token_latency (float): Seconds between streamed chunks
+        reply (str): Assistant content for messages no rule matches
+        script (List[Dict]): Tool-call rules, see DEFAULT_SCRIPT
+        error_rate (float): Share of requests answered with error_status
+        error_status (int): HTTP status of injected errors
+        slow_rate (float): Share of requests delayed by slow_latency more
+        slow_latency (float): Extra seconds of a slowed request
+        prompt_tokens (List[int]): Estimated prompt size of every request served
+        cached_tokens (List[int]): Prompt tokens of every request served from the prefix cache
+        errors (List[int]): Status of every injected error
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._send_json(200, {"completions": len(self.server.prompt_tokens), "errors": len(self.server.errors),
+                                  "prompt_tokens": sum(self.server.prompt_tokens),
+                                  "cached_tokens": sum(self.server.cached_tokens)})
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        if self.server.random.random() < self.server.error_rate:
+            self.server.errors.append(self.server.error_status)
+            time.sleep(self.server.latency / 10)
+            self._send_json(self.server.error_status, {"error": {"message": "Injected fault", "type": "mock_fault"}},
+                            {"Retry-After": "1"} if self.server.error_status == 429 else None)
+            return
+
+        prompt_tokens = estimate_prompt_tokens(body)
+        cached_tokens = cached_prefix_tokens(self.server, body)
+        self.server.prompt_tokens.append(prompt_tokens)
+        self.server.cached_tokens.append(cached_tokens)
+        slow = self.server.slow_latency if self.server.random.random() < self.server.slow_rate else 0.0
+        time.sleep(self.server.latency + self.server.prompt_latency * (prompt_tokens - cached_tokens) / 1000 + slow)
+
+        content, tool_calls = scripted_reply(body, self.server.script, self.server.reply)
+        model = body.get("model", "mock")
+        if body.get("stream"):
+            usage = None
+            if (body.get("stream_options") or {}).get("include_usage"):
+                usage = build_usage(prompt_tokens, len(content or "") // 4, cached_tokens)
+            self._send_stream(model, content, tool_calls, usage)
+        else:
+            self._send_json(200, build_completion(model, content, prompt_tokens, tool_calls, cached_tokens))
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, model: str, content: Optional[str], tool_calls: List[Dict], usage: Optional[Dict] = None):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for delta in stream_deltas(content, tool_calls):
+            self._write_chunk(f"data: {json.dumps(build_chunk(model, delta))}\n\n")
+            time.sleep(self.server.token_latency)
+        self._write_chunk(f"data: {json.dumps(build_chunk(model, {}, finish=True))}\n\n")
+        if usage is not None:
+            self._write_chunk(f"data: {json.dumps(dict(build_chunk(model, {}), choices=[], usage=usage))}\n\n")
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text: str):
+        data = text.encode()
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+
+def estimate_prompt_tokens(body: Dict) -> int:
+    """Estimate the prompt tokens of a request at ~4 characters per token."""
+    return len(json.dumps([body.get("messages"), body.get("tools")])) // 4
+
+def cached_prefix_tokens(server: MockServer, body: Dict) -> int:
+    """
+    Prompt tokens of a request found in the server's prefix cache.
+    
+    Args:
+        server (MockServer): Server holding the cache
+        body (Dict): Chat completion request
+        
+    Returns:
+        int: Length of the longest remembered prefix, 0 below CACHE_MIN_TOKENS
+        
+    The prompt is tools first, then messages, as providers lay it out; every
+    step-aligned prefix of it is remembered for later requests.
+    """
+    text = json.dumps([body.get("tools"), body.get("messages")])
+    cached = 0
+    with server.cache_lock:
+        for boundary in range(CACHE_MIN_TOKENS, len(text) // 4 + 1, CACHE_STEP_TOKENS):
+            digest = hashlib.sha256(text[:boundary * 4].encode()).digest()
+            if digest in server.prefixes:
+                cached = boundary
+            else:
+                server.prefixes.add(digest)
+    return cached
+
+def scripted_reply(body: Dict, script: List[Dict], default_reply: str) -> Tuple[Optional[str], List[Dict]]:
+    """
+    Decide the assistant's reply to a request.
+    
+    Args:
+        body (Dict): Chat completion request
+        script (List[Dict]): Tool-call rules, see DEFAULT_SCRIPT
+        default_reply (str): Content when neither a rule nor tool results apply
+        
+    Returns:
+        Tuple[Optional[str], List[Dict]]: Assistant content and wire-format tool calls
+    """
+    messages = body.get("messages") or [{}]
+    last = messages[-1]
+    if last.get("role") == "tool":
+        results = []
+        for message in reversed(messages):
+            if message.get("role") != "tool":
+                break
+            results.insert(0, message["content"])
+        return f"Here is what I found: {' '.join(results)}", []
+
+    if last.get("role") == "user" and body.get("tools") and body.get("tool_choice") != "none":
+        text = last.get("content") or ""
+        for rule in script:
+            if not re.search(rule["when"], text):
+                continue
+            tool_calls = [
+                {
+                    "id": f"call_{uuid.uuid4().hex[:24]}",
+                    "type": "function",
+                    "function": {
+                        "name": rule["tool"],
+                        "arguments": json.dumps({
+                            key: value.format(**match.groupdict()) for key, value in rule["arguments"].items()
+                        })
+                    }
+                }
+                for match in re.finditer(rule["each"], text)
+            ]
+            if tool_calls:
+                return None, tool_calls
+    return default_reply, []
+
+def stream_deltas(content: Optional[str], tool_calls: List[Dict]) -> List[Dict]:
+    """
+    Split a reply into streamed deltas the way the API does.
+    
+    Args:
+        content (Optional[str]): Assistant content, streamed one word per delta
+        tool_calls (List[Dict]): Tool calls; each streams its id and name first,
+            then its arguments in two fragments
+            
+    Returns:
+        List[Dict]: Delta objects for chat.completion.chunk payloads
+    """
+    deltas = [{"role": "assistant", "content": word} for word in re.findall(r"\S+\s*", content or "")]
+    for index, tool_call in enumerate(tool_calls):
+        arguments = tool_call["function"]["arguments"]
+        middle = len(arguments) // 2
+        deltas.append({"tool_calls": [{
+            "index": index, "id": tool_call["id"], "type": "function",
+            "function": {"name": tool_call["function"]["name"], "arguments": ""}
+        }]})
+        for fragment in (arguments[:middle], arguments[middle:]):
+            deltas.append({"tool_calls": [{"index": index, "function": {"arguments": fragment}}]})
+    return deltas
+
+def build_chunk(model: str, delta: Dict, finish: bool = False) -> Dict:
+    """Build one chat.completion.chunk payload."""
+    return {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": "stop" if finish else None}]
+    }
+
+def build_usage(prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> Dict:
+    """Build the usage object of a completion."""
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens}
+    }
+
+def build_completion(model: str, content: Optional[str], prompt_tokens: int = 0,
+                     tool_calls: Optional[List[Dict]] = None, cached_tokens: int = 0) -> Dict:
+    """
+    Build a chat.completion payload with a single assistant choice.
+    
+    Args:
+        model (str): Model name echoed back to the client
+        content (Optional[str]): Assistant message content
+        prompt_tokens (int): Prompt size reported in usage
+        tool_calls (Optional[List[Dict]]): Tool calls in wire format
+        cached_tokens (int): Prompt tokens reported as served from the cache
+        
+    Returns:
+        Dict: JSON-serializable completion object
+    """
+    message = {"role": "assistant", "content": content}
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": message,
+            "finish_reason": "tool_calls" if tool_calls else "stop"
+        }],
+        "usage": build_usage(prompt_tokens, len(content or "") // 4, cached_tokens)
+    }
+
+def start_server(host: str = "127.0.0.1", port: int = 0, latency: float = 0.2,
+                 reply: str = DEFAULT_REPLY, prompt_latency: float = 0.0, token_latency: float = 0.0,
+                 script: Optional[List[Dict]] = None, error_rate: float = 0.0, error_status: int = 503,
+                 slow_rate: float = 0.0, slow_latency: float = 0.0, seed: Optional[int] = None
+                 ) -> Tuple[MockServer, str]:
+    """
+    Start the mock server on a daemon thread.
+    
+    Args:
+        host (str): Interface to bind
+        port (int): Port to bind, 0 picks a free one
+        latency (float): Seconds to wait before answering each request
+        reply (str): Assistant content for messages no rule matches
+        prompt_latency (float): Extra seconds per 1000 prompt tokens
+        token_latency (float): Seconds between streamed chunks
+        script (Optional[List[Dict]]): Tool-call rules, DEFAULT_SCRIPT if None
+        error_rate (float): Share of requests failed with error_status
+        error_status (int): HTTP status of injected errors, e.g. 429 or 503
+        slow_rate (float): Share of requests delayed by slow_latency more
+        slow_latency (float): Extra seconds of a slowed request
+        seed (Optional[int]): Seed of the fault injection, for repeatable runs
+        
+    Returns:
+        Tuple[MockServer, str]: The running server and its OpenAI base URL
+    """
+    server = MockServer((host, port), MockCompletionsHandler)
+    server.latency = latency
+    server.prompt_latency = prompt_latency
+    server.token_latency = token_latency
+    server.reply = reply
+    server.script = DEFAULT_SCRIPT if script is None else script
+    server.error_rate = error_rate
+    server.error_status = error_status
+    server.slow_rate = slow_rate
+    server.slow_latency = slow_latency
+    server.random = random.Random(seed)
+    server.prompt_tokens = []
+    server.cached_tokens = []
+    server.prefixes = set()
+    server.cache_lock = threading.Lock()
+    server.errors = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8400)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per completion")
+    parser.add_argument("--prompt-latency", type=float, default=0.0, help="extra seconds per 1000 prompt tokens")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds between streamed chunks")
+    parser.add_argument("--script", help="JSON file with tool-call rules replacing the default script")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected failures")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of requests slowed down")
+    parser.add_argument("--slow-latency", type=float, default=0.0, help="extra seconds of a slowed request")
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script) as f:
+            script = json.load(f)
+    server, base_url = start_server(args.host, args.port, args.latency, prompt_latency=args.prompt_latency,
+                                    token_latency=args.token_latency, script=script, error_rate=args.error_rate,
+                                    error_status=args.error_status, slow_rate=args.slow_rate,
+                                    slow_latency=args.slow_latency)
+    print(f"Mock completions server on {base_url} (set OPENAI_BASE_URL to use it)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Concurrent stress test of the seat inventory: no flight is ever oversold.
+Many threads quote and book a few small flights at once, some abandoning
+their holds, some booking without a quote and some releasing. At the end
+every flight must have sold exactly as many seats as commits succeeded and
+never more than its capacity.
+
+Usage:
+    python -m benchmarks.stress_seat_inventory --threads 64 --attempts 200000
+"""
+
+import argparse
+import random
+import threading
+import time
+from collections import Counter
+
+from seat_inventory import SeatInventory
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--attempts", type=int, default=200000)
+    parser.add_argument("--flights", type=int, default=50)
+    parser.add_argument("--capacity", type=int, default=40)
+    parser.add_argument("--hold-ttl", type=float, default=0.01)
+    args = parser.parse_args()
+
+    inventory = SeatInventory({"economy": args.capacity}, hold_ttl=args.hold_ttl)
+    flights = [("NYC", f"D{i:02d}", "2026-11-01", "economy") for i in range(args.flights)]
+    committed = Counter()
+    committed_lock = threading.Lock()
+    per_thread = args.attempts // args.threads
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        local = Counter()
+        for attempt in range(per_thread):
+            # A third of the traffic goes to one hot flight
+            flight = flights[0] if rng.random() < 0.33 else rng.choice(flights)
+            holder = (seed, attempt)
+            action = rng.random()
+            if action < 0.6:
+                if inventory.hold(flight, holder) and rng.random() < 0.7 and inventory.commit(flight, holder):
+                    local[flight] += 1
+            elif action < 0.8:
+                if inventory.commit(flight, holder):
+                    local[flight] += 1
+            else:
+                inventory.hold(flight, holder)
+                inventory.release(flight, holder)
+        with committed_lock:
+            committed.update(local)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    for flight in flights:
+        sold = inventory.sold(flight)
+        assert sold == committed[flight], f"{flight}: {sold} sold but {committed[flight]} commits succeeded"
+        assert sold <= args.capacity, f"{flight}: oversold, {sold} seats of {args.capacity}"
+        assert inventory.available(flight) >= 0, f"{flight}: negative availability"
+    total = sum(committed.values())
+    print(f"{per_thread * args.threads} attempts from {args.threads} threads in {elapsed:.2f} s "
+          f"({per_thread * args.threads / elapsed:,.0f}/s): {total} seats sold on {args.flights} flights, "
+          f"none oversold")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Durable, append-only ledger of simulated bookings.
+Bookings are stored in SQLite in WAL mode under ULID-based references, which
+are unique across processes and sort by creation time. Writes are idempotent
+on (conversation, destination, travel date, cabin, passenger, email), so a
+repeated book_flight call returns the original reference instead of creating
+a second booking, while the same passenger can still book another flight.
+A single writer thread group-commits concurrent bookings, one transaction per
+batch, so throughput does not collapse to one fsync per booking.
+"""
+
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_ulid_lock = threading.Lock()
+_last_ulid = (0, 0)
+
+def new_ulid() -> str:
+    """
+    Generate a ULID: 48-bit millisecond timestamp plus 80 random bits.
+    
+    Returns:
+        str: 26-character Crockford base32 string
+        
+    Within one millisecond the random part is incremented, so ULIDs from this
+    process are strictly increasing.
+    """
+    global _last_ulid
+    with _ulid_lock:
+        millis = int(time.time() * 1000)
+        last_millis, last_random = _last_ulid
+        if millis <= last_millis:
+            millis, randomness = last_millis, last_random + 1
+        else:
+            randomness = int.from_bytes(os.urandom(10), "big")
+        _last_ulid = (millis, randomness)
+    value = (millis << 80) | (randomness & ((1 << 80) - 1))
+    return "".join(_CROCKFORD[(value >> shift) & 31] for shift in range(125, -1, -5))
+
+def idempotency_key(conversation_id: str, destination: str, travel_date: str, cabin: str,
+                    passenger: str, email: str) -> str:
+    """
+    Key identifying a booking request regardless of spacing and letter case.
+    
+    Args:
+        conversation_id (str): Conversation the booking was made in
+        destination (str): Destination city
+        travel_date (str): Departure date as YYYY-MM-DD
+        cabin (str): Cabin class
+        passenger (str): Passenger's full name
+        email (str): Contact email
+        
+    Returns:
+        str: Hex digest of the normalized fields
+    """
+    fields = [conversation_id, destination, travel_date, cabin, " ".join(passenger.split()), email.strip()]
+    return hashlib.sha256("\x1f".join(field.casefold() for field in fields).encode()).hexdigest()
+
+class BookingLedger:
+    """
+    SQLite-backed booking store with group-committed, idempotent writes.
+    
+    Attributes:
+        path (str): SQLite database file
+        batch_size (int): Maximum bookings committed in one transaction
+    """
+    def __init__(self, path: str = "bookings.db", batch_size: int = 512):
+        self.path = path
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Tuple[Tuple, Future]]" = queue.Queue()
+        self._readers = threading.local()
+
+        db = self._connect()
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS bookings (
+                reference TEXT PRIMARY KEY,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                conversation_id TEXT NOT NULL,
+                destination TEXT NOT NULL,
+                travel_date TEXT,
+                cabin TEXT,
+                passenger TEXT NOT NULL,
+                email TEXT NOT NULL,
+                price TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS bookings_email ON bookings (email COLLATE NOCASE);
+        """)
+        # Ledgers created before bookings recorded their flight gain the columns
+        columns = {row["name"] for row in db.execute("PRAGMA table_info(bookings)")}
+        for column in ("travel_date", "cabin"):
+            if column not in columns:
+                db.execute(f"ALTER TABLE bookings ADD COLUMN {column} TEXT")
+        self._writer = threading.Thread(target=self._write_loop, args=(db,), name="booking-ledger", daemon=True)
+        self._writer.start()
+
+    def record(self, conversation_id: str, destination: str, travel_date: str, cabin: str, passenger: str,
+               email: str, price: Optional[str], timeout: float = 10.0) -> Tuple[str, bool]:
+        """
+        Record a booking, or find the identical booking made before.
+        
+        Args:
+            conversation_id (str): Conversation the booking was made in
+            destination (str): Destination city
+            travel_date (str): Departure date as YYYY-MM-DD
+            cabin (str): Cabin class
+            passenger (str): Passenger's full name
+            email (str): Contact email
+            price (Optional[str]): Quoted price
+            timeout (float): Seconds to wait for the write to commit
+            
+        Returns:
+            Tuple[str, bool]: Booking reference, and whether a new booking was created
+        """
+        reference = f"SIM-{new_ulid()}"
+        key = idempotency_key(conversation_id, destination, travel_date, cabin, passenger, email)
+        row = (reference, key, conversation_id, destination, travel_date, cabin, passenger, email, price, time.time())
+        future: Future = Future()
+        self._queue.put((row, future))
+        stored_reference = future.result(timeout)
+        return stored_reference, stored_reference == reference
+
+    def find_by_reference(self, reference: str) -> Optional[Dict]:
+        """Look up a booking by its reference."""
+        rows = self._query("SELECT * FROM bookings WHERE reference = ?", (reference,))
+        return rows[0] if rows else None
+
+    def find_booking(self, conversation_id: str, destination: str, travel_date: str, cabin: str,
+                     passenger: str, email: str) -> Optional[Dict]:
+        """Look up the booking record() stored for these details, if any."""
+        key = idempotency_key(conversation_id, destination, travel_date, cabin, passenger, email)
+        rows = self._query("SELECT * FROM bookings WHERE idempotency_key = ?", (key,))
+        return rows[0] if rows else None
+
+    def find_by_email(self, email: str) -> List[Dict]:
+        """List the bookings made with an email address, oldest first."""
+        return self._query(
+            "SELECT * FROM bookings WHERE email = ? COLLATE NOCASE ORDER BY reference", (email.strip(),)
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.row_factory = sqlite3.Row
+        return db
+
+    def _query(self, sql: str, params: Tuple) -> List[Dict]:
+        db = getattr(self._readers, "db", None)
+        if db is None:
+            db = self._readers.db = self._connect()
+        return [dict(row) for row in db.execute(sql, params)]
+
+    def _write_loop(self, db: sqlite3.Connection) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                references = []
+                for row, _ in batch:
+                    db.execute("INSERT INTO bookings (reference, idempotency_key, conversation_id, destination, "
+                               "travel_date, cabin, passenger, email, price, created_at) "
+                               "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (idempotency_key) DO NOTHING", row)
+                    references.append(db.execute(
+                        "SELECT reference FROM bookings WHERE idempotency_key = ?", (row[1],)
+                    ).fetchone()[0])
+                db.execute("COMMIT")
+            except sqlite3.Error as e:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), reference in zip(batch, references):
+                future.set_result(reference)
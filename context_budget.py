@@ -0,0 +1,97 @@
+"""
+Prompt token budgeting for long booking conversations.
+Provides a cheap token estimate for OpenAI messages, the per-model prompt
+budgets, and the summary that stands in for turns folded out of the prompt.
+"""
+
+import functools
+import json
+import os
+from typing import Dict, Optional
+
+# Prompt token budget per model; CONTEXT_TOKEN_BUDGET overrides it for every model
+MODEL_CONTEXT_BUDGETS = {
+    "gpt-4o-mini": 6000,
+    "gpt-4o": 6000,
+    "gpt-4-turbo-preview": 6000,
+}
+DEFAULT_CONTEXT_BUDGET = 4000
+
+# Fixed cost of a message's role and separators in the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def estimate_tokens(message: Dict) -> int:
+    """
+    Estimate the prompt tokens a message costs.
+    
+    Args:
+        message (Dict): Message in OpenAI wire format
+        
+    Returns:
+        int: Estimated token count
+        
+    Uses the usual ~4 characters per token for English text, which is
+    accurate enough for budgeting and avoids a tokenizer dependency.
+    """
+    chars = len(message.get("content") or "")
+    for tool_call in message.get("tool_calls") or ():
+        chars += len(tool_call["function"]["name"]) + len(tool_call["function"]["arguments"])
+    return MESSAGE_OVERHEAD_TOKENS + (chars + 3) // 4
+
+def estimate_schema_tokens(tools) -> int:
+    """Estimate the prompt tokens taken by the tool definitions."""
+    return (len(json.dumps(tools)) + 3) // 4
+
+def context_budget(model: str) -> int:
+    """
+    Return the prompt token budget for a model.
+    
+    Args:
+        model (str): OpenAI model name
+        
+    Returns:
+        int: CONTEXT_TOKEN_BUDGET if set, else the model's entry in MODEL_CONTEXT_BUDGETS
+    """
+    override = os.getenv("CONTEXT_TOKEN_BUDGET")
+    if override:
+        return int(override)
+    return MODEL_CONTEXT_BUDGETS.get(model, DEFAULT_CONTEXT_BUDGET)
+
+@functools.lru_cache(maxsize=4096)
+def build_summary(destination: Optional[str], price: Optional[str], name: Optional[str],
+                  email: Optional[str], booking_stage: str) -> Dict:
+    """
+    Build the system message that replaces turns folded out of the prompt.
+    
+    Args:
+        destination (Optional[str]): Destination agreed so far
+        price (Optional[str]): Price quoted for the destination
+        name (Optional[str]): Validated passenger name
+        email (Optional[str]): Validated contact email
+        booking_stage (str): Current stage in the booking process
+        
+    Returns:
+        Dict: System message summarizing the folded turns
+        
+    The text depends on the facts alone, not on how many turns were folded,
+    and results are cached, so equal facts reuse one message object and one
+    serialized form.
+    """
+    facts = [
+        f"{label}: {value}"
+        for label, value in (
+            ("destination", destination and destination.title()),
+            ("quoted price", price),
+            ("passenger name", name),
+            ("email", email),
+            ("booking stage", booking_stage),
+        )
+        if value
+    ]
+    return {
+        "role": "system",
+        "content": (
+            f"Summary of the earliest exchanges of this conversation, which are not shown. "
+            f"Booking details known when they were left out - {'; '.join(facts)}."
+        )
+    }
@@ -0,0 +1,205 @@
+"""
+Incremental OpenAI message buffer for one conversation.
+Instead of rebuilding the message list from the Gradio history on every turn,
+the buffer appends only the new turn, keeps the tool-call and tool-result
+messages from earlier turns, and maintains a running digest and token
+prefix sums of the messages, so neither response cache keys nor the prompt
+token budget ever rescan the whole conversation.
+"""
+
+import bisect
+import hashlib
+from typing import Dict, List, Optional, Tuple, Union
+
+from context_budget import estimate_tokens
+from response_cache import update_digest
+
+# Gradio chat history: (user, assistant) pairs, or message dicts in its messages format
+History = List[Union[Tuple[str, str], Dict]]
+
+def _message_text(content) -> str:
+    """Text of a Gradio message's content: a string, or a list of parts of which text ones count."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(
+            part if isinstance(part, str) else part.get("text") or ""
+            for part in content
+            if isinstance(part, str) or (isinstance(part, dict) and part.get("type") == "text")
+        )
+    return ""
+
+def history_pairs(history: History) -> List[Tuple[str, str]]:
+    """
+    Read Gradio chat history as (user, assistant) pairs.
+    
+    Args:
+        history (History): (user, assistant) pairs, or message dicts with
+            "role" and "content" as Gradio's messages format passes them
+            
+    Returns:
+        List[Tuple[str, str]]: One pair per exchange. Consecutive messages of
+        one role are joined, and files and components are left out
+    """
+    if not history or not isinstance(history[0], dict):
+        return history
+    pairs = []
+    user, replies = None, []
+    for message in history:
+        text = _message_text(message.get("content"))
+        if message.get("role") == "user":
+            if replies:
+                pairs.append((user or "", "\n\n".join(replies)))
+                user, replies = None, []
+            user = text if user is None else f"{user}\n{text}"
+        elif message.get("role") == "assistant":
+            replies.append(text)
+    if replies:
+        pairs.append((user or "", "\n\n".join(replies)))
+    return pairs
+
+class ConversationBuffer:
+    """
+    Message list of a conversation, grown one turn at a time.
+    
+    Attributes:
+        messages (List[Dict]): Messages in OpenAI wire format, starting with the system prompt
+        turns (int): Number of completed user/assistant exchanges
+        summary (Optional[Tuple[int, Dict]]): Folded turn count and the summary
+            message standing in for them, kept by the caller until the next fold
+        
+    A turn is opened by begin_turn(), may append tool messages, and is closed
+    by end_turn() with the reply shown to the user, or undone by rollback().
+    """
+    def __init__(self, system: Dict):
+        self.system = system
+        self.messages: List[Dict] = []
+        self.turns = 0
+        self._digest = hashlib.sha256()
+        # _token_sums[i] is the estimated token count of messages[:i]
+        self._token_sums: List[int] = [0]
+        # (message index, digest before it, reply) for every completed turn
+        self._marks: List[Tuple[int, object, str]] = []
+        self._open_turn: Optional[Tuple[int, object]] = None
+        self.summary: Optional[Tuple[int, Dict]] = None
+        self.append(system)
+
+    @classmethod
+    def from_history(cls, system: Dict, history: History) -> "ConversationBuffer":
+        """
+        Build a buffer from Gradio history, as chat() did before buffers existed.
+        
+        Args:
+            system (Dict): System message opening the conversation, shared as is
+            history (History): Conversation history as (user, assistant) pairs or message dicts
+            
+        Returns:
+            ConversationBuffer: Buffer holding one turn per exchange
+        """
+        buffer = cls(system)
+        for user_msg, assistant_msg in history_pairs(history):
+            buffer.begin_turn(user_msg)
+            buffer.end_turn(assistant_msg)
+        return buffer
+
+    def append(self, message: Dict) -> None:
+        """Add a message to the conversation and to the running digest."""
+        self.messages.append(message)
+        update_digest(self._digest, message)
+        self._token_sums.append(self._token_sums[-1] + estimate_tokens(message))
+
+    def digest(self):
+        """Return a copy of the running digest covering all messages."""
+        return self._digest.copy()
+
+    def begin_turn(self, user_message: str) -> None:
+        """Open a turn with the user's message."""
+        self.rollback()
+        self._open_turn = (len(self.messages), self._digest.copy())
+        self.append({"role": "user", "content": user_message})
+
+    def end_turn(self, reply: str) -> None:
+        """Close the open turn with the reply as shown to the user."""
+        start, digest = self._open_turn
+        self.append({"role": "assistant", "content": reply})
+        self._marks.append((start, digest, reply))
+        self.turns += 1
+        self._open_turn = None
+
+    def rollback(self) -> None:
+        """Drop the messages of a turn that did not complete."""
+        if self._open_turn is not None:
+            start, digest = self._open_turn
+            del self.messages[start:]
+            del self._token_sums[start + 1:]
+            self._digest = digest
+            self._open_turn = None
+
+    def sync(self, history: History) -> None:
+        """
+        Make the buffer agree with the history Gradio sent for this turn.
+        
+        Args:
+            history (History): Conversation history as (user, assistant) pairs or message dicts
+            
+        The common case, where history is exactly the turns already buffered,
+        costs O(1) for pairs; message dicts are first read into pairs in one
+        pass over the history. If the user retried or undid turns, the buffer
+        is cut back to the matching turn; if the history is otherwise
+        different (cleared, edited, or from another tab), the buffer is
+        rebuilt from it.
+        """
+        self.rollback()
+        history = history_pairs(history)
+        kept = len(history)
+        if kept == self.turns and (not kept or history[-1][1] == self._marks[-1][2]):
+            return
+        if kept < self.turns and (not kept or history[-1][1] == self._marks[kept - 1][2]):
+            start, digest, _ = self._marks[kept]
+            del self.messages[start:]
+            del self._token_sums[start + 1:]
+            del self._marks[kept:]
+            self._digest = digest
+            self.turns = kept
+            self.summary = None
+            return
+
+        self.__init__(self.system)
+        for user_msg, assistant_msg in history:
+            self.begin_turn(user_msg)
+            self.end_turn(assistant_msg)
+
+    def tokens(self, start: int = 0) -> int:
+        """Return the estimated token count of messages[start:]."""
+        return self._token_sums[-1] - self._token_sums[start]
+
+    def window(self, budget: int, keep_turns: int, block: int = 1) -> Tuple[int, int]:
+        """
+        Choose which completed turns to send verbatim under a token budget.
+        
+        Args:
+            budget (int): Tokens available for the conversation after the system prompt
+            keep_turns (int): Most recent completed turns always sent verbatim
+            block (int): Turns are folded a multiple of block at a time, so the
+                folded range only moves every block turns
+            
+        Returns:
+            Tuple[int, int]: Index of the first message to send after the system
+            prompt, and the number of earlier turns folded out
+            
+        Turns are only cut at their start, so tool calls always stay with their
+        results. The search is a bisection over turn starts, O(log turns).
+        """
+        foldable = max(len(self._marks) - keep_turns, 0)
+        if not foldable or self.tokens(1) <= budget:
+            return 1, 0
+
+        # Message suffixes shrink as the start moves to later turns; find the first that fits
+        end = self._token_sums[-1]
+        folded = bisect.bisect_left(
+            range(foldable), True, key=lambda turn: end - self._token_sums[self._marks[turn][0]] <= budget
+        )
+        folded = min(-(-folded // block) * block, foldable)
+        if folded < len(self._marks):
+            return self._marks[folded][0], folded
+        return self._open_turn[0], folded
@@ -0,0 +1,234 @@
+"""
+Destination resolver.
+Free text naming a destination ("London Heathrow", "LHR", "Londres",
+"london ") is resolved to a canonical destination through an index built
+once at startup: IATA city and airport codes, aliases and accent-stripped,
+case-folded names map straight to a destination, and anything else falls
+back to trigram similarity so small typos still resolve. A fuzzy match must
+also be within a small edit distance for its length, unambiguous, and not a
+longer name that merely starts with a known one ("Londonderry", "Roman"),
+so other real places are never taken for a known city. Results are cached,
+so repeated lookups cost a dictionary hit.
+"""
+
+import csv
+import re
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+_NON_ALPHANUMERIC = re.compile(r"[^\w]+")
+_GENERIC_WORDS = {"airport", "international", "intl", "int", "apt", "city", "the"}
+
+class Destination(NamedTuple):
+    code: str
+    name: str
+    popularity: int = 0
+
+def normalize(text: str) -> str:
+    """
+    Reduce a place name to the form used as an index key.
+    
+    Args:
+        text (str): Free text naming a place
+        
+    Returns:
+        str: Case-folded text without accents, punctuation or generic words
+        such as "airport"
+        
+    Example:
+        >>> normalize("  Paris-Orly Airport ")
+        "paris orly"
+    """
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    words = _NON_ALPHANUMERIC.sub(" ", stripped.casefold()).replace("_", " ").split()
+    return " ".join(word for word in words if word not in _GENERIC_WORDS)
+
+def _is_code(name: str) -> bool:
+    """True for IATA city and airport codes such as "LON" or "CDG"."""
+    return len(name) == 3 and name.isalpha() and name.isupper()
+
+def edit_distance(a: str, b: str) -> int:
+    """
+    Edits turning a into b: insertions, deletions, substitutions and swaps of adjacent characters.
+    
+    Args:
+        a (str): First string
+        b (str): Second string
+        
+    Returns:
+        int: Optimal string alignment distance
+    """
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class DestinationResolver:
+    """
+    Prebuilt index from names, aliases and codes to destinations.
+    
+    Attributes:
+        destinations (List[Destination]): Every known destination, in file order
+        aliases (Dict[str, List[str]]): Alternative names and codes per destination code
+        min_similarity (float): Lowest trigram (Dice) similarity for a fuzzy candidate
+        max_edit_ratio (float): Edits allowed per character of the candidate's name
+        ambiguity_margin (float): A candidate within this similarity of one for
+            another destination is ambiguous and rejected
+    """
+    def __init__(self, destinations: Iterable[Destination], aliases: Optional[Dict[str, Iterable[str]]] = None,
+                 min_similarity: float = 0.5, max_edit_ratio: float = 0.25, ambiguity_margin: float = 0.1,
+                 cache_size: int = 4096):
+        self.destinations: List[Destination] = list(destinations)
+        self.aliases: Dict[str, List[str]] = {code: list(names) for code, names in (aliases or {}).items()}
+        self.min_similarity = min_similarity
+        self.max_edit_ratio = max_edit_ratio
+        self.ambiguity_margin = ambiguity_margin
+        self._by_key: Dict[str, Destination] = {}
+        for destination in self.destinations:
+            names = [destination.code, destination.name, *self.aliases.get(destination.code, ())]
+            for name in names:
+                key = normalize(name)
+                if key:
+                    self._by_key.setdefault(key, destination)
+
+        self._keys: List[str] = list(self._by_key)
+        self._key_trigrams: List[int] = []
+        self._trigram_index: Dict[str, List[int]] = defaultdict(list)
+        for position, key in enumerate(self._keys):
+            trigrams = _trigrams(key)
+            self._key_trigrams.append(len(trigrams))
+            for trigram in trigrams:
+                self._trigram_index[trigram].append(position)
+        self._trigram_index = dict(self._trigram_index)
+
+        # Mentions in free text: codes only in capitals right after "to", "from",
+        # "for" or "via", and names of at least four letters, so "cia" or "rom"
+        # in a sentence, or "the CIA", never count
+        self._by_code: Dict[str, Destination] = {}
+        names: Set[str] = set()
+        for destination in self.destinations:
+            for name in [destination.code, destination.name, *self.aliases.get(destination.code, ())]:
+                name = name.strip()
+                if _is_code(name):
+                    self._by_code.setdefault(name, destination)
+                elif len(normalize(name)) >= 4:
+                    names.add(normalize(name))
+        self._code_pattern = re.compile(
+            r"(?i:\b(?:to|from|for|via)\s+)(" + "|".join(map(re.escape, self._by_code)) + r")\b"
+        )
+        # Longest names first so "london heathrow" wins over "london"
+        alternatives = sorted(names, key=len, reverse=True)
+        self._mention_pattern = re.compile(r"\b(" + "|".join(map(re.escape, alternatives)) + r")\b")
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "DestinationResolver":
+        """
+        Build a resolver from a CSV file with code, name, popularity and aliases columns.
+        
+        Args:
+            path (str): CSV file; aliases are separated by "|" and popularity is optional
+            **kwargs: Passed on to the constructor
+            
+        Returns:
+            DestinationResolver: The resolver
+        """
+        destinations = []
+        aliases = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                code = row["code"].strip().upper()
+                destinations.append(Destination(code, row["name"].strip(), int(row.get("popularity") or 0)))
+                aliases[code] = [alias for alias in (row.get("aliases") or "").split("|") if alias.strip()]
+        return cls(destinations, aliases, **kwargs)
+
+    def _resolve(self, text: str) -> Optional[Destination]:
+        """
+        Resolve free text to a destination.
+        
+        Args:
+            text (str): City, airport, code or alias, in any case and spelling
+            
+        Returns:
+            Optional[Destination]: The best match, or None if nothing is
+            similar enough or the text could as well be another place
+            
+        Exposed as resolve(), wrapped in an LRU cache.
+        """
+        key = normalize(text)
+        if not key:
+            return None
+        destination = self._by_key.get(key)
+        if destination is not None:
+            return destination
+
+        trigrams = _trigrams(key)
+        shared: Dict[int, int] = defaultdict(int)
+        for trigram in trigrams:
+            for position in self._trigram_index.get(trigram, ()):
+                shared[position] += 1
+        # Best similarity per destination, and the name reaching it
+        candidates: Dict[Destination, Tuple[float, str]] = {}
+        for position, count in shared.items():
+            score = 2 * count / (len(trigrams) + self._key_trigrams[position])
+            destination = self._by_key[self._keys[position]]
+            if score >= self.min_similarity and score > candidates.get(destination, (0.0, ""))[0]:
+                candidates[destination] = (score, self._keys[position])
+        if not candidates:
+            return None
+        ranked = sorted(candidates.items(), key=lambda item: item[1][0], reverse=True)
+        destination, (score, name) = ranked[0]
+        if len(ranked) > 1 and score - ranked[1][1][0] < self.ambiguity_margin:
+            return None
+        if self._near_miss(key, name):
+            return None
+        return destination
+
+    def _near_miss(self, key: str, name: str) -> bool:
+        """True if key is likely another place rather than a misspelling of the known name."""
+        if len(key.split()) != len(name.split()):
+            return True
+        if key.startswith(name) or name.startswith(key):
+            return True
+        return edit_distance(key, name) > int(len(name) * self.max_edit_ratio)
+
+    def resolve_exact(self, text: str) -> Optional[Destination]:
+        """
+        Resolve text that is exactly a known name, alias or code, with no fuzzy matching.
+        
+        Args:
+            text (str): City, airport, code or alias, in any case
+            
+        Returns:
+            Optional[Destination]: The destination, or None
+        """
+        return self._by_key.get(normalize(text))
+
+    def mentions(self, text: str) -> Set[Destination]:
+        """
+        Find the destinations named anywhere in a message.
+        
+        Args:
+            text (str): Free text such as a user message
+            
+        Returns:
+            Set[Destination]: Destinations whose name or alias appears as whole
+            words, or whose code appears in capitals after "to", "from", "for"
+            or "via"; no fuzzy matching, so ordinary words never count
+        """
+        found = {self._by_code[code] for code in self._code_pattern.findall(text or "")}
+        found.update(self._by_key[key] for key in self._mention_pattern.findall(normalize(text)))
+        return found
@@ -0,0 +1,193 @@
+"""
+Two-tier cache in front of a fare provider.
+Fares are kept in an in-process LRU bounded by approximate bytes, with a
+freshness TTL per route, and optionally in a SQLite file shared by every
+worker process on the host. A fare past its TTL but within the stale window
+is still served immediately while one background refresh fetches a new one
+(stale-while-revalidate), so a popular route never makes a tool call wait
+on the network once it is warm.
+"""
+
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Set, Tuple
+
+import metrics
+from fare_provider import FareKey, FareProvider, fare_key
+
+logger = logging.getLogger(__name__)
+
+# Per-entry overhead beyond the key strings: the OrderedDict node, the entry tuple and its floats
+_ENTRY_OVERHEAD_BYTES = 200
+
+def parse_route_ttls(spec: str) -> Dict[Tuple[str, str], float]:
+    """
+    Parse per-route TTLs written as "NYC-LON=60,NYC-TYO=300".
+
+    Args:
+        spec (str): Comma-separated ORIGIN-DESTINATION=seconds pairs
+
+    Returns:
+        Dict[Tuple[str, str], float]: TTL in seconds per (origin, destination)
+    """
+    ttls = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        route, seconds = item.split("=")
+        origin, destination = route.strip().upper().split("-")
+        ttls[(origin, destination)] = float(seconds)
+    return ttls
+
+class FareCache(FareProvider):
+    """
+    Caching FareProvider wrapping another provider.
+
+    Attributes:
+        provider (FareProvider): Source of fares on a miss or refresh
+        max_bytes (int): Approximate memory bound of the in-process tier
+        ttl (float): Seconds a fare stays fresh, unless its route has its own
+        route_ttls (Dict[Tuple[str, str], float]): Freshness per (origin, destination)
+        stale_ttl (float): Seconds past freshness a fare may still be served while refreshing
+        path (Optional[str]): SQLite file of the shared tier, None for memory only
+
+    Lookups are counted in metrics as "fare_cache.hit", "fare_cache.stale_hit",
+    "fare_cache.shared_hit" and "fare_cache.miss", background refreshes as
+    "fare_cache.refresh".
+    """
+    def __init__(self, provider: FareProvider, max_bytes: int = 16 * 1024 * 1024, ttl: float = 300.0,
+                 route_ttls: Optional[Dict[Tuple[str, str], float]] = None, stale_ttl: float = 3600.0,
+                 path: Optional[str] = None, refresh_workers: int = 4):
+        self.provider = provider
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.route_ttls = dict(route_ttls or {})
+        self.stale_ttl = stale_ttl
+        self.path = path
+        # key -> (fare, fetched_at, size)
+        self._entries: "OrderedDict[FareKey, Tuple[Optional[int], float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._refreshing: Set[FareKey] = set()
+        self._refresher = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="fare-refresh")
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS fares (key TEXT PRIMARY KEY, fare INTEGER, fetched_at REAL)")
+
+    def _ttl(self, key: FareKey) -> float:
+        return self.route_ttls.get((key[0], key[1]), self.ttl)
+
+    def fare(self, origin: str, destination: str, date=None, cabin: str = "economy") -> Optional[int]:
+        key = fare_key(origin, destination, date, cabin)
+        found, fare = self._cached(key)
+        if found:
+            return fare
+        return self._fetch(key)
+
+    async def afare(self, origin: str, destination: str, date=None, cabin: str = "economy") -> Optional[int]:
+        key = fare_key(origin, destination, date, cabin)
+        found, fare = self._cached(key)
+        if found:
+            return fare
+        fare = await self.provider.afare(*key)
+        self._store(key, fare, time.time(), write_through=True)
+        return fare
+
+    def _cached(self, key: FareKey) -> Tuple[bool, Optional[int]]:
+        """Serve a fresh or stale fare from either tier, scheduling a refresh for stale ones."""
+        now = time.time()
+        ttl = self._ttl(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None or now - entry[1] > ttl:
+            # Another worker may have fetched a newer fare into the shared tier
+            shared = self._shared_get(key)
+            if shared is not None and (entry is None or shared[1] > entry[1]):
+                metrics.increment("fare_cache.shared_hit")
+                self._store(key, shared[0], shared[1], write_through=False)
+                entry = shared
+        if entry is None:
+            metrics.increment("fare_cache.miss")
+            return False, None
+
+        fare, fetched_at = entry[0], entry[1]
+        age = now - fetched_at
+        if age <= ttl:
+            metrics.increment("fare_cache.hit")
+            return True, fare
+        if age <= ttl + self.stale_ttl:
+            metrics.increment("fare_cache.stale_hit")
+            self._schedule_refresh(key)
+            return True, fare
+        metrics.increment("fare_cache.miss")
+        return False, None
+
+    def _fetch(self, key: FareKey) -> Optional[int]:
+        fare = self.provider.fare(*key)
+        self._store(key, fare, time.time(), write_through=True)
+        return fare
+
+    def _schedule_refresh(self, key: FareKey) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        metrics.increment("fare_cache.refresh")
+        self._refresher.submit(self._refresh, key)
+
+    def _refresh(self, key: FareKey) -> None:
+        try:
+            self._fetch(key)
+        except Exception as e:
+            # Keep serving the stale fare; the next stale hit retries
+            logger.warning(f"Fare refresh failed for {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key: FareKey, fare: Optional[int], fetched_at: float, write_through: bool) -> None:
+        size = sys.getsizeof(key) + sum(map(sys.getsizeof, key)) + _ENTRY_OVERHEAD_BYTES
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._entries[key] = (fare, fetched_at, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+        if write_through and self._db is not None:
+            try:
+                with self._db_lock:
+                    self._db.execute("INSERT OR REPLACE INTO fares VALUES (?, ?, ?)",
+                                     ("|".join(key), fare, fetched_at))
+            except sqlite3.Error as e:
+                logger.warning(f"Fare cache write failed: {str(e)}")
+
+    def _shared_get(self, key: FareKey) -> Optional[Tuple[Optional[int], float]]:
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute("SELECT fare, fetched_at FROM fares WHERE key = ?", ("|".join(key),)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    @property
+    def size_bytes(self) -> int:
+        """Approximate bytes held by the in-process tier."""
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def close(self) -> None:
+        self._refresher.shutdown(wait=False)
+        self.provider.close()
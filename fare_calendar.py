@@ -0,0 +1,84 @@
+"""
+Fare calendar: cheapest day to fly within any date window.
+For every (origin, destination, cabin) series of a FareTable, a sparse
+table is precomputed: level j holds, for each day, the position of the
+lowest fare in the 2**j days starting there. Any window is covered by two
+overlapping power-of-two blocks, so the cheapest day in a window is an O(1)
+query however long the window is.
+"""
+
+import array
+from typing import List, Optional, Tuple
+
+from fare_engine import NO_FARE, FareTable, _parse_date
+
+# Days without a fare must never win a minimum
+_MISSING = 2 ** 31 - 1
+
+class FareCalendar:
+    """
+    Range-minimum index over the daily fares of a FareTable.
+
+    Attributes:
+        table (FareTable): The fares being indexed
+    """
+    def __init__(self, table: FareTable):
+        self.table = table
+        self._levels: List[List[array.array]] = [
+            self._build(series) for series in range(len(table.series_start))
+        ]
+
+    def _build(self, series: int) -> List[array.array]:
+        start = self.table.series_start[series]
+        days = self.table.series_days[series]
+        values = array.array("i", (fare if fare != NO_FARE else _MISSING
+                                   for fare in self.table.fares[start:start + days]))
+        levels = [array.array("i", range(days))]
+        width = 1
+        while 2 * width <= days:
+            previous = levels[-1]
+            levels.append(array.array("i", [
+                left if values[left] <= values[right] else right
+                for left, right in zip(previous, previous[width:])
+            ]))
+            width *= 2
+        return levels
+
+    def _argmin(self, series: int, low: int, high: int) -> int:
+        """Position of the lowest fare among positions low..high of a series."""
+        level = (high - low + 1).bit_length() - 1
+        positions = self._levels[series][level]
+        left, right = positions[low], positions[high - (1 << level) + 1]
+        start = self.table.series_start[series]
+        fares = self.table.fares
+        left_fare = fares[start + left] if fares[start + left] != NO_FARE else _MISSING
+        right_fare = fares[start + right] if fares[start + right] != NO_FARE else _MISSING
+        return left if left_fare <= right_fare else right
+
+    def cheapest(self, origin: str, destination: str, first_date, last_date,
+                 cabin: str = "economy") -> Optional[Tuple[int, int]]:
+        """
+        Find the cheapest day to fly within a date window.
+
+        Args:
+            origin (str): Origin station code
+            destination (str): Destination station code
+            first_date: First travel date, as accepted by FareTable.fare()
+            last_date: Last travel date, inclusive
+            cabin (str): Cabin name
+
+        Returns:
+            Optional[Tuple[int, int]]: (date ordinal, fare in cents) of the
+            earliest cheapest day, or None if the window has no fares
+        """
+        series = self.table.series(origin, destination, cabin)
+        if series is None:
+            return None
+        series_first = self.table.series_first_day[series]
+        low = max(_parse_date(first_date), series_first) - series_first
+        high = min(_parse_date(last_date) - series_first, self.table.series_days[series] - 1)
+        if low > high:
+            return None
+        position = self._argmin(series, low, high)
+        fare = self.table.fares[self.table.series_start[series] + position]
+        return None if fare == NO_FARE else (series_first + position, fare)
@@ -0,0 +1,330 @@
+"""
+Structured fare engine.
+Fares are integer cents indexed by (origin, destination, date, cabin). They
+are loaded once from a columnar file into flat arrays: every (origin,
+destination, cabin) series owns a contiguous slice of one fare array with
+one slot per day, so a quote is a dictionary lookup for the series plus an
+array index for the date, and a table of millions of fares holds no
+per-fare Python objects.
+"""
+
+import array
+import csv
+import datetime
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+NO_FARE = -1
+CABINS = ("economy", "premium", "business", "first")
+
+_SNAPSHOT_MAGIC = b"FARES1\n"
+_FARE_COLUMNS = ("origin", "destination", "date", "cabin", "fare_cents")
+
+def format_fare(cents: int) -> str:
+    """
+    Format a fare for display.
+
+    Args:
+        cents (int): Fare in integer cents
+
+    Returns:
+        str: Dollar amount, with cents only when the fare has any
+
+    Example:
+        >>> format_fare(79900)
+        "$799"
+    """
+    dollars, remainder = divmod(cents, 100)
+    return f"${dollars}" if not remainder else f"${dollars}.{remainder:02d}"
+
+def _parse_date(value) -> int:
+    if isinstance(value, int):
+        return value
+    if isinstance(value, datetime.date):
+        return value.toordinal()
+    return datetime.date.fromisoformat(value).toordinal()
+
+class FareTable:
+    """
+    Array-backed fare lookup table.
+
+    Stations and cabins are interned to small integers. Each (origin,
+    destination, cabin) series stores its first day, its offset into the
+    shared fare array and its length; days without a fare hold NO_FARE.
+
+    Use FareTable.load() to read a fare file, or FareTable.from_columns()
+    to build a table from parallel column sequences.
+    """
+
+    def __init__(self):
+        self.stations: List[str] = []
+        self.cabins: List[str] = list(CABINS)
+        self.fares = array.array("i")
+        self.series_start = array.array("q")
+        self.series_first_day = array.array("i")
+        self.series_days = array.array("i")
+        self._station_ids: Dict[str, int] = {}
+        self._cabin_ids: Dict[str, int] = {cabin: i for i, cabin in enumerate(self.cabins)}
+        self._series: Dict[Tuple[int, int, int], int] = {}
+        self.first_day = 0
+        self.last_day = -1
+
+    def __len__(self) -> int:
+        """Number of fares in the table."""
+        return len(self.fares) - self.fares.count(NO_FARE)
+
+    def _intern_station(self, code: str) -> int:
+        code = code.strip().upper()
+        station = self._station_ids.get(code)
+        if station is None:
+            station = self._station_ids[code] = len(self.stations)
+            self.stations.append(code)
+        return station
+
+    def _intern_cabin(self, cabin: str) -> int:
+        cabin = cabin.strip().lower()
+        cabin_id = self._cabin_ids.get(cabin)
+        if cabin_id is None:
+            cabin_id = self._cabin_ids[cabin] = len(self.cabins)
+            self.cabins.append(cabin)
+        return cabin_id
+
+    @classmethod
+    def from_columns(cls, origins: Iterable[str], destinations: Iterable[str], dates: Iterable,
+                     cabins: Iterable[str], fare_cents: Iterable[int]) -> "FareTable":
+        """
+        Build a table from parallel columns.
+
+        Args:
+            origins (Iterable[str]): Origin station codes
+            destinations (Iterable[str]): Destination station codes
+            dates (Iterable): ISO dates, datetime.date objects or ordinals
+            cabins (Iterable[str]): Cabin names
+            fare_cents (Iterable[int]): Fares in integer cents
+
+        Returns:
+            FareTable: The loaded table; a later row for the same key wins
+        """
+        table = cls()
+        # Intern every column into compact arrays first, then lay out the series
+        series_ids = array.array("i")
+        days = array.array("i")
+        cents = array.array("i")
+        bounds: List[List[int]] = []
+        # Rows repeat a handful of distinct keys and dates, so parse each one once
+        series_by_key: Dict[Tuple, int] = {}
+        day_by_date: Dict = {}
+        for origin, destination, date, cabin, fare in zip(origins, destinations, dates, cabins, fare_cents):
+            series = series_by_key.get((origin, destination, cabin))
+            if series is None:
+                key = (table._intern_station(origin), table._intern_station(destination), table._intern_cabin(cabin))
+                series = table._series.get(key)
+                if series is None:
+                    series = table._series[key] = len(bounds)
+                    bounds.append([])
+                series_by_key[(origin, destination, cabin)] = series
+            day = day_by_date.get(date)
+            if day is None:
+                day = day_by_date[date] = _parse_date(date)
+            series_ids.append(series)
+            days.append(day)
+            cents.append(int(fare))
+
+        for series, day in zip(series_ids, days):
+            low_high = bounds[series]
+            if not low_high:
+                low_high += (day, day)
+            elif day < low_high[0]:
+                low_high[0] = day
+            elif day > low_high[1]:
+                low_high[1] = day
+
+        offset = 0
+        for first, last in bounds:
+            table.series_start.append(offset)
+            table.series_first_day.append(first)
+            table.series_days.append(last - first + 1)
+            offset += last - first + 1
+        table.fares = array.array("i", [NO_FARE]) * offset
+        for series, day, fare in zip(series_ids, days, cents):
+            table.fares[table.series_start[series] + day - table.series_first_day[series]] = fare
+        table._update_date_range()
+        return table
+
+    @classmethod
+    def load(cls, path: str) -> "FareTable":
+        """
+        Load a fare file.
+
+        Args:
+            path (str): CSV file with origin, destination, date, cabin and
+                fare_cents columns, or a snapshot written by save()
+
+        Returns:
+            FareTable: The loaded table
+        """
+        with open(path, "rb") as f:
+            is_snapshot = f.read(len(_SNAPSHOT_MAGIC)) == _SNAPSHOT_MAGIC
+        if is_snapshot:
+            return cls._load_snapshot(path)
+
+        columns: Dict[str, list] = {name: [] for name in _FARE_COLUMNS}
+        with open(path, newline="") as f:
+            reader = csv.reader(f)
+            header = [name.strip() for name in next(reader)]
+            missing = set(_FARE_COLUMNS) - set(header)
+            if missing:
+                raise ValueError(f"Fare file {path} is missing columns: {', '.join(sorted(missing))}")
+            positions = [(columns[name].append, header.index(name)) for name in _FARE_COLUMNS]
+            for row in reader:
+                if row:
+                    for append, position in positions:
+                        append(row[position])
+        return cls.from_columns(columns["origin"], columns["destination"], columns["date"],
+                                columns["cabin"], columns["fare_cents"])
+
+    def save(self, path: str) -> None:
+        """
+        Write a binary snapshot that load() reads without parsing any rows.
+
+        Args:
+            path (str): Destination file
+        """
+        header = json.dumps({
+            "stations": self.stations,
+            "cabins": self.cabins,
+            "series": [list(key) for key in self._series],
+        }).encode()
+        with open(path, "wb") as f:
+            f.write(_SNAPSHOT_MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            for column in (self.series_start, self.series_first_day, self.series_days, self.fares):
+                f.write(len(column).to_bytes(8, "little"))
+                column.tofile(f)
+
+    @classmethod
+    def _load_snapshot(cls, path: str) -> "FareTable":
+        table = cls()
+        with open(path, "rb") as f:
+            f.read(len(_SNAPSHOT_MAGIC))
+            header = json.loads(f.read(int.from_bytes(f.read(8), "little")))
+            for column in (table.series_start, table.series_first_day, table.series_days, table.fares):
+                column.fromfile(f, int.from_bytes(f.read(8), "little"))
+        table.stations = header["stations"]
+        table.cabins = header["cabins"]
+        table._station_ids = {code: i for i, code in enumerate(table.stations)}
+        table._cabin_ids = {cabin: i for i, cabin in enumerate(table.cabins)}
+        table._series = {tuple(key): i for i, key in enumerate(header["series"])}
+        table._update_date_range()
+        return table
+
+    def _update_date_range(self) -> None:
+        if self._series:
+            self.first_day = min(self.series_first_day)
+            self.last_day = max(first + days - 1 for first, days in zip(self.series_first_day, self.series_days))
+
+    def series(self, origin: str, destination: str, cabin: str = "economy") -> Optional[int]:
+        """
+        Look up the series index of a route and cabin.
+
+        Args:
+            origin (str): Origin station code
+            destination (str): Destination station code
+            cabin (str): Cabin name
+
+        Returns:
+            Optional[int]: Series index, or None if the table has no fares for it
+        """
+        origin_id = self._station_ids.get(origin.upper())
+        destination_id = self._station_ids.get(destination.upper())
+        cabin_id = self._cabin_ids.get(cabin.lower())
+        if origin_id is None or destination_id is None or cabin_id is None:
+            return None
+        return self._series.get((origin_id, destination_id, cabin_id))
+
+    def fare(self, origin: str, destination: str, date=None, cabin: str = "economy") -> Optional[int]:
+        """
+        Quote a fare.
+
+        Args:
+            origin (str): Origin station code
+            destination (str): Destination station code
+            date: Travel date as an ISO string, datetime.date or ordinal;
+                today when omitted
+            cabin (str): Cabin name
+
+        Returns:
+            Optional[int]: Fare in cents, or None if there is no fare
+        """
+        series = self.series(origin, destination, cabin)
+        if series is None:
+            return None
+        offset = _parse_date(date if date is not None else datetime.date.today()) - self.series_first_day[series]
+        if not 0 <= offset < self.series_days[series]:
+            return None
+        fare = self.fares[self.series_start[series] + offset]
+        return None if fare == NO_FARE else fare
+
+    def fare_matrix(self, origin: str, destinations: List[str], first_date, last_date,
+                    cabin: str = "economy") -> List[array.array]:
+        """
+        Quote every destination on every date of a range at once.
+
+        Args:
+            origin (str): Origin station code
+            destinations (List[str]): Destination station codes
+            first_date: First travel date, as accepted by fare()
+            last_date: Last travel date, inclusive
+            cabin (str): Cabin name
+
+        Returns:
+            List[array.array]: One row per destination with one fare in cents
+            per date, NO_FARE where there is none
+
+        Each row is one slice copy of the series plus NO_FARE padding where
+        the range runs past the dates the table covers, so the cost is a
+        handful of C-level copies per destination rather than a lookup per
+        fare.
+        """
+        first = _parse_date(first_date)
+        last = _parse_date(last_date)
+        if last < first:
+            raise ValueError("last_date is before first_date")
+        width = last - first + 1
+        empty = array.array("i", [NO_FARE]) * width
+        rows = []
+        for destination in destinations:
+            series = self.series(origin, destination, cabin) if destination else None
+            if series is None:
+                rows.append(empty)
+                continue
+            series_first = self.series_first_day[series]
+            low = max(first, series_first)
+            high = min(last, series_first + self.series_days[series] - 1)
+            if low > high:
+                rows.append(empty)
+                continue
+            start = self.series_start[series] - series_first
+            rows.append(empty[:low - first] + self.fares[start + low:start + high + 1] + empty[:last - high])
+        return rows
+
+    @staticmethod
+    def cheapest(row: array.array) -> Optional[Tuple[int, int]]:
+        """
+        Find the lowest fare in a fare_matrix() row.
+
+        Args:
+            row (array.array): Fares in cents, NO_FARE where there is none
+
+        Returns:
+            Optional[Tuple[int, int]]: (position in the row, fare in cents),
+            or None if the row has no fares
+        """
+        fare = min(filter(NO_FARE.__ne__, row), default=None)
+        return None if fare is None else (row.index(fare), fare)
+
+    def destinations(self, origin: str) -> List[str]:
+        """Station codes with at least one fare from origin."""
+        origin_id = self._station_ids.get(origin.upper())
+        return sorted({self.stations[destination] for o, destination, _ in self._series if o == origin_id})
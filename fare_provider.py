@@ -0,0 +1,187 @@
+"""
+Fare providers: where get_ticket_price gets its fares from.
+TableFareProvider reads the local FareTable. HttpFareProvider asks an
+external fare service over a pooled async HTTP client, and keeps upstream
+traffic down two ways: identical lookups already in flight share one
+result (singleflight), and distinct lookups arriving within a short batch
+window go upstream together in one request.
+
+The HTTP provider runs its client on a private event loop thread, so the
+synchronous tool path and any number of conversations share one
+connection pool and one in-flight table.
+"""
+
+import asyncio
+import datetime
+import logging
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+import httpx
+
+import metrics
+from fare_engine import FareTable
+
+logger = logging.getLogger(__name__)
+
+FareKey = Tuple[str, str, str, str]
+
+def fare_key(origin: str, destination: str, date=None, cabin: str = "economy") -> FareKey:
+    """
+    Normalize a lookup so equal questions compare equal.
+
+    Args:
+        origin (str): Origin station code
+        destination (str): Destination station code
+        date: ISO string, datetime.date or None for today
+        cabin (str): Cabin name
+
+    Returns:
+        FareKey: (ORIGIN, DESTINATION, YYYY-MM-DD, cabin)
+
+    Raises:
+        ValueError: If the date is malformed
+    """
+    if date is None:
+        date = datetime.date.today()
+    elif isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    return (origin.upper(), destination.upper(), date.isoformat(), cabin.lower())
+
+class FareProvider:
+    """Interface of a fare source; fares are integer cents, None when there is no fare."""
+
+    def fare(self, origin: str, destination: str, date=None, cabin: str = "economy") -> Optional[int]:
+        """Quote one fare from synchronous code."""
+        raise NotImplementedError
+
+    async def afare(self, origin: str, destination: str, date=None, cabin: str = "economy") -> Optional[int]:
+        """Quote one fare from a coroutine."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release connections and threads."""
+
+class TableFareProvider(FareProvider):
+    """Fares from an in-process FareTable."""
+
+    def __init__(self, table: FareTable):
+        self.table = table
+
+    def fare(self, origin: str, destination: str, date=None, cabin: str = "economy") -> Optional[int]:
+        return self.table.fare(origin, destination, date, cabin)
+
+    async def afare(self, origin: str, destination: str, date=None, cabin: str = "economy") -> Optional[int]:
+        return self.table.fare(origin, destination, date, cabin)
+
+class HttpFareProvider(FareProvider):
+    """
+    Fares from an HTTP fare service, with request coalescing and batching.
+
+    The service answers POST {base_url}/fares with a JSON body
+    {"queries": [[origin, destination, date, cabin], ...]} and returns
+    {"fares": [cents or null, ...]} in the same order.
+
+    Attributes:
+        base_url (str): Root URL of the fare service
+        timeout (float): Seconds before an upstream request fails
+        batch_window (float): Seconds distinct lookups wait to share a request
+        max_batch (int): Lookups per upstream request at most
+    """
+    def __init__(self, base_url: str, timeout: float = 2.0, batch_window: float = 0.002, max_batch: int = 64,
+                 max_connections: int = 20):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_connections = max_connections
+        self._inflight: Dict[FareKey, asyncio.Future] = {}
+        self._pending: List[FareKey] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._fetches: Set[asyncio.Task] = set()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="fare-provider", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def fare(self, origin: str, destination: str, date=None, cabin: str = "economy") -> Optional[int]:
+        future = asyncio.run_coroutine_threadsafe(self._lookup(fare_key(origin, destination, date, cabin)),
+                                                  self._ensure_loop())
+        return future.result(self.timeout + self.batch_window + 1)
+
+    async def afare(self, origin: str, destination: str, date=None, cabin: str = "economy") -> Optional[int]:
+        future = asyncio.run_coroutine_threadsafe(self._lookup(fare_key(origin, destination, date, cabin)),
+                                                  self._ensure_loop())
+        return await asyncio.wrap_future(future)
+
+    async def _lookup(self, key: FareKey) -> Optional[int]:
+        """Join the in-flight lookup for key, or queue a new one for the next batch."""
+        metrics.increment("fare_provider.lookups")
+        future = self._inflight.get(key)
+        if future is not None:
+            metrics.increment("fare_provider.coalesced")
+        else:
+            future = self._inflight[key] = asyncio.get_running_loop().create_future()
+            self._pending.append(key)
+            if len(self._pending) >= self.max_batch:
+                self._start_batch()
+            elif self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush_after_window())
+        # Shielded so one caller giving up does not cancel the others' result
+        return await asyncio.shield(future)
+
+    async def _flush_after_window(self) -> None:
+        await asyncio.sleep(self.batch_window)
+        self._flush_task = None
+        while self._pending:
+            self._start_batch()
+
+    def _start_batch(self) -> None:
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        # The loop only keeps weak references to tasks
+        task = asyncio.create_task(self._fetch(batch))
+        self._fetches.add(task)
+        task.add_done_callback(self._fetches.discard)
+
+    async def _fetch(self, batch: List[FareKey]) -> None:
+        metrics.increment("fare_provider.upstream_requests")
+        try:
+            if self._client is None:
+                self._client = httpx.AsyncClient(
+                    timeout=self.timeout,
+                    limits=httpx.Limits(max_connections=self.max_connections,
+                                        max_keepalive_connections=self.max_connections)
+                )
+            response = await self._client.post(f"{self.base_url}/fares", json={"queries": batch})
+            response.raise_for_status()
+            fares = response.json()["fares"]
+            if len(fares) != len(batch):
+                raise ValueError(f"Fare service returned {len(fares)} fares for {len(batch)} queries")
+        except Exception as e:
+            logger.error(f"Fare lookup failed for {len(batch)} queries: {e}")
+            metrics.increment("fare_provider.errors")
+            for key in batch:
+                future = self._inflight.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, fare in zip(batch, fares):
+            future = self._inflight.pop(key)
+            if not future.done():
+                future.set_result(fare)
+
+    def close(self) -> None:
+        if self._loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(self.timeout)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+        self._client = None
@@ -0,0 +1,201 @@
+"""
+Pooled HTTP clients for the OpenAI SDK.
+One httpx client per flavour (sync and async) is shared by every completion
+call, with explicit pool limits, keep-alive expiry and HTTP/2 when the h2
+package is installed, so bursts reuse warm TLS connections instead of
+opening new ones. prewarm() and aprewarm() open connections at startup.
+
+Every request reports to metrics whether it opened a new connection or
+reused one, and whether it found the pool saturated, i.e. every connection
+busy and none left to open, so it had to wait for one.
+"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, NamedTuple
+
+import httpx
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class PoolConfig(NamedTuple):
+    """Transport settings shared by the sync and async clients."""
+    max_connections: int = 100
+    max_keepalive: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = True
+    connect_timeout: float = 5.0
+    timeout: float = 60.0
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_keepalive,
+                            keepalive_expiry=self.keepalive_expiry)
+
+    @property
+    def timeouts(self) -> httpx.Timeout:
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+def http2_available() -> bool:
+    """True if the h2 package HTTP/2 needs is installed."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+@functools.lru_cache(maxsize=None)
+def _warn_no_http2() -> None:
+    logger.warning("HTTP/2 requested but the h2 package is not installed; using HTTP/1.1")
+
+def _use_http2(config: PoolConfig) -> bool:
+    if config.http2 and not http2_available():
+        _warn_no_http2()
+        return False
+    return config.http2
+
+def _pool_saturated(transport, max_connections: int) -> bool:
+    # httpx keeps its httpcore pool private; without it the check is skipped
+    connections = getattr(getattr(transport, "_pool", None), "connections", None)
+    if connections is None or len(connections) < max_connections:
+        return False
+    return not any(connection.is_available() for connection in connections)
+
+class _Counter:
+    """Turns httpcore trace events of one request into metrics."""
+    __slots__ = ("name", "opened")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.opened = False
+
+    def event(self, event_name: str) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self.opened = True
+            metrics.increment(f"{self.name}.connections_opened")
+        elif event_name == "connection.start_tls.complete":
+            metrics.increment(f"{self.name}.tls_handshakes")
+
+    def done(self) -> None:
+        metrics.increment(f"{self.name}.requests")
+        if not self.opened:
+            metrics.increment(f"{self.name}.connections_reused")
+
+class _MeteredTransport(httpx.HTTPTransport):
+    def __init__(self, name: str, max_connections: int, http2: bool, **kwargs):
+        super().__init__(http2=http2, **kwargs)
+        self.name = name
+        self.max_connections = max_connections
+        self.http2 = http2
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if _pool_saturated(self, self.max_connections):
+            metrics.increment(f"{self.name}.pool_saturated")
+        counter = _Counter(self.name)
+        request.extensions["trace"] = lambda event_name, info: counter.event(event_name)
+        response = super().handle_request(request)
+        counter.done()
+        return response
+
+class _AsyncMeteredTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, name: str, max_connections: int, http2: bool, **kwargs):
+        super().__init__(http2=http2, **kwargs)
+        self.name = name
+        self.max_connections = max_connections
+        self.http2 = http2
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if _pool_saturated(self, self.max_connections):
+            metrics.increment(f"{self.name}.pool_saturated")
+        counter = _Counter(self.name)
+
+        async def trace(event_name: str, info: Dict) -> None:
+            counter.event(event_name)
+
+        request.extensions["trace"] = trace
+        response = await super().handle_async_request(request)
+        counter.done()
+        return response
+
+def create_http_client(config: PoolConfig = PoolConfig(), name: str = "openai_http") -> httpx.Client:
+    """
+    Build a pooled, metered synchronous client.
+
+    Args:
+        config (PoolConfig): Pool limits, keep-alive, HTTP/2 and timeouts
+        name (str): Prefix of the client's metrics, e.g. "openai_http.connections_reused"
+
+    Returns:
+        httpx.Client: Client to hand to OpenAI(http_client=...)
+    """
+    transport = _MeteredTransport(name, config.max_connections, http2=_use_http2(config), limits=config.limits)
+    return httpx.Client(transport=transport, timeout=config.timeouts, follow_redirects=True)
+
+def create_async_http_client(config: PoolConfig = PoolConfig(), name: str = "openai_http") -> httpx.AsyncClient:
+    """Asynchronous counterpart of create_http_client(), for AsyncOpenAI(http_client=...)."""
+    transport = _AsyncMeteredTransport(name, config.max_connections, http2=_use_http2(config),
+                                       limits=config.limits)
+    return httpx.AsyncClient(transport=transport, timeout=config.timeouts, follow_redirects=True)
+
+def _prewarm_count(client, connections: int) -> int:
+    # One HTTP/2 connection multiplexes every request, so more would go unused
+    return min(connections, 1) if getattr(client._transport, "http2", False) else connections
+
+def prewarm(client: httpx.Client, url: str, connections: int) -> int:
+    """
+    Open connections ahead of the first real request.
+
+    Args:
+        client (httpx.Client): Client whose pool is warmed
+        url (str): Any URL on the API host; the response status is ignored
+        connections (int): Connections to open, at most the keep-alive limit
+
+    Returns:
+        int: Connections successfully warmed
+    """
+    count = _prewarm_count(client, connections)
+    if count <= 0:
+        return 0
+
+    def touch(_) -> bool:
+        try:
+            client.get(url)
+            return True
+        except httpx.HTTPError as e:
+            logger.warning(f"Connection pre-warm to {url} failed: {str(e)}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        return sum(executor.map(touch, range(count)))
+
+async def aprewarm(client: httpx.AsyncClient, url: str, connections: int) -> int:
+    """Asynchronous counterpart of prewarm(); run it on the event loop that will use the client."""
+    count = _prewarm_count(client, connections)
+
+    async def touch() -> bool:
+        try:
+            await client.get(url)
+            return True
+        except httpx.HTTPError as e:
+            logger.warning(f"Connection pre-warm to {url} failed: {str(e)}")
+            return False
+
+    return sum(await asyncio.gather(*(touch() for _ in range(count))))
+
+def pool_stats(client) -> Dict[str, int]:
+    """
+    Current state of a client's connection pool.
+
+    Args:
+        client: Client built by create_http_client() or create_async_http_client()
+
+    Returns:
+        Dict[str, int]: Open connections, how many are idle and how many in use
+    """
+    connections = list(getattr(getattr(client._transport, "_pool", None), "connections", ()))
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {"connections": len(connections), "idle": idle, "in_use": len(connections) - idle}
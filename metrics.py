@@ -0,0 +1,92 @@
+"""
+Process-wide metrics for the CrewAIR booking assistant.
+Counters and histograms are thread-safe and cheap enough to update on every
+turn; snapshot() and histograms() return their current values for logging
+or export.
+"""
+
+import bisect
+import threading
+from typing import Dict, List, Sequence
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+
+# Upper bounds of histogram buckets, in seconds, for latencies
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Upper bounds of histogram buckets for counts such as queue depths
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+class _Histogram:
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        # One count per bound plus the overflow bucket
+        self.counts: List[int] = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+_histograms: Dict[str, _Histogram] = {}
+
+def increment(name: str, value: float = 1) -> None:
+    """
+    Add to a named counter, creating it on first use.
+    
+    Args:
+        name (str): Dotted counter name, e.g. "fast_path.local"
+        value (float): Amount to add
+    """
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def observe(name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+    """
+    Record a value in a named histogram, creating it on first use.
+    
+    Args:
+        name (str): Dotted histogram name, e.g. "rate_limiter.wait_seconds"
+        value (float): Observed value
+        buckets (Sequence[float]): Ascending bucket upper bounds, used when the histogram is created
+    """
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = _Histogram(buckets)
+        histogram.counts[bisect.bisect_left(histogram.bounds, value)] += 1
+        histogram.total += value
+        histogram.count += 1
+
+def histograms() -> Dict[str, Dict]:
+    """
+    Return a copy of all histograms.
+    
+    Returns:
+        Dict[str, Dict]: Per histogram, "buckets" as cumulative counts keyed by
+        upper bound ("+Inf" last), plus "sum" and "count" of the observed values
+    """
+    with _lock:
+        result = {}
+        for name, histogram in _histograms.items():
+            cumulative, buckets = 0, {}
+            for bound, count in zip(histogram.bounds + ("+Inf",), histogram.counts):
+                cumulative += count
+                buckets[bound] = cumulative
+            result[name] = {"buckets": buckets, "sum": histogram.total, "count": histogram.count}
+        return result
+
+def snapshot() -> Dict[str, float]:
+    """
+    Return a copy of all counters.
+    
+    Returns:
+        Dict[str, float]: Counter values keyed by name
+    """
+    with _lock:
+        return dict(_counters)
+
+def reset() -> None:
+    """Clear all counters and histograms, e.g. between benchmark runs."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
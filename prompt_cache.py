@@ -0,0 +1,71 @@
+"""
+Provider prompt caching: a frozen static prefix and cached-token accounting.
+Providers reuse the prefill of a prompt prefix they have seen recently, but
+only an exact, byte-identical prefix. Every completion call opens with the
+tool definitions and the system message, so they are serialized once at
+import into a StaticPrefix and every call sends those same objects, in the
+same place, whatever the turn: conversation messages only ever follow them.
+
+record_usage() reads how much of each prompt the provider served from its
+cache out of the usage it reports, and exports it as metrics.
+"""
+
+import hashlib
+import json
+from typing import Dict, List, NamedTuple
+
+import metrics
+
+class StaticPrefix(NamedTuple):
+    """
+    Tool definitions and system message shared by every completion call.
+
+    Attributes:
+        system (Dict): System message in OpenAI wire format
+        tools (List[Dict]): Tool definitions in OpenAI wire format
+        fingerprint (str): Short hash of the prefix's compact JSON, e.g. for the provider's prompt_cache_key
+    """
+    system: Dict
+    tools: List[Dict]
+    fingerprint: str
+
+def freeze_prefix(system_message: str, tools: List[Dict]) -> StaticPrefix:
+    """
+    Serialize the static prefix once and rebuild it from those bytes.
+
+    Args:
+        system_message (str): System prompt opening every conversation
+        tools (List[Dict]): Tool definitions offered to the model
+
+    Returns:
+        StaticPrefix: Prefix whose objects share nothing with the arguments, so
+        later changes to the source schemas cannot alter what is sent. Callers
+        send system itself as the first message rather than an equal copy.
+    """
+    serialized = json.dumps([tools, {"role": "system", "content": system_message}],
+                            separators=(",", ":"), ensure_ascii=False).encode()
+    frozen_tools, system = json.loads(serialized)
+    return StaticPrefix(system, frozen_tools, hashlib.sha256(serialized).hexdigest()[:16])
+
+def cached_tokens(usage) -> int:
+    """Prompt tokens the provider served from its cache, 0 if it reported none."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+
+def record_usage(usage) -> None:
+    """
+    Export the prompt caching of one completion call.
+
+    Args:
+        usage: The response's usage object, or None when the API reported none
+
+    Counted in metrics as "prompt_cache.prompt_tokens" and
+    "prompt_cache.cached_tokens", and per call as "prompt_cache.hit" (some
+    of the prompt came from the cache) or "prompt_cache.miss".
+    """
+    if usage is None:
+        return
+    cached = cached_tokens(usage)
+    metrics.increment("prompt_cache.prompt_tokens", usage.prompt_tokens)
+    metrics.increment("prompt_cache.cached_tokens", cached)
+    metrics.increment("prompt_cache.hit" if cached else "prompt_cache.miss")
@@ -0,0 +1,282 @@
+"""
+Client-side rate limiting of model calls.
+A process-wide scheduler holds two token buckets, one for requests per
+minute and one for tokens per minute, refilled continuously. A call that
+finds both buckets able to pay goes straight through; otherwise it waits in
+a bounded priority queue, booking turns ahead of browsing ones, and a
+dispatcher thread admits the head of the queue as soon as the buckets can
+pay for it.
+
+Overload is shed early instead of piling up: a call is refused at once when
+its estimated wait exceeds the allowed wait, or when the queue is full and
+holds nothing of lower priority to evict. Token reservations are estimates,
+settled against the usage the API reports.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional
+
+import metrics
+
+# Priority classes, most urgent first
+BOOKING = 0
+BROWSING = 1
+PRIORITY_NAMES = {BOOKING: "booking", BROWSING: "browsing"}
+
+class RateLimitedError(Exception):
+    """Raised when a call is shed instead of queued, or waited too long."""
+
+class _Bucket:
+    """Token bucket refilled at a constant rate up to its capacity."""
+    __slots__ = ("rate", "capacity", "level", "updated")
+
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until the bucket holds amount, at the current level."""
+        return max(0.0, (amount - self.level) / self.rate)
+
+class _Waiter:
+    __slots__ = ("priority", "sequence", "tokens", "enqueued", "state", "event", "loop", "future")
+
+    def __init__(self, priority: int, sequence: int, tokens: float):
+        self.priority = priority
+        self.sequence = sequence
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        # "waiting", "granted", "evicted" or "abandoned"
+        self.state = "waiting"
+        self.event: Optional[threading.Event] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.future: Optional[asyncio.Future] = None
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+    def wake(self) -> None:
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+class RateLimiter:
+    """
+    Requests- and tokens-per-minute scheduler with priority classes.
+
+    Attributes:
+        requests_per_minute (float): Request budget, 0 for unlimited
+        tokens_per_minute (float): Token budget, 0 for unlimited
+        max_queue (int): Calls allowed to wait at once
+        max_wait (float): Seconds a call may wait before it is refused
+
+    Metrics: "rate_limiter.queue_depth" is a histogram of the queue length
+    each waiting call found, "rate_limiter.wait_seconds.<class>" of the time
+    calls waited. Counters: "rate_limiter.admitted", "rate_limiter.queued",
+    "rate_limiter.shed", "rate_limiter.evicted", "rate_limiter.timed_out" and
+    "rate_limiter.cancelled".
+    """
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0, max_queue: int = 256,
+                 max_wait: float = 10.0, burst_seconds: float = 10.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._requests = _Bucket(requests_per_minute, burst_seconds) if requests_per_minute else None
+        self._tokens = _Bucket(tokens_per_minute, burst_seconds) if tokens_per_minute else None
+        self._queue: List[_Waiter] = []
+        self._waiting = 0
+        # Requests and tokens queued per priority, for wait estimates
+        self._queued: Dict[int, List[float]] = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._dispatcher: Optional[threading.Thread] = None
+
+    def _cost(self, tokens: float) -> float:
+        # A call larger than the whole bucket could never be admitted
+        return min(tokens, self._tokens.capacity) if self._tokens else 0
+
+    def _refill(self, now: float) -> None:
+        if self._requests:
+            self._requests.refill(now)
+        if self._tokens:
+            self._tokens.refill(now)
+
+    def _wait_for(self, requests: float, tokens: float) -> float:
+        return max(self._requests.wait_for(requests) if self._requests else 0.0,
+                   self._tokens.wait_for(tokens) if self._tokens else 0.0)
+
+    def _take(self, tokens: float) -> None:
+        if self._requests:
+            self._requests.level -= 1
+        if self._tokens:
+            self._tokens.level -= tokens
+
+    def _enter(self, tokens: float, priority: int,
+               loop: Optional[asyncio.AbstractEventLoop] = None) -> Optional[_Waiter]:
+        """Admit a call at once (None) or queue it (its waiter); raise if it is shed."""
+        cost = self._cost(tokens)
+        with self._condition:
+            self._refill(time.monotonic())
+            if self._waiting == 0 and self._wait_for(1, cost) == 0:
+                self._take(cost)
+                metrics.increment("rate_limiter.admitted")
+                return None
+
+            ahead_requests = ahead_tokens = 0.0
+            for queued_priority, (requests, queued_tokens) in self._queued.items():
+                if queued_priority <= priority:
+                    ahead_requests += requests
+                    ahead_tokens += queued_tokens
+            if self._wait_for(ahead_requests + 1, ahead_tokens + cost) > self.max_wait:
+                metrics.increment("rate_limiter.shed")
+                raise RateLimitedError("Model call rate limit reached; estimated wait too long")
+            if self._waiting >= self.max_queue and not self._evict_below(priority):
+                metrics.increment("rate_limiter.shed")
+                raise RateLimitedError("Model call queue is full")
+
+            metrics.observe("rate_limiter.queue_depth", self._waiting, metrics.COUNT_BUCKETS)
+            metrics.increment("rate_limiter.queued")
+            waiter = _Waiter(priority, next(self._sequence), cost)
+            if loop is None:
+                waiter.event = threading.Event()
+            else:
+                waiter.loop = loop
+                waiter.future = loop.create_future()
+            heapq.heappush(self._queue, waiter)
+            self._waiting += 1
+            totals = self._queued.setdefault(priority, [0.0, 0.0])
+            totals[0] += 1
+            totals[1] += cost
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="rate-limiter", daemon=True)
+                self._dispatcher.start()
+            self._condition.notify()
+            return waiter
+
+    def _leave(self, waiter: _Waiter, state: str) -> None:
+        """Take a waiting call out of the queue accounting; the heap entry is skipped later."""
+        waiter.state = state
+        self._waiting -= 1
+        totals = self._queued[waiter.priority]
+        totals[0] -= 1
+        totals[1] -= waiter.tokens
+
+    def _evict_below(self, priority: int) -> bool:
+        """Refuse the newest waiting call of lower priority than priority, if any."""
+        candidates = [waiter for waiter in self._queue if waiter.state == "waiting" and waiter.priority > priority]
+        if not candidates:
+            return False
+        victim = max(candidates, key=lambda waiter: (waiter.priority, waiter.sequence))
+        self._leave(victim, "evicted")
+        metrics.increment("rate_limiter.evicted")
+        victim.wake()
+        return True
+
+    def _dispatch(self) -> None:
+        """Admit queued calls in priority order as the buckets refill."""
+        with self._condition:
+            while True:
+                while self._queue and self._queue[0].state != "waiting":
+                    heapq.heappop(self._queue)
+                if not self._queue:
+                    self._condition.wait()
+                    continue
+                head = self._queue[0]
+                self._refill(time.monotonic())
+                wait = self._wait_for(1, head.tokens)
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+                heapq.heappop(self._queue)
+                self._take(head.tokens)
+                self._leave(head, "granted")
+                metrics.observe(f"rate_limiter.wait_seconds.{PRIORITY_NAMES.get(head.priority, head.priority)}",
+                                time.monotonic() - head.enqueued)
+                head.wake()
+
+    def _finish(self, waiter: _Waiter) -> None:
+        """Settle a waiter after it was woken or timed out."""
+        with self._condition:
+            if waiter.state == "waiting":
+                self._leave(waiter, "abandoned")
+                metrics.increment("rate_limiter.timed_out")
+                raise RateLimitedError(f"Waited {self.max_wait:g}s for the model call rate limit")
+        if waiter.state == "evicted":
+            raise RateLimitedError("Model call shed for a higher-priority call")
+
+    def _cancel(self, waiter: _Waiter) -> None:
+        """Withdraw a waiter whose caller was cancelled, returning what it was granted."""
+        with self._condition:
+            if waiter.state == "waiting":
+                self._leave(waiter, "abandoned")
+            elif waiter.state == "granted":
+                # Granted just before the cancellation reached the caller; nothing was sent
+                if self._requests:
+                    self._requests.level = min(self._requests.capacity, self._requests.level + 1)
+                if self._tokens:
+                    self._tokens.level = min(self._tokens.capacity, self._tokens.level + waiter.tokens)
+                self._condition.notify()
+            else:
+                return
+            metrics.increment("rate_limiter.cancelled")
+
+    def acquire(self, tokens: float = 0, priority: int = BROWSING) -> None:
+        """
+        Wait until a call may be made, from synchronous code.
+
+        Args:
+            tokens (float): Tokens the call is expected to use, prompt and completion
+            priority (int): BOOKING or BROWSING
+
+        Raises:
+            RateLimitedError: If the call is shed, evicted or waits longer than max_wait
+        """
+        waiter = self._enter(tokens, priority)
+        if waiter is None:
+            return
+        waiter.event.wait(self.max_wait - (time.monotonic() - waiter.enqueued))
+        self._finish(waiter)
+
+    async def aacquire(self, tokens: float = 0, priority: int = BROWSING) -> None:
+        """Asynchronous counterpart of acquire(); waiting does not block the event loop."""
+        waiter = self._enter(tokens, priority, asyncio.get_running_loop())
+        if waiter is None:
+            return
+        try:
+            await asyncio.wait_for(waiter.future, self.max_wait - (time.monotonic() - waiter.enqueued))
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            self._cancel(waiter)
+            raise
+        self._finish(waiter)
+
+    def settle(self, reserved: float, used: float) -> None:
+        """
+        Correct the token bucket once a call reports its actual usage.
+
+        Args:
+            reserved (float): Tokens passed to acquire()
+            used (float): Tokens the API reported, prompt and completion
+        """
+        if not self._tokens:
+            return
+        with self._condition:
+            self._tokens.level = min(self._tokens.capacity, self._tokens.level + self._cost(reserved) - used)
+            self._condition.notify()
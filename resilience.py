@@ -0,0 +1,414 @@
+"""
+Resilience policy around model calls.
+ResilientCaller runs a completion call under a deadline covering every
+attempt, retries rate limits (429), server errors (5xx) and connection
+failures with jittered exponential backoff, and fails fast through a
+circuit breaker while the API keeps failing.
+
+Optionally it hedges: when a call has taken longer than the recent p95
+latency, a duplicate request is sent and the first reply wins. Hedges are
+paid for from a budget that grows with each call, so they add a bounded
+share of extra requests, and none are sent shortly after a rate limit.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Callable, Deque, Optional
+
+from openai import APIConnectionError, APIStatusError
+
+import metrics
+
+class CircuitOpenError(Exception):
+    """Raised without calling the API while the circuit breaker is open."""
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when a call and its retries do not finish within the deadline."""
+
+def is_retryable(error: BaseException) -> bool:
+    """True for rate limits, server errors, timeouts and connection failures."""
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, APIConnectionError)
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the server asked to wait before retrying, if it said."""
+    if not isinstance(error, APIStatusError):
+        return None
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def _start(coroutine) -> asyncio.Task:
+    """Run a hedged attempt as a task whose error is retrieved even if another attempt wins."""
+    task = asyncio.ensure_future(coroutine)
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
+    return task
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker.
+
+    Once at least min_calls of the last window calls have finished and
+    failure_ratio of them failed, the circuit opens and calls fail at once
+    for reset_timeout seconds. Then a single trial call is let through
+    (half-open): its success closes the circuit, its failure opens it again,
+    and if it is cancelled the next call becomes the trial. Openings are
+    counted in metrics as "resilience.circuit_opened", rejected calls as
+    "resilience.circuit_rejected" and cancelled trials as
+    "resilience.trial_abandoned".
+
+    Attributes:
+        failure_ratio (float): Share of recent calls failing that opens the circuit
+        reset_timeout (float): Seconds the circuit stays open before a trial call
+        window (int): Recent calls the ratio is taken over
+        min_calls (int): Calls needed in the window before it can open
+    """
+    def __init__(self, failure_ratio: float = 0.5, reset_timeout: float = 30.0, window: int = 50,
+                 min_calls: int = 20):
+        self.failure_ratio = failure_ratio
+        self.reset_timeout = reset_timeout
+        self.window = window
+        self.min_calls = min_calls
+        # True for each failed call, False for each success
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """
+        Let a call through or refuse it.
+
+        Returns:
+            bool: True if the call is the half-open trial, which must end in
+            record_success(), record_failure() or abandon_trial()
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with its trial call running
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if time.monotonic() - self._opened_at >= self.reset_timeout and not self._trial_running:
+                self._trial_running = True
+                return True
+        metrics.increment("resilience.circuit_rejected")
+        raise CircuitOpenError("Model API circuit is open after repeated failures")
+
+    def abandon_trial(self) -> None:
+        """Free the half-open trial slot of a call cancelled before it had an outcome."""
+        with self._lock:
+            if self._opened_at is not None and self._trial_running:
+                metrics.increment("resilience.trial_abandoned")
+                self._trial_running = False
+
+    def _record(self, failed: bool) -> None:
+        if len(self._outcomes) == self._outcomes.maxlen:
+            self._failures -= self._outcomes[0]
+        self._outcomes.append(failed)
+        self._failures += failed
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                if not self._trial_running:
+                    # A call from before the circuit opened; the trial decides
+                    return
+                self._outcomes.clear()
+                self._failures = 0
+                self._opened_at = None
+                self._trial_running = False
+            self._record(False)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                if self._trial_running:
+                    metrics.increment("resilience.circuit_opened")
+                    self._opened_at = time.monotonic()
+                    self._trial_running = False
+                return
+            self._record(True)
+            if len(self._outcomes) >= self.min_calls and self._failures >= self.failure_ratio * len(self._outcomes):
+                metrics.increment("resilience.circuit_opened")
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+class LatencyTracker:
+    """Latencies of recent successful calls, for the hedging delay."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Nearest-rank percentile of the window, or None until min_samples are recorded."""
+        samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+class ResilientCaller:
+    """
+    Deadline, retry, circuit breaker and hedging policy for API calls.
+
+    The wrapped callable must accept a timeout keyword, as the OpenAI SDK's
+    create() methods do; each attempt gets the time left before the deadline.
+    Retries are counted in metrics as "resilience.retries", hedged requests
+    as "resilience.hedged" and hedges that answered first as "resilience.hedge_won".
+
+    Attributes:
+        deadline (float): Seconds a call may take, retries included
+        max_attempts (int): Attempts per call, the first included
+        base_delay (float): Backoff before the first retry, doubled for each further one
+        max_delay (float): Backoff cap
+        breaker (CircuitBreaker): Shared failure state of the API
+        hedge (bool): Whether slow calls get a duplicate request
+        hedge_quantile (float): Latency quantile after which a call is hedged
+        hedge_min_delay (float): Never hedge sooner than this many seconds
+        hedge_max_ratio (float): Hedges per call at most, over time
+    """
+    def __init__(self, deadline: float = 30.0, max_attempts: int = 4, base_delay: float = 0.5,
+                 max_delay: float = 8.0, breaker: Optional[CircuitBreaker] = None, hedge: bool = False,
+                 hedge_quantile: float = 0.95, hedge_min_delay: float = 0.05, hedge_max_ratio: float = 0.05,
+                 hedge_workers: int = 32):
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_ratio = hedge_max_ratio
+        self.latency = LatencyTracker()
+        self._hedge_budget = 0.0
+        self._throttled_until = 0.0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix="hedge") if hedge else None
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        """Full-jitter exponential backoff, at least as long as a Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if isinstance(error, APIStatusError) and error.status_code == 429:
+            with self._lock:
+                self._throttled_until = max(self._throttled_until, time.monotonic() + delay)
+        return delay
+
+    def _hedge_delay(self, hedge: bool) -> Optional[float]:
+        """Seconds to wait before hedging this call, or None to not hedge it."""
+        if not (self.hedge and hedge):
+            return None
+        p = self.latency.percentile(self.hedge_quantile)
+        with self._lock:
+            self._hedge_budget = min(self._hedge_budget + self.hedge_max_ratio, 10.0)
+            if p is None or time.monotonic() < self._throttled_until:
+                return None
+        return max(p, self.hedge_min_delay)
+
+    def _take_hedge(self) -> bool:
+        with self._lock:
+            if self._hedge_budget < 1.0 or time.monotonic() < self._throttled_until:
+                return False
+            self._hedge_budget -= 1.0
+        metrics.increment("resilience.hedged")
+        return True
+
+    def call(self, function: Callable, hedge: bool = True, **kwargs):
+        """
+        Call function(**kwargs) under the policy, from synchronous code.
+
+        Args:
+            function (Callable): API call accepting a timeout keyword
+            hedge (bool): False for calls that must not be duplicated, e.g. streams
+            **kwargs: Arguments of the call
+
+        Returns:
+            The call's result
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            DeadlineExceededError: If no attempt succeeded within the deadline
+            Exception: The last error, once it is not retryable or attempts run out
+        """
+        deadline_at = time.monotonic() + self.deadline
+        for attempt in range(self.max_attempts):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            trial = self.breaker.before_call()
+            try:
+                result = self._attempt(function, kwargs, remaining, hedge)
+            except Exception as e:
+                delay = self._failed(e, attempt, deadline_at)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled, e.g. as a losing hedge or on a client disconnect
+                if trial:
+                    self.breaker.abandon_trial()
+                raise
+            self.breaker.record_success()
+            return result
+        metrics.increment("resilience.deadline_exceeded")
+        raise DeadlineExceededError(f"Model call did not succeed within {self.deadline:g}s")
+
+    async def acall(self, function: Callable, hedge: bool = True, **kwargs):
+        """Asynchronous counterpart of call(), for coroutine functions such as AsyncOpenAI's create()."""
+        return await self._acall(function, hedge, time.monotonic() + self.deadline, kwargs)
+
+    async def astream(self, function: Callable, **kwargs) -> AsyncIterator:
+        """
+        Open a stream under the policy and yield its chunks, all within the deadline.
+
+        Args:
+            function (Callable): Coroutine function returning an async iterable,
+                e.g. AsyncOpenAI's create() with stream=True
+            **kwargs: Arguments of the call
+
+        Yields:
+            The stream's chunks
+
+        Raises:
+            The errors of acall(); DeadlineExceededError also when the stream
+            has not ended by the deadline
+
+        Opening the stream is retried like acall(), but once chunks flow
+        nothing is retried, since they have been passed on. Streams are never
+        hedged, and their time to first byte is not recorded with the
+        latencies of whole calls that set the hedging delay. A stream cut off
+        at the deadline is closed and counted as "resilience.deadline_exceeded".
+        """
+        deadline_at = time.monotonic() + self.deadline
+        stream = await self._acall(function, False, deadline_at, kwargs, measure=False)
+        chunks = stream.__aiter__()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), max(0.0, deadline_at - time.monotonic()))
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    metrics.increment("resilience.deadline_exceeded")
+                    raise DeadlineExceededError(f"Model stream did not finish within {self.deadline:g}s") from None
+                yield chunk
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                await close()
+
+    async def _acall(self, function: Callable, hedge: bool, deadline_at: float, kwargs, measure: bool = True):
+        for attempt in range(self.max_attempts):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            trial = self.breaker.before_call()
+            try:
+                result = await self._aattempt(function, kwargs, remaining, hedge, measure)
+            except Exception as e:
+                delay = self._failed(e, attempt, deadline_at)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled, e.g. as a losing hedge or on a client disconnect
+                if trial:
+                    self.breaker.abandon_trial()
+                raise
+            self.breaker.record_success()
+            return result
+        metrics.increment("resilience.deadline_exceeded")
+        raise DeadlineExceededError(f"Model call did not succeed within {self.deadline:g}s")
+
+    def _failed(self, error: Exception, attempt: int, deadline_at: float) -> float:
+        """Record a failed attempt and return the backoff before the next, or raise."""
+        if not isinstance(error, DeadlineExceededError) and not is_retryable(error):
+            # The API answered; the request itself was at fault
+            self.breaker.record_success()
+            raise error
+        self.breaker.record_failure()
+        delay = self._backoff(attempt, error)
+        if isinstance(error, DeadlineExceededError) or time.monotonic() + delay >= deadline_at:
+            metrics.increment("resilience.deadline_exceeded")
+            raise DeadlineExceededError(f"Model call did not succeed within {self.deadline:g}s") from error
+        if attempt + 1 >= self.max_attempts:
+            raise error
+        metrics.increment("resilience.retries")
+        return delay
+
+    def _attempt(self, function: Callable, kwargs, remaining: float, hedge: bool):
+        started = time.monotonic()
+        delay = self._hedge_delay(hedge)
+        if delay is None or delay >= remaining:
+            result = function(timeout=remaining, **kwargs)
+            self.latency.record(time.monotonic() - started)
+            return result
+
+        primary = self._executor.submit(function, timeout=remaining, **kwargs)
+        pending = {primary}
+        done, _ = wait(pending, timeout=delay)
+        if not done and self._take_hedge():
+            pending.add(self._executor.submit(function, timeout=remaining - delay, **kwargs))
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=started + remaining - time.monotonic(),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceededError(f"Model call did not answer within {remaining:.2f}s")
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        metrics.increment("resilience.hedge_won")
+                    self.latency.record(time.monotonic() - started)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def _aattempt(self, function: Callable, kwargs, remaining: float, hedge: bool, measure: bool = True):
+        started = time.monotonic()
+        delay = self._hedge_delay(hedge)
+        if delay is None or delay >= remaining:
+            result = await function(timeout=remaining, **kwargs)
+            if measure:
+                self.latency.record(time.monotonic() - started)
+            return result
+
+        primary = _start(function(timeout=remaining, **kwargs))
+        pending = {primary}
+        error = None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done and self._take_hedge():
+                pending.add(_start(function(timeout=remaining - delay, **kwargs)))
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=started + remaining - time.monotonic(),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise DeadlineExceededError(f"Model call did not answer within {remaining:.2f}s")
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            metrics.increment("resilience.hedge_won")
+                        self.latency.record(time.monotonic() - started)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The losing request is abandoned, closing its connection
+            for task in pending:
+                task.cancel()
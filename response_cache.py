@@ -0,0 +1,193 @@
+"""
+Response cache for chat completion calls.
+Completions are keyed on a normalized hash of the request messages plus the
+call parameters (model, tools schema version, tool choice), held in an
+in-memory LRU with a TTL, and optionally backed by a SQLite file so entries
+survive restarts and can be shared between worker processes.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s.!?]+$")
+
+def normalize_message(message: Dict) -> Dict:
+    """
+    Reduce a message to the parts that determine the model's reply.
+    
+    Args:
+        message (Dict): Message in OpenAI wire format
+        
+    Returns:
+        Dict: Normalized message used for hashing
+        
+    Whitespace is collapsed everywhere; user text is also case-folded and
+    stripped of trailing punctuation so "Hi!" and "hi" share an entry. Tool
+    call ids are random per response and are left out, which lets the
+    follow-up call after a tool round-trip hit the cache as well.
+    """
+    content = message.get("content")
+    if content:
+        content = _WHITESPACE.sub(" ", content).strip()
+        if message["role"] == "user":
+            content = _TRAILING_PUNCTUATION.sub("", content.casefold())
+    normalized = {"role": message["role"], "content": content}
+    if message.get("tool_calls"):
+        normalized["tool_calls"] = [
+            [tool_call["function"]["name"], tool_call["function"]["arguments"]]
+            for tool_call in message["tool_calls"]
+        ]
+    return normalized
+
+def update_digest(digest, message: Dict) -> None:
+    """
+    Feed one message into a running digest of a conversation.
+    
+    Args:
+        digest: hashlib.sha256 object accumulating the conversation
+        message (Dict): Message in OpenAI wire format
+    """
+    digest.update(json.dumps(normalize_message(message), separators=(",", ":")).encode())
+    digest.update(b"\n")
+
+class ResponseCache:
+    """
+    LRU + TTL cache of assistant replies with an optional on-disk store.
+    
+    Attributes:
+        max_entries (int): Maximum number of replies kept in memory
+        ttl (float): Seconds a reply stays valid
+        path (Optional[str]): SQLite file backing the cache, None for memory only
+        
+    Hits and misses are counted in metrics as "response_cache.hit",
+    "response_cache.disk_hit" and "response_cache.miss".
+    """
+    def __init__(self, max_entries: int = 1024, ttl: float = 600.0, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._entries: "OrderedDict[str, tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, expires_at REAL, reply TEXT)"
+            )
+
+    def key(self, messages: List[Dict], **params) -> str:
+        """
+        Compute the cache key for a completion request.
+        
+        Args:
+            messages (List[Dict]): Request messages in OpenAI wire format
+            **params: Other call parameters that affect the reply
+            
+        Returns:
+            str: Hex digest identifying the request
+        """
+        digest = hashlib.sha256()
+        for message in messages:
+            update_digest(digest, message)
+        return self.key_for_digest(digest, **params)
+
+    def key_for_digest(self, digest, **params) -> str:
+        """
+        Compute the cache key from a running digest of the request messages.
+        
+        Args:
+            digest: hashlib.sha256 object fed every message via update_digest()
+            **params: Other call parameters that affect the reply
+            
+        Returns:
+            str: Hex digest identifying the request; the given digest is not modified
+        """
+        digest = digest.copy()
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up a cached reply.
+        
+        Args:
+            key (str): Key from key()
+            
+        Returns:
+            Optional[Dict]: Assistant message in wire format with fresh tool call ids, or None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                metrics.increment("response_cache.hit")
+                return _with_fresh_ids(entry[1])
+            if entry:
+                del self._entries[key]
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT expires_at, reply FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row:
+                    reply = json.loads(row[1])
+                    self._store(key, row[0], reply)
+                    metrics.increment("response_cache.disk_hit")
+                    return _with_fresh_ids(reply)
+        metrics.increment("response_cache.miss")
+        return None
+
+    def put(self, key: str, reply: Dict) -> None:
+        """
+        Store an assistant reply.
+        
+        Args:
+            key (str): Key from key()
+            reply (Dict): Assistant message in wire format
+        """
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, expires_at, reply)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, expires_at, json.dumps(reply))
+                    )
+                except sqlite3.Error as e:
+                    logger.warning(f"Response cache write failed: {str(e)}")
+
+    def clear(self) -> None:
+        """Drop all cached replies, in memory and on disk."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+
+    def _store(self, key: str, expires_at: float, reply: Dict) -> None:
+        self._entries[key] = (expires_at, reply)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+def _with_fresh_ids(reply: Dict) -> Dict:
+    """Copy a cached reply, giving its tool calls new ids so they stay unique within a conversation."""
+    reply = dict(reply)
+    if reply.get("tool_calls"):
+        reply["tool_calls"] = [
+            {**tool_call, "id": f"call_{uuid.uuid4().hex[:24]}"} for tool_call in reply["tool_calls"]
+        ]
+    return reply
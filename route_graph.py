@@ -0,0 +1,263 @@
+"""
+Route network with multi-leg itinerary search.
+Flights are stored in compressed sparse row (CSR) form: airports are
+numbered, the flights leaving airport i occupy positions offsets[i] to
+offsets[i + 1] of parallel target, fare and duration arrays. Searches are
+best-first (Dijkstra, or A* when airport coordinates give a lower bound),
+honour a maximum number of stops and can return the k cheapest or fastest
+itineraries.
+"""
+
+import array
+from bisect import bisect_left, bisect_right
+import csv
+import heapq
+import math
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+_EARTH_RADIUS_KM = 6371.0
+
+class Itinerary(NamedTuple):
+    airports: Tuple[str, ...]
+    fare_cents: int
+    duration_minutes: int
+
+    @property
+    def stops(self) -> int:
+        return len(self.airports) - 2
+
+def _great_circle_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Haversine distance between two points given in radians."""
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * _EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+class RouteGraph:
+    """
+    CSR adjacency arrays over (origin, destination, fare, duration) flights.
+
+    Attributes:
+        airports (List[str]): Airport codes by index
+        offsets (array.array): Flights of airport i are offsets[i]:offsets[i + 1]
+        targets (array.array): Destination airport index per flight
+        fares (array.array): Fare in cents per flight
+        durations (array.array): Duration in minutes per flight
+    """
+    def __init__(self, airports: List[str], offsets: array.array, targets: array.array,
+                 fares: array.array, durations: array.array,
+                 coordinates: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.airports = airports
+        self.offsets = offsets
+        self.targets = targets
+        self.fares = fares
+        self.durations = durations
+        self._index = {code: i for i, code in enumerate(airports)}
+
+        # A* lower bound: distance to the destination times the lowest cost
+        # per kilometre of any flight; zero (plain Dijkstra) without coordinates
+        self._latitudes: Optional[array.array] = None
+        self._longitudes: Optional[array.array] = None
+        self._min_cost_per_km = {"fare": 0.0, "duration": 0.0}
+        if coordinates and all(code in coordinates for code in airports):
+            self._latitudes = array.array("d", (math.radians(coordinates[code][0]) for code in airports))
+            self._longitudes = array.array("d", (math.radians(coordinates[code][1]) for code in airports))
+            rates = {"fare": math.inf, "duration": math.inf}
+            for origin in range(len(airports)):
+                for flight in range(offsets[origin], offsets[origin + 1]):
+                    distance = self._distance(origin, targets[flight])
+                    if distance > 0:
+                        rates["fare"] = min(rates["fare"], fares[flight] / distance)
+                        rates["duration"] = min(rates["duration"], durations[flight] / distance)
+            self._min_cost_per_km = {key: rate if rate != math.inf else 0.0 for key, rate in rates.items()}
+
+    @classmethod
+    def from_edges(cls, edges: Iterable[Tuple[str, str, int, int]],
+                   coordinates: Optional[Dict[str, Tuple[float, float]]] = None) -> "RouteGraph":
+        """
+        Build the CSR arrays from a list of flights.
+
+        Args:
+            edges (Iterable[Tuple[str, str, int, int]]): (origin, destination,
+                fare in cents, duration in minutes) per flight
+            coordinates (Optional[Dict[str, Tuple[float, float]]]): Latitude
+                and longitude in degrees per airport, enabling A*
+
+        Returns:
+            RouteGraph: The graph
+        """
+        airports: List[str] = []
+        index: Dict[str, int] = {}
+        rows: List[Tuple[int, int, int, int]] = []
+        for origin, destination, fare, duration in edges:
+            ends = []
+            for code in (origin.strip().upper(), destination.strip().upper()):
+                if code not in index:
+                    index[code] = len(airports)
+                    airports.append(code)
+                ends.append(index[code])
+            rows.append((ends[0], ends[1], int(fare), int(duration)))
+        rows.sort()
+
+        offsets = array.array("i", [0]) * (len(airports) + 1)
+        for origin, _, _, _ in rows:
+            offsets[origin + 1] += 1
+        for i in range(len(airports)):
+            offsets[i + 1] += offsets[i]
+        targets = array.array("i", (row[1] for row in rows))
+        fares = array.array("i", (row[2] for row in rows))
+        durations = array.array("i", (row[3] for row in rows))
+        return cls(airports, offsets, targets, fares, durations, coordinates)
+
+    @classmethod
+    def load(cls, routes_path: str, airports_path: Optional[str] = None) -> "RouteGraph":
+        """
+        Load a graph from CSV files.
+
+        Args:
+            routes_path (str): CSV with origin, destination, fare_cents and
+                duration_minutes columns
+            airports_path (Optional[str]): CSV with code, latitude and
+                longitude columns, enabling A*
+
+        Returns:
+            RouteGraph: The graph
+        """
+        coordinates = None
+        if airports_path:
+            with open(airports_path, newline="", encoding="utf-8") as f:
+                coordinates = {row["code"].strip().upper(): (float(row["latitude"]), float(row["longitude"]))
+                               for row in csv.DictReader(f)}
+        with open(routes_path, newline="", encoding="utf-8") as f:
+            edges = [(row["origin"], row["destination"], row["fare_cents"], row["duration_minutes"])
+                     for row in csv.DictReader(f)]
+        return cls.from_edges(edges, coordinates)
+
+    def __contains__(self, code: str) -> bool:
+        return code.upper() in self._index
+
+    def _distance(self, a: int, b: int) -> float:
+        return _great_circle_km(self._latitudes[a], self._longitudes[a], self._latitudes[b], self._longitudes[b])
+
+    def search(self, origin: str, destination: str, k: int = 1, max_stops: Optional[int] = None,
+               optimize: str = "fare") -> List[Itinerary]:
+        """
+        Find the k best itineraries between two airports.
+
+        Args:
+            origin (str): Origin airport code
+            destination (str): Destination airport code
+            k (int): Number of itineraries to return
+            max_stops (Optional[int]): Maximum intermediate stops, unlimited if None
+            optimize (str): "fare" or "duration"
+
+        Returns:
+            List[Itinerary]: Up to k itineraries, best first; none revisits an airport
+
+        The best itinerary is a single best-first search (_best_path()). The
+        next ones come from Yen's algorithm: each deviates from an itinerary
+        already found at one of its airports, keeping the flights before it
+        and searching again for the rest of the way without the airports
+        behind it and without the flights the earlier itineraries took from
+        there. The cheapest deviation not yet returned is the next itinerary.
+        """
+        source = self._index.get(origin.upper())
+        target = self._index.get(destination.upper())
+        if source is None or target is None or k < 1:
+            return []
+        if optimize not in self._min_cost_per_km:
+            raise ValueError(f"Cannot optimize for {optimize!r}")
+        costs = self.fares if optimize == "fare" else self.durations
+        max_legs = math.inf if max_stops is None else max_stops + 1
+
+        rate = self._min_cost_per_km[optimize]
+        bounds: Dict[int, float] = {}
+
+        def lower_bound(node: int) -> float:
+            if not rate:
+                return 0.0
+            bound = bounds.get(node)
+            if bound is None:
+                bound = bounds[node] = self._distance(node, target) * rate
+            return bound
+
+        first = self._best_path(source, target, max_legs, costs, lower_bound, set(), set())
+        if first is None:
+            return []
+        found = [first]
+        # (cost, tie-breaker, flights) of deviations not returned yet
+        candidates: List[Tuple[int, int, Tuple[int, ...]]] = []
+        seen = {first[1]}
+        while len(found) < k:
+            _, flights = found[-1]
+            nodes = self._path_nodes(source, flights)
+            root_cost = 0
+            for i, spur in enumerate(nodes[:-1]):
+                root = flights[:i]
+                banned_flights = {path[i] for _, path in found if len(path) > i and path[:i] == root}
+                spur_path = self._best_path(spur, target, max_legs - i, costs, lower_bound,
+                                            set(nodes[:i]), banned_flights)
+                if spur_path is not None:
+                    path = root + spur_path[1]
+                    if path not in seen:
+                        seen.add(path)
+                        heapq.heappush(candidates, (root_cost + spur_path[0], len(seen), path))
+                root_cost += costs[flights[i]]
+            if not candidates:
+                break
+            cost, _, path = heapq.heappop(candidates)
+            found.append((cost, path))
+        return [self._itinerary(source, flights) for _, flights in found]
+
+    def _best_path(self, source: int, target: int, max_legs: float, costs: array.array,
+                   lower_bound: Callable[[int], float], banned_nodes: Set[int],
+                   banned_flights: Set[int]) -> Optional[Tuple[int, Tuple[int, ...]]]:
+        """
+        Cheapest path of at most max_legs flights, avoiding the banned airports and flights.
+
+        Returns its cost and flight indices, or None if there is none. Labels
+        are settled best-first on cost plus the A* lower bound; a label is
+        pruned once a label with no more legs has been settled at its airport,
+        which lets a costlier path with fewer legs survive when the stop limit
+        needs it. On the last leg the stop limit allows, only the flights to
+        the target are expanded.
+        """
+        # (cost + bound, cost, legs, airport, tie-breaker, flight, parent label)
+        heap = [(lower_bound(source), 0, 0, source, 0, -1, None)]
+        pushed = 0
+        fewest_legs: Dict[int, int] = {}
+        offsets, targets = self.offsets, self.targets
+        while heap:
+            _, cost, legs, node, _, _, _ = label = heapq.heappop(heap)
+            if fewest_legs.get(node, math.inf) <= legs:
+                continue
+            fewest_legs[node] = legs
+            if node == target:
+                flights = []
+                while label[6] is not None:
+                    flights.append(label[5])
+                    label = label[6]
+                return cost, tuple(reversed(flights))
+            if legs >= max_legs:
+                continue
+            first, last = offsets[node], offsets[node + 1]
+            if legs + 1 == max_legs:
+                # Last leg allowed: only flights to the target matter, and
+                # each row's targets are sorted, so find them by bisection
+                first = bisect_left(targets, target, first, last)
+                last = bisect_right(targets, target, first, last)
+            for flight in range(first, last):
+                next_node = targets[flight]
+                if next_node in banned_nodes or flight in banned_flights:
+                    continue
+                next_cost = cost + costs[flight]
+                pushed += 1
+                heapq.heappush(heap, (next_cost + lower_bound(next_node), next_cost, legs + 1, next_node,
+                                      pushed, flight, label))
+        return None
+
+    def _path_nodes(self, source: int, flights: Tuple[int, ...]) -> List[int]:
+        return [source] + [self.targets[flight] for flight in flights]
+
+    def _itinerary(self, source: int, flights: Tuple[int, ...]) -> Itinerary:
+        return Itinerary(tuple(self.airports[node] for node in self._path_nodes(source, flights)),
+                         sum(self.fares[flight] for flight in flights),
+                         sum(self.durations[flight] for flight in flights))
@@ -0,0 +1,190 @@
+"""
+Seat inventory with time-limited holds.
+Every flight (origin, destination, date, cabin) has a capacity, a count of
+seats sold and a set of holds. Quoting a price takes a hold for the
+conversation; booking commits it, or takes a free seat directly, and fails
+once the flight is sold out. Holds expire after a TTL so abandoned quotes
+give their seats back.
+
+Flights are spread over a fixed set of lock stripes, so concurrent bookings
+on different flights rarely contend, while all changes to one flight are
+serialized and a seat can never be sold twice. Inventory is held in memory
+per process; flights that have departed, or have nothing sold or held, are
+pruned periodically so quoting many dates does not grow it without bound.
+"""
+
+import datetime
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+import metrics
+
+Flight = Tuple[str, str, str, str]
+
+DEFAULT_CAPACITY = {"economy": 150, "premium": 40, "business": 24, "first": 8}
+
+class _FlightSeats:
+    __slots__ = ("capacity", "sold", "holds")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.sold = 0
+        # holder -> expiry; one TTL for all holds keeps this in expiry order
+        self.holds: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def expire(self, now: float) -> None:
+        holds = self.holds
+        while holds:
+            holder, expiry = next(iter(holds.items()))
+            if expiry > now:
+                break
+            del holds[holder]
+            metrics.increment("seats.hold_expired")
+
+    @property
+    def available(self) -> int:
+        return self.capacity - self.sold - len(self.holds)
+
+class SeatInventory:
+    """
+    Per-flight seat counters with holds and atomic commits.
+
+    Attributes:
+        capacity (Dict[str, int]): Seats per flight by cabin
+        hold_ttl (float): Seconds a hold lasts unless refreshed or committed
+        prune_interval (float): Seconds between sweeps of flights no longer worth tracking
+    """
+    def __init__(self, capacity: Optional[Dict[str, int]] = None, hold_ttl: float = 600.0, stripes: int = 64,
+                 prune_interval: float = 60.0):
+        self.capacity = dict(capacity or DEFAULT_CAPACITY)
+        self.hold_ttl = hold_ttl
+        self.prune_interval = prune_interval
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._flights: Dict[Flight, _FlightSeats] = {}
+        self._next_prune = time.monotonic() + prune_interval
+
+    def _lock(self, flight: Flight) -> threading.Lock:
+        return self._stripes[hash(flight) % len(self._stripes)]
+
+    def _seats(self, flight: Flight) -> _FlightSeats:
+        # Only called under the flight's stripe lock, so a flight is created once
+        seats = self._flights.get(flight)
+        if seats is None:
+            seats = self._flights[flight] = _FlightSeats(self.capacity.get(flight[3], 0))
+        return seats
+
+    def available(self, flight: Flight) -> int:
+        """
+        Count the seats neither sold nor held.
+
+        Args:
+            flight (Flight): (origin, destination, date, cabin)
+
+        Returns:
+            int: Free seats
+        """
+        with self._lock(flight):
+            seats = self._seats(flight)
+            seats.expire(time.monotonic())
+            return seats.available
+
+    def hold(self, flight: Flight, holder: Hashable) -> bool:
+        """
+        Hold a seat for a holder, e.g. when a price is quoted.
+
+        Args:
+            flight (Flight): (origin, destination, date, cabin)
+            holder (Hashable): Who the seat is held for, e.g. a conversation id
+
+        Returns:
+            bool: True if the holder now holds a seat; an existing hold is
+            refreshed, and False means the flight is sold out
+        """
+        with self._lock(flight):
+            seats = self._seats(flight)
+            now = time.monotonic()
+            seats.expire(now)
+            if holder in seats.holds:
+                seats.holds.move_to_end(holder)
+            elif seats.available <= 0:
+                metrics.increment("seats.hold_refused")
+                return False
+            seats.holds[holder] = now + self.hold_ttl
+        self._maybe_prune()
+        return True
+
+    def release(self, flight: Flight, holder: Hashable) -> None:
+        """Give back a holder's seat on a flight, if any."""
+        with self._lock(flight):
+            self._seats(flight).holds.pop(holder, None)
+
+    def commit(self, flight: Flight, holder: Hashable) -> bool:
+        """
+        Sell a seat: the holder's held seat, or otherwise a free one.
+
+        Args:
+            flight (Flight): (origin, destination, date, cabin)
+            holder (Hashable): Who is booking
+
+        Returns:
+            bool: True if a seat was sold, False if the flight is sold out
+        """
+        with self._lock(flight):
+            seats = self._seats(flight)
+            seats.expire(time.monotonic())
+            if seats.holds.pop(holder, None) is None and seats.available <= 0:
+                metrics.increment("seats.sold_out")
+                return False
+            seats.sold += 1
+        self._maybe_prune()
+        return True
+
+    def refund(self, flight: Flight) -> None:
+        """Return a sold seat to the flight, e.g. when a booking turns out to be a duplicate."""
+        with self._lock(flight):
+            seats = self._seats(flight)
+            seats.sold = max(0, seats.sold - 1)
+
+    def sold(self, flight: Flight) -> int:
+        """Number of seats sold on a flight."""
+        with self._lock(flight):
+            return self._seats(flight).sold
+
+    def prune(self, today: Optional[str] = None) -> int:
+        """
+        Forget flights that have departed, and flights with no seat sold or held.
+
+        Args:
+            today (Optional[str]): Current date as YYYY-MM-DD, the local date if omitted
+
+        Returns:
+            int: Flights removed
+
+        A flight with seats sold is kept until it departs, so its seats can
+        never be sold again. Removals are counted as "seats.pruned" in metrics.
+        """
+        today = today or datetime.date.today().isoformat()
+        now = time.monotonic()
+        removed = 0
+        for flight in list(self._flights):
+            with self._lock(flight):
+                seats = self._flights.get(flight)
+                if seats is None:
+                    continue
+                seats.expire(now)
+                if flight[2] < today or not (seats.holds or seats.sold):
+                    del self._flights[flight]
+                    removed += 1
+        metrics.increment("seats.pruned", removed)
+        return removed
+
+    def _maybe_prune(self) -> None:
+        now = time.monotonic()
+        if now >= self._next_prune:
+            self._next_prune = now + self.prune_interval
+            self.prune()
+
+    def __len__(self) -> int:
+        return len(self._flights)
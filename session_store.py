@@ -0,0 +1,99 @@
+"""
+In-memory session store mapping Gradio sessions to booking state.
+Sessions live in an LRU with a TTL on idle time and a hard cap on count, so
+memory stays bounded no matter how many tabs are open. Evicted sessions can
+optionally spill to a SQLite file and are restored from it on their next turn.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Optional, Type, TypeVar
+
+logger = logging.getLogger(__name__)
+
+State = TypeVar("State")
+
+class SessionManager(Generic[State]):
+    """
+    LRU/TTL map from session keys to per-conversation state objects.
+    
+    Attributes:
+        state_type (Type[State]): Class of the state, providing to_dict() and from_dict()
+        max_sessions (int): Maximum number of sessions kept in memory
+        ttl (float): Seconds a session may stay idle before it is evicted
+        spill_path (Optional[str]): SQLite file receiving evicted sessions, None to discard them
+        on_evict (Optional[Callable[[State], None]]): Called with each state leaving memory
+    """
+    def __init__(self, state_type: Type[State], max_sessions: int = 20000, ttl: float = 3600.0,
+                 spill_path: Optional[str] = None, on_evict: Optional[Callable[[State], None]] = None):
+        self.state_type = state_type
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.spill_path = spill_path
+        self.on_evict = on_evict
+        self._sessions: "OrderedDict[str, tuple[float, State]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if spill_path:
+            self._db = sqlite3.connect(spill_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, updated_at REAL, state TEXT)"
+            )
+
+    def get(self, key: str) -> State:
+        """
+        Return the state of a session, creating or restoring it if needed.
+        
+        Args:
+            key (str): Session key, e.g. the Gradio session hash
+            
+        Returns:
+            State: The session's state, now the most recently used
+        """
+        now = time.time()
+        with self._lock:
+            self._evict_expired(now)
+            entry = self._sessions.pop(key, None)
+            state = entry[1] if entry else self._restore(key)
+            self._sessions[key] = (now, state)
+            while len(self._sessions) > self.max_sessions:
+                evicted_key, (_, evicted) = self._sessions.popitem(last=False)
+                self._evict(evicted_key, evicted, now)
+            return state
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict_expired(self, now: float) -> None:
+        """Evict idle sessions; the LRU order means they are all at the front."""
+        while self._sessions:
+            key, (last_used, state) = next(iter(self._sessions.items()))
+            if now - last_used < self.ttl:
+                break
+            del self._sessions[key]
+            self._evict(key, state, now)
+
+    def _evict(self, key: str, state: State, now: float) -> None:
+        if self._db is not None:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", (key, now, json.dumps(state.to_dict()))
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"Session spill failed: {str(e)}")
+        if self.on_evict is not None:
+            self.on_evict(state)
+
+    def _restore(self, key: str) -> State:
+        if self._db is not None:
+            row = self._db.execute("SELECT state FROM sessions WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._db.execute("DELETE FROM sessions WHERE key = ?", (key,))
+                return self.state_type.from_dict(json.loads(row[0]))
+        return self.state_type()
@@ -0,0 +1,28 @@
+"""
+Shared test setup.
+CrewAIR_Agent reads its configuration when imported, so the environment is
+set here first: a throwaway booking ledger, no connection pre-warming, no
+response cache, and model calls answered by benchmarks.mock_openai_server.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_openai_server import start_server
+
+MOCK_SERVER, MOCK_URL = start_server(latency=0.0)
+os.environ["OPENAI_BASE_URL"] = MOCK_URL
+os.environ["OPENAI_API_KEY"] = "test"
+os.environ["BOOKING_LEDGER_PATH"] = os.path.join(tempfile.mkdtemp(), "ledger.db")
+os.environ["OPENAI_PREWARM_CONNECTIONS"] = "0"
+os.environ["RESPONSE_CACHE_ENABLED"] = "False"
+
+@pytest.fixture(scope="session")
+def agent():
+    import CrewAIR_Agent
+    return CrewAIR_Agent
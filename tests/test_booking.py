@@ -0,0 +1,67 @@
+"""book_flight must never sell a seat it does not record in the ledger."""
+
+import datetime
+import json
+import sqlite3
+
+def book(agent, state, **arguments):
+    arguments = {"destination_city": "Paris", "passenger_name": "Jane Smith", "email": "jane@example.com",
+                 **arguments}
+    tool_call = {"id": "call_1", "function": {"name": "book_flight", "arguments": json.dumps(arguments)}}
+    response, _ = agent.handle_tool_call(tool_call, state)
+    return json.loads(response["content"])
+
+def paris_flight(agent, travel_date: str = None, cabin: str = "economy"):
+    return agent._flight("Paris", travel_date or datetime.date.today().isoformat(), cabin)
+
+def test_missing_passenger_details_sell_no_seat(agent):
+    state = agent.BookingState()
+    flight = paris_flight(agent)
+    sold = agent.SEATS.sold(flight)
+    for missing in ({"passenger_name": None}, {"email": None}, {"passenger_name": "  "}, {"email": 7}):
+        assert "error" in book(agent, state, **missing)
+    assert agent.SEATS.sold(flight) == sold
+
+def test_ledger_failure_returns_the_seat(agent, monkeypatch):
+    def fail(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    state = agent.BookingState()
+    flight = paris_flight(agent, cabin="business")
+    sold = agent.SEATS.sold(flight)
+    monkeypatch.setattr(agent.BOOKING_LEDGER, "record", fail)
+    assert "error" in book(agent, state, cabin="business")
+    assert agent.SEATS.sold(flight) == sold
+
+    monkeypatch.undo()
+    assert book(agent, state, cabin="business")["success"]
+    assert agent.SEATS.sold(flight) == sold + 1
+
+def test_past_travel_dates_are_refused(agent):
+    state = agent.BookingState()
+    yesterday = (datetime.date.today() - datetime.timedelta(days=1)).isoformat()
+    result = book(agent, state, travel_date=yesterday)
+    assert "error" in result and "passed" in result["error"]
+
+    tool_call = {"id": "call_2", "function": {"name": "get_ticket_price",
+                                              "arguments": json.dumps({"destination_city": "Paris",
+                                                                       "travel_date": yesterday})}}
+    response, _ = agent.handle_tool_call(tool_call, state)
+    assert "error" in json.loads(response["content"])
+
+def test_booking_state_holds_canonical_destinations(agent):
+    state = agent.BookingState()
+    for city in ("Atlantis", "Londres"):
+        tool_call = {"id": "call_3", "function": {"name": "get_ticket_price",
+                                                  "arguments": json.dumps({"destination_city": city})}}
+        response, _ = agent.handle_tool_call(tool_call, state)
+        agent._update_booking_state(state, tool_call, response)
+        assert state.destination in (None, "London")
+    assert state.destination == "London"
+
+    tool_call = {"id": "call_4", "function": {"name": "book_flight", "arguments": json.dumps({
+        "destination_city": "lhr", "passenger_name": "Jane Smith", "email": "jane@example.com"})}}
+    response, _ = agent.handle_tool_call(tool_call, state)
+    state.destination = None
+    agent._update_booking_state(state, tool_call, response)
+    assert json.loads(response["content"])["success"] and state.destination == "London"
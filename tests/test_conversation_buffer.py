@@ -0,0 +1,43 @@
+"""Conversation buffers fed Gradio history in both of its formats."""
+
+import asyncio
+import types
+
+from conversation_buffer import ConversationBuffer, history_pairs
+
+SYSTEM = {"role": "system", "content": "You are Sonya."}
+
+def test_history_pairs_reads_message_dicts():
+    history = [
+        {"role": "user", "content": [{"type": "text", "text": "Hi"}]},
+        {"role": "assistant", "content": [{"type": "text", "text": "Hello!"}], "metadata": None},
+        {"role": "user", "content": "Price to Paris?"},
+        {"role": "assistant", "content": [{"type": "file", "file": {"path": "map.png"}}]},
+        {"role": "assistant", "content": "$899"},
+    ]
+    assert history_pairs(history) == [("Hi", "Hello!"), ("Price to Paris?", "\n\n$899")]
+    assert history_pairs([("Hi", "Hello!")]) == [("Hi", "Hello!")]
+
+def test_sync_keeps_the_buffer_for_message_history():
+    buffer = ConversationBuffer(SYSTEM)
+    buffer.begin_turn("Hi")
+    buffer.append({"role": "tool", "content": "{}", "tool_call_id": "call_1", "name": "validate_info"})
+    buffer.end_turn("Hello!")
+    buffer.sync([{"role": "user", "content": [{"type": "text", "text": "Hi"}]},
+                 {"role": "assistant", "content": [{"type": "text", "text": "Hello!"}]}])
+    # Unchanged history keeps the tool message rather than rebuilding the turn
+    assert buffer.turns == 1 and buffer.messages[2]["role"] == "tool"
+
+def test_two_turns_with_message_history(agent):
+    request = types.SimpleNamespace(session_hash="message-history")
+
+    async def two_turns():
+        first = await agent.achat("Hello there, I am planning a trip", [], request)
+        history = [{"role": "user", "content": [{"type": "text", "text": "Hello there, I am planning a trip"}]},
+                   {"role": "assistant", "content": [{"type": "text", "text": first}]}]
+        return first, await agent.achat("Can you help me choose a destination?", history, request)
+
+    for reply in asyncio.run(two_turns()):
+        assert not reply.startswith("Sonya: I apologize")
+    state = agent.SESSIONS.get("message-history")
+    assert agent._BUFFERS[state.conversation_id].turns == 2
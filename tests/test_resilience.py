@@ -0,0 +1,41 @@
+"""ResilientCaller deadlines on streamed calls."""
+
+import asyncio
+
+import pytest
+
+from resilience import DeadlineExceededError, ResilientCaller
+
+def stream_of(*delays):
+    """A create()-like coroutine function whose stream sleeps before each chunk."""
+    async def create(timeout=None):
+        async def chunks():
+            for i, delay in enumerate(delays):
+                await asyncio.sleep(delay)
+                yield i
+        return chunks()
+    return create
+
+async def collect(caller, create):
+    return [chunk async for chunk in caller.astream(create)]
+
+def test_astream_yields_every_chunk():
+    caller = ResilientCaller(deadline=5)
+    assert asyncio.run(collect(caller, stream_of(0, 0, 0))) == [0, 1, 2]
+
+def test_astream_cuts_off_a_stalled_stream():
+    caller = ResilientCaller(deadline=0.2)
+    received = []
+
+    async def read():
+        async for chunk in caller.astream(stream_of(0, 10)):
+            received.append(chunk)
+
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(asyncio.wait_for(read(), 5))
+    assert received == [0]
+
+def test_astream_leaves_call_latencies_alone():
+    caller = ResilientCaller(deadline=5)
+    asyncio.run(collect(caller, stream_of(0.01)))
+    assert not caller.latency._samples
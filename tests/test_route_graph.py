@@ -0,0 +1,71 @@
+"""RouteGraph.search() against brute-force enumeration of loopless itineraries."""
+
+import random
+
+import pytest
+
+from route_graph import RouteGraph
+
+def random_network(rng: random.Random):
+    codes = [f"A{i}" for i in range(rng.randint(3, 9))]
+    edges = []
+    for origin in codes:
+        for destination in codes:
+            if origin != destination and rng.random() < 0.45:
+                # Sometimes two flights on one route, at different fares
+                for _ in range(1 + (rng.random() < 0.15)):
+                    edges.append((origin, destination, rng.randint(1, 40) * 100, rng.randint(30, 600)))
+    coordinates = {code: (rng.uniform(-60, 60), rng.uniform(-180, 180)) for code in codes}
+    return codes, edges, coordinates
+
+def brute_force(edges, origin, destination, max_stops, optimize):
+    """Costs of every loopless itinerary within the stop limit, cheapest first."""
+    max_legs = float("inf") if max_stops is None else max_stops + 1
+    position = 2 if optimize == "fare" else 3
+    costs = []
+
+    def extend(airport, visited, cost):
+        if airport == destination:
+            costs.append(cost)
+            return
+        if len(visited) - 1 >= max_legs:
+            return
+        for edge in edges:
+            if edge[0] == airport and edge[1] not in visited:
+                extend(edge[1], visited | {edge[1]}, cost + edge[position])
+
+    extend(origin, {origin}, 0)
+    return sorted(costs)
+
+@pytest.mark.parametrize("seed", range(40))
+def test_search_matches_brute_force(seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        codes, edges, coordinates = random_network(rng)
+        graph = RouteGraph.from_edges(edges, coordinates if rng.random() < 0.5 else None)
+        origin, destination = rng.sample(codes, 2)
+        if origin not in graph or destination not in graph:
+            continue
+        k = rng.randint(1, 6)
+        max_stops = rng.choice([None, 0, 1, 2])
+        optimize = rng.choice(["fare", "duration"])
+
+        found = graph.search(origin, destination, k=k, max_stops=max_stops, optimize=optimize)
+        costs = [itinerary.fare_cents if optimize == "fare" else itinerary.duration_minutes for itinerary in found]
+        assert costs == brute_force(edges, origin, destination, max_stops, optimize)[:k]
+        for itinerary in found:
+            assert itinerary.airports[0] == origin and itinerary.airports[-1] == destination
+            assert len(set(itinerary.airports)) == len(itinerary.airports)
+            assert max_stops is None or itinerary.stops <= max_stops
+
+def test_k_best_reuse_an_airport_through_different_loopless_paths():
+    # Labels that loop back through A4 used to use up its k slots, so the
+    # itineraries reaching A4 the long way round were never found
+    edges = [("A0", "A4", 200, 2), ("A0", "A6", 700, 5), ("A1", "A2", 900, 5), ("A2", "A4", 100, 6),
+             ("A3", "A2", 100, 5), ("A4", "A1", 200, 3), ("A4", "A3", 900, 6), ("A4", "A5", 600, 9),
+             ("A4", "A6", 500, 8), ("A6", "A1", 300, 2), ("A6", "A2", 800, 7)]
+    found = RouteGraph.from_edges(edges).search("A0", "A5", k=4)
+    assert [itinerary.airports for itinerary in found] == [
+        ("A0", "A4", "A5"), ("A0", "A6", "A2", "A4", "A5"), ("A0", "A6", "A1", "A2", "A4", "A5"),
+    ]
+    assert [itinerary.fare_cents for itinerary in found] == [800, 2200, 2600]
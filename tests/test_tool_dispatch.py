@@ -0,0 +1,36 @@
+"""A tool call that raises must not cost the other calls of its batch their results."""
+
+import asyncio
+import json
+
+def tool_call(call_id: str, name: str, **arguments):
+    return {"id": call_id, "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+def batch():
+    return [
+        tool_call("call_1", "book_flight", destination_city="Rome", passenger_name="Jane Smith",
+                  email="jane@example.com"),
+        tool_call("call_2", "get_ticket_price", destination_city="Paris"),
+        tool_call("call_3", "validate_info", passenger_name="Jane Smith", email="jane@example.com"),
+    ]
+
+def broken_quotes(agent, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("seat inventory exploded")
+
+    monkeypatch.setattr(agent, "_quote", fail)
+
+def check(results):
+    assert [response["tool_call_id"] for response, _ in results] == ["call_1", "call_2", "call_3"]
+    contents = [json.loads(response["content"]) for response, _ in results]
+    assert contents[0]["success"] and contents[0]["booking_reference"]
+    assert "error" in contents[1]
+    assert contents[2]["all_valid"]
+
+def test_dispatch_keeps_the_other_results(agent, monkeypatch):
+    broken_quotes(agent, monkeypatch)
+    check(agent.dispatch_tool_calls(batch(), agent.BookingState()))
+
+def test_adispatch_keeps_the_other_results(agent, monkeypatch):
+    broken_quotes(agent, monkeypatch)
+    check(asyncio.run(agent.adispatch_tool_calls(batch(), agent.BookingState())))